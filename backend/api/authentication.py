@@ -1,8 +1,131 @@
+import time
+import threading
+from collections import OrderedDict
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.conf import settings
 import jwt
-from django.contrib.auth.models import User
+
+from .metrics import cache_lookup
+
+# Access tokens are short-lived and carry the claims the views need
+# (user_id, username), so verifying one never touches the database.
+# Refresh tokens live for JWT_EXP_DELTA_SECONDS and are the only point
+# where the user row is checked again (see RefreshView).
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+
+class TokenUser:
+    """Authenticated user built from access-token claims, without a User query."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, username):
+        self.id = self.pk = user_id
+        self.username = username
+
+    def __str__(self):
+        return self.username
+
+
+def _encode(user, token_type, lifetime):
+    now = int(time.time())
+    payload = {
+        "user_id": user.id,
+        "username": user.username,
+        "type": token_type,
+        "iat": now,
+        "exp": now + lifetime,
+    }
+    return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+
+
+def issue_tokens(user):
+    return {
+        "token": _encode(user, ACCESS, settings.JWT_ACCESS_TTL_SECONDS),
+        "refresh": _encode(user, REFRESH, settings.JWT_EXP_DELTA_SECONDS),
+    }
+
+
+def decode_token(token, token_type):
+    """Verified payload of token; raises jwt.InvalidTokenError (incl. expiry) otherwise."""
+    payload = jwt.decode(
+        token,
+        settings.JWT_SECRET,
+        algorithms=[settings.JWT_ALGORITHM],
+        options={"require": ["exp", "user_id"]},
+    )
+    if payload.get("type") != token_type:
+        raise jwt.InvalidTokenError("Wrong token type")
+    return payload
+
+
+class VerifiedTokenCache:
+    """
+    Small LRU of already-verified access tokens. An entry lives for at most
+    ttl seconds and never past the token's own exp.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, token):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= now:
+                del self.entries[token]
+                return None
+            self.entries.move_to_end(token)
+            return user
+
+    def put(self, token, user, exp):
+        expires_at = min(exp, time.time() + self.ttl)
+        with self.lock:
+            self.entries[token] = (user, expires_at)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def _get_token_cache():
+    global _token_cache
+    with _token_cache_lock:
+        if _token_cache is None:
+            _token_cache = VerifiedTokenCache(settings.JWT_CACHE_MAX_ENTRIES, settings.JWT_CACHE_TTL_SECONDS)
+        return _token_cache
+
+
+def user_from_access_token(token):
+    """TokenUser for a valid access token, or None."""
+    cache = _get_token_cache()
+    user = cache.get(token)
+    cache_lookup("token", user is not None)
+    if user is not None:
+        return user
+
+    try:
+        payload = decode_token(token, ACCESS)
+    except jwt.InvalidTokenError:
+        return None
+
+    user = TokenUser(payload["user_id"], payload.get("username", ""))
+    cache.put(token, user, payload["exp"])
+    return user
+
 
 class JWTAuthentication(BaseAuthentication):
     def authenticate(self, request):
@@ -18,16 +141,8 @@ class JWTAuthentication(BaseAuthentication):
         except:
             raise AuthenticationFailed("Invalid Authorization header format")
 
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationFailed("Token has expired")
-        except jwt.InvalidTokenError:
-            raise AuthenticationFailed("Invalid token")
-
-        try:
-            user = User.objects.get(id=payload["user_id"])
-        except User.DoesNotExist:
-            raise AuthenticationFailed("User not found")
+        user = user_from_access_token(token)
+        if user is None:
+            raise AuthenticationFailed("Invalid or expired token")
 
         return (user, None)
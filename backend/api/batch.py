@@ -0,0 +1,319 @@
+import os
+import time
+import atexit
+import zipfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import django
+from django.conf import settings
+
+from .models import Dataset
+from .engine import DatasetStats
+from .ingest import HISTORY_LIMIT, analyze_saved_file, record_analysis, stage_dataset, store_batch
+from .rollup import dataset_stats
+from .storage import save_chunks, release_file, unclaim
+from .compression import check_csv_name
+from .jobs import schedule_prerender
+from .timing import span
+from .metrics import cache_lookup
+
+# Batch uploads: many CSVs, or zip archives of them, in one request.
+#
+# Every file is saved to content-addressed storage first. Content that was
+# analyzed before is answered from that analysis; the rest is analyzed in
+# a process pool (BATCH_WORKERS processes, default one per core, started
+# once and shared by every batch request of this server process), each
+# worker also writing the columnar copy of the files that will be kept.
+# Only the last HISTORY_LIMIT distinct files of a batch would survive the
+# history pruning, so only those get datasets, all created in one
+# transaction; the others are analyzed and reported but not stored.
+
+ARCHIVE_SUFFIX = ".zip"
+
+# zip members that are archiver metadata, not data
+_SKIPPED_MEMBERS = ("__MACOSX/",)
+
+READ_BYTES = 1024 * 1024
+
+
+class BatchFile:
+    """One CSV of a batch and what became of it."""
+
+    def __init__(self, filename, saved_path, sha256):
+        self.filename = filename
+        self.saved_path = saved_path
+        self.sha256 = sha256
+        self.summary = None
+        self.dataset = None
+        self.deduplicated = False
+        self.error = None
+
+    def result(self):
+        if self.error is not None:
+            return {"filename": self.filename, "error": self.error}
+        return {
+            "filename": self.filename,
+            "dataset_id": self.dataset.id if self.dataset is not None else None,
+            "deduplicated": self.deduplicated,
+            "summary": self.summary,
+        }
+
+
+def _zip_members(upload):
+    """(name, chunk iterator) of each CSV in a zip archive; ValueError on a bad archive."""
+    try:
+        archive = zipfile.ZipFile(upload)
+    except zipfile.BadZipFile:
+        raise ValueError(f"{upload.name}: not a valid zip archive")
+
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith(_SKIPPED_MEMBERS)
+        and not os.path.basename(info.filename).startswith(".")
+    ]
+    for info in members:
+        try:
+            check_csv_name(info.filename)
+        except ValueError as e:
+            raise ValueError(f"{upload.name}: {info.filename}: {e}")
+    if sum(info.file_size for info in members) > settings.BATCH_MAX_BYTES:
+        raise ValueError(f"{upload.name}: contents exceed {settings.BATCH_MAX_BYTES} bytes")
+
+    def read(info):
+        with archive.open(info) as member:
+            yield from iter(lambda: member.read(READ_BYTES), b"")
+
+    # datasets are named after the file, not where it sat in the archive
+    return [(os.path.basename(info.filename), read(info)) for info in members]
+
+
+def _sources(uploads):
+    """(name, chunk iterator) of every CSV in the uploaded files, zip archives expanded."""
+    sources = []
+    for upload in uploads:
+        if upload.name.lower().endswith(ARCHIVE_SUFFIX):
+            sources.extend(_zip_members(upload))
+        else:
+            try:
+                check_csv_name(upload.name)
+            except ValueError as e:
+                raise ValueError(f"{upload.name}: {e}")
+            sources.append((upload.name, upload.chunks()))
+    return sources
+
+
+def save_batch(uploads):
+    """
+    Save every CSV of the uploaded files (zip archives expanded) to
+    content-addressed storage, as BatchFiles in upload order. ValueError
+    when a file is not a CSV, an archive is bad or there are too many or
+    no files; nothing is left stored then.
+    """
+    sources = _sources(uploads)
+    if not sources:
+        raise ValueError("No CSV files in the upload")
+    if len(sources) > settings.BATCH_MAX_FILES:
+        raise ValueError(f"At most {settings.BATCH_MAX_FILES} files per batch")
+
+    files = []
+    try:
+        for name, chunks in sources:
+            saved_path, sha256 = save_chunks(chunks)
+            files.append(BatchFile(name, saved_path, sha256))
+    except ValueError as e:
+        for file in files:
+            release_file(file.saved_path, claimed=True)
+        raise ValueError(f"{name}: {e}")
+    return files
+
+
+def analyze_file(saved_path, stage):
+    """
+    Worker half of a batch file: the analysis, plus the staged columnar
+    copy when stage. Returns (summary, stats state, seconds, StagedDataset
+    or None); the analysis metrics are recorded by the parent process.
+    """
+    start = time.perf_counter()
+    summary = analyze_saved_file(saved_path, record=False)
+    seconds = time.perf_counter() - start
+    if stage:
+        staged = stage_dataset(saved_path, summary)
+        return staged.summary, staged.stats, seconds, staged
+    # only what the response and the rollup need goes back to the parent
+    for key in ("outliers", "outlier_index", "outlier_severity", "sketches"):
+        summary.pop(key, None)
+    stats = summary.pop("stats", None)
+    return summary, stats, seconds, None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _mp_context():
+    # never fork the server process: it runs analysis and prerender threads
+    # and holds database connections, and forking threads can deadlock
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _get_pool():
+    # started on first use: each worker pays for django.setup and the
+    # pandas imports once, not once per batch
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=_workers(),
+                mp_context=_mp_context(),
+                initializer=django.setup,
+            )
+            atexit.register(_pool.shutdown, cancel_futures=True)
+        return _pool
+
+
+def _drop_pool(pool):
+    # a worker died: the pool takes no more work, the next batch starts a new one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _workers(count=None):
+    workers = settings.BATCH_WORKERS or os.cpu_count() or 1
+    return max(1, min(count, workers) if count is not None else workers)
+
+
+def _analyze(tasks):
+    """{sha256: result of analyze_file or the exception} for tasks of (sha256, saved_path, stage)."""
+    results = {}
+    workers = _workers(len(tasks))
+    if workers == 1:
+        # one file or one core: not worth starting processes for
+        for sha256, saved_path, stage in tasks:
+            try:
+                results[sha256] = analyze_file(saved_path, stage)
+            except Exception as e:
+                results[sha256] = e
+        return results
+
+    with span("analysis"):
+        pool = _get_pool()
+        try:
+            futures = {sha256: pool.submit(analyze_file, saved_path, stage) for sha256, saved_path, stage in tasks}
+        except BrokenProcessPool:
+            # a worker died while the pool was idle: once more with a new one
+            _drop_pool(pool)
+            pool = _get_pool()
+            futures = {sha256: pool.submit(analyze_file, saved_path, stage) for sha256, saved_path, stage in tasks}
+        for sha256, future in futures.items():
+            try:
+                results[sha256] = future.result()
+            except BrokenProcessPool as e:
+                _drop_pool(pool)
+                results[sha256] = e
+            except Exception as e:
+                results[sha256] = e
+    return results
+
+
+def ingest_batch(user, files):
+    """
+    Analyze and store the saved BatchFiles of one batch upload for user.
+    Returns the combined summary of the distinct contents analyzed (None
+    if every file failed); per-file outcomes are set on the BatchFiles.
+    """
+    # the last copy of each content stands for it, in that copy's place;
+    # the last HISTORY_LIMIT contents are kept
+    last = {}
+    for file in files:
+        last.pop(file.sha256, None)
+        last[file.sha256] = file
+    kept = set(list(last)[-HISTORY_LIMIT:])
+
+    # one claim per content is enough (see storage.py); each is settled below
+    for file in files:
+        if file is not last[file.sha256]:
+            unclaim(file.saved_path)
+    claimed = set(last)
+
+    def release(sha256):
+        claimed.discard(sha256)
+        release_file(last[sha256].saved_path, claimed=True)
+
+    try:
+        with span("dedup"):
+            known = {}
+            for dataset in Dataset.objects.filter(sha256__in=list(last)).defer("sketches").order_by("uploaded_at"):
+                known[dataset.sha256] = dataset
+        for sha256 in last:
+            cache_lookup("analysis", sha256 in known)
+
+        tasks = [(sha256, file.saved_path, sha256 in kept) for sha256, file in last.items() if sha256 not in known]
+        results = _analyze(tasks) if tasks else {}
+
+        staged = {}
+        outcomes = {}
+        for sha256, file in last.items():
+            if sha256 in known:
+                dataset = known[sha256]
+                outcomes[sha256] = (dataset.summary, dataset_stats(dataset).state())
+                continue
+            result = results[sha256]
+            if isinstance(result, Exception):
+                outcomes[sha256] = result
+                release(sha256)
+                continue
+            summary, stats, seconds, staged_dataset = result
+            record_analysis(summary, seconds)
+            outcomes[sha256] = (summary, stats)
+            if staged_dataset is not None:
+                staged[sha256] = staged_dataset
+            elif sha256 not in kept:
+                # reported only, no dataset will refer to the upload
+                release(sha256)
+
+        entries = [
+            (last[sha256].filename, sha256, staged.get(sha256))
+            for sha256 in last
+            if sha256 in kept and not isinstance(outcomes[sha256], Exception)
+        ]
+        datasets = {}
+        if entries:
+            with span("store"):
+                datasets = dict(zip((sha256 for _, sha256, _ in entries), store_batch(user, entries)))
+        for sha256, dataset in list(datasets.items()):
+            if isinstance(dataset, Exception):
+                # its savepoint was rolled back: reported like a failed analysis
+                outcomes[sha256] = dataset
+                del datasets[sha256]
+                release(sha256)
+            elif sha256 in staged and dataset is not None:
+                schedule_prerender(dataset)
+    finally:
+        # the rest are referred to by their datasets now
+        for sha256 in claimed:
+            unclaim(last[sha256].saved_path)
+
+    combined = None
+    for sha256 in last:
+        outcome = outcomes[sha256]
+        if isinstance(outcome, Exception):
+            continue
+        combined = combined or DatasetStats()
+        combined.merge(DatasetStats.from_state(outcome[1]))
+
+    for file in files:
+        outcome = outcomes[file.sha256]
+        if isinstance(outcome, Exception):
+            file.error = str(outcome)
+            continue
+        file.summary = outcome[0]
+        file.dataset = datasets.get(file.sha256)
+        file.deduplicated = file.sha256 in known or file is not last[file.sha256]
+    return combined.summary() if combined is not None else None
@@ -0,0 +1,140 @@
+import json
+import queue
+import hashlib
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from django.conf import settings
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from .metrics import cache_lookup
+
+# Chart rendering for reports and chart endpoints.
+#
+# Uses the object-oriented Figure API only (never pyplot), so renders don't
+# share global state and can run on several threads at once. Each template
+# keeps a small pool of warm Figure/Axes pairs that are cleared and reused,
+# and finished PNGs are cached by a hash of the template name and input data.
+
+
+def _draw_type_pie(ax, type_distribution):
+    labels = list(type_distribution.keys())
+    values = list(type_distribution.values())
+    ax.pie(values, labels=labels, autopct="%1.1f%%")
+    ax.set_title("Equipment Type Distribution")
+
+
+CHART_TEMPLATES = {
+    "type_pie": {"figsize": (4, 4), "dpi": 150, "draw": _draw_type_pie},
+}
+
+
+class ChartRenderer:
+    """One reusable figure for a template. Not thread-safe; the pool hands it to one caller at a time."""
+
+    def __init__(self, template):
+        self.template = template
+        self.figure = Figure(figsize=template["figsize"])
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111)
+
+    def render(self, data):
+        self.ax.clear()
+        self.template["draw"](self.ax, data)
+        buffer = BytesIO()
+        self.figure.savefig(buffer, format="png", dpi=self.template["dpi"], bbox_inches="tight")
+        return buffer.getvalue()
+
+
+class RendererPool:
+    def __init__(self, template, size):
+        self.template = template
+        self.size = size
+        self.created = 0
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                return ChartRenderer(self.template)
+        return self.idle.get()
+
+    def release(self, renderer):
+        self.idle.put(renderer)
+
+
+class PNGCache:
+    """Thread-safe LRU of rendered PNG bytes."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            png = self.entries.get(key)
+            if png is not None:
+                self.entries.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        with self.lock:
+            self.entries[key] = png
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_cache = None
+
+
+def _get_pool(name):
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = RendererPool(CHART_TEMPLATES[name], settings.CHART_RENDERER_POOL_SIZE)
+        return _pools[name]
+
+
+def _get_cache():
+    global _cache
+    with _pools_lock:
+        if _cache is None:
+            _cache = PNGCache(settings.CHART_CACHE_ENTRIES)
+        return _cache
+
+
+def chart_cache_key(name, data):
+    # keys in their given order: the pie is drawn in it, so differently
+    # ordered data is a different chart
+    payload = json.dumps([name, data], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_chart(name, data):
+    """PNG bytes for template name drawn with data, from cache when possible."""
+    cache = _get_cache()
+    key = chart_cache_key(name, data)
+    png = cache.get(key)
+    cache_lookup("chart", png is not None)
+    if png is not None:
+        return png
+
+    pool = _get_pool(name)
+    renderer = pool.acquire()
+    try:
+        png = renderer.render(data)
+    finally:
+        pool.release(renderer)
+
+    cache.put(key, png)
+    return png
@@ -0,0 +1,306 @@
+import os
+import json
+import shutil
+import uuid
+import tempfile
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .streaming import iter_csv_chunks, DEFAULT_CHUNK_ROWS
+
+# Typed per-column copy of an uploaded CSV, written once at upload time so
+# row reads can memory-map it instead of re-parsing the CSV text.
+#
+# Layout of <MEDIA_ROOT>/columnar/<dataset id>/:
+#   meta.json            row count + column names/kinds
+#   <i>.f8               float64 values of numeric column i (NaN = missing)
+#   <i>.offsets          int64 start offsets (rows + 1) of string column i
+#   <i>.data             utf-8 bytes of string column i
+#   <i>.valid            uint8 1/0 presence flags of string column i
+#   outliers.npy         int64 row numbers of every flagged outlier, most severe first
+#   outlier_severity.npy float64 severity of each of those rows
+
+FORMAT_VERSION = 1
+
+
+def columnar_dir(dataset):
+    return os.path.join(settings.MEDIA_ROOT, "columnar", str(dataset.id))
+
+
+def remove_columnar(dataset):
+    shutil.rmtree(columnar_dir(dataset), ignore_errors=True)
+
+
+def staging_dir():
+    """Fresh path for a columnar copy written before its dataset row exists."""
+    return os.path.join(settings.MEDIA_ROOT, "columnar", f"staging-{uuid.uuid4().hex}")
+
+
+def adopt_columnar(path, dataset):
+    """Move a staged columnar copy into place for dataset (a rename)."""
+    os.replace(path, columnar_dir(dataset))
+
+
+def link_columnar(source, dataset):
+    """Give dataset the columnar copy of source (same content); files are hard-linked where possible."""
+    src = columnar_dir(source)
+    if not os.path.exists(os.path.join(src, "meta.json")):
+        return
+    dst = columnar_dir(dataset)
+    tmp_dir = _tmp_dir(dst)
+    try:
+        for name in os.listdir(src):
+            try:
+                os.link(os.path.join(src, name), os.path.join(tmp_dir, name))
+            except OSError:
+                shutil.copy2(os.path.join(src, name), os.path.join(tmp_dir, name))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _publish(tmp_dir, dst)
+
+
+def _tmp_dir(out_dir):
+    # unique per writer, next to out_dir so publishing it is a rename
+    parent = os.path.dirname(out_dir)
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(dir=parent, prefix=os.path.basename(out_dir) + ".tmp-")
+
+
+def _publish(tmp_dir, out_dir):
+    """
+    Rename a finished tmp_dir to out_dir. If another writer published the
+    same store first, theirs is kept and tmp_dir is dropped.
+    """
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(out_dir, "meta.json")):
+            raise
+
+
+def write_outlier_index(out_dir, rows, severity):
+    """Store the full outlier index of a dataset next to its columns, most severe first."""
+    rows = np.asarray(rows, dtype="<i8")
+    severity = np.asarray(severity, dtype="<f8")
+    order = np.argsort(-severity, kind="stable")
+    np.save(os.path.join(out_dir, "outliers.npy"), rows[order])
+    np.save(os.path.join(out_dir, "outlier_severity.npy"), severity[order])
+
+
+def _is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def write_columnar(csv_path, out_dir, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None):
+    """
+    Convert csv_path into the columnar layout above, one chunk at a time.
+    Column kinds are taken from the first chunk. When a later chunk shows
+    that a column can't keep its values as written (text in a numeric
+    column, numbers parsed out of a text column), the file is written
+    again with those columns read as text, so every value is served as
+    uploaded.
+
+    The store is written to a temporary directory of its own and renamed
+    into place, so concurrent writers of the same store (two requests
+    building a legacy dataset's copy) don't disturb each other; the first
+    to finish wins and the others read its copy.
+    """
+    tmp_dir = _tmp_dir(out_dir)
+    try:
+        text = set()
+        while True:
+            demoted = _write_columns(csv_path, tmp_dir, chunk_rows, progress, text)
+            if not demoted:
+                break
+            text |= demoted
+            # the rewrite would report progress from zero again
+            progress = None
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _publish(tmp_dir, out_dir)
+    return ColumnarStore(out_dir)
+
+
+def _keeps_text(col, series, values):
+    """False if a chunk of col has values its kind would change: text that isn't a number, numbers in text."""
+    if col["kind"] == "float":
+        return not (np.isnan(values) & series.notna().to_numpy()).any()
+    return not series.notna().any() or pd.api.types.infer_dtype(series, skipna=True) == "string"
+
+
+def _write_columns(csv_path, tmp_dir, chunk_rows, progress, text):
+    """
+    One pass of write_columnar into tmp_dir, the columns named in text
+    read as strings. Returns the names of the columns that must be read
+    as text too (the pass is then incomplete), else an empty set.
+    """
+    for name in os.listdir(tmp_dir):
+        os.remove(os.path.join(tmp_dir, name))
+
+    columns = None
+    handles = {}
+    offsets = {}
+    rows = 0
+    demoted = set()
+
+    options = {"dtype": {name: str for name in text}} if text else {}
+    try:
+        for chunk in iter_csv_chunks(csv_path, chunk_rows, progress, **options):
+            if columns is None:
+                columns = []
+                for i, name in enumerate(chunk.columns):
+                    if _is_numeric(chunk[name]):
+                        columns.append({"name": name, "kind": "float", "integer": True})
+                        handles[i] = [open(os.path.join(tmp_dir, f"{i}.f8"), "wb")]
+                    else:
+                        columns.append({"name": name, "kind": "string"})
+                        handles[i] = [
+                            open(os.path.join(tmp_dir, f"{i}.offsets"), "wb"),
+                            open(os.path.join(tmp_dir, f"{i}.data"), "wb"),
+                            open(os.path.join(tmp_dir, f"{i}.valid"), "wb"),
+                        ]
+                        handles[i][0].write(np.zeros(1, dtype="<i8").tobytes())
+                        offsets[i] = 0
+
+            for i, col in enumerate(columns):
+                series = chunk.iloc[:, i]
+                values = None
+                if col["kind"] == "float":
+                    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="<f8")
+                if not _keeps_text(col, series, values):
+                    demoted.add(col["name"])
+                if demoted:
+                    # this pass is redone: only look for more such columns
+                    continue
+                if col["kind"] == "float":
+                    col["integer"] = col["integer"] and pd.api.types.is_integer_dtype(series)
+                    handles[i][0].write(values.tobytes())
+                else:
+                    valid = series.notna().to_numpy()
+                    encoded = [str(v).encode("utf-8") if ok else b"" for v, ok in zip(series.tolist(), valid)]
+                    lengths = np.fromiter((len(b) for b in encoded), dtype="<i8", count=len(encoded))
+                    ends = offsets[i] + np.cumsum(lengths)
+                    if len(ends):
+                        offsets[i] = int(ends[-1])
+                    handles[i][0].write(ends.astype("<i8").tobytes())
+                    handles[i][1].write(b"".join(encoded))
+                    handles[i][2].write(valid.astype("u1").tobytes())
+            rows += len(chunk)
+    finally:
+        for files in handles.values():
+            for f in files:
+                f.close()
+    if demoted:
+        return demoted
+
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"version": FORMAT_VERSION, "rows": rows, "columns": columns or []}, f)
+    return demoted
+
+
+def _float_list(values, col):
+    if col.get("integer"):
+        return values.astype("int64").tolist()
+    # blank cells are NaN on disk and null in JSON
+    missing = np.isnan(values)
+    if not missing.any():
+        return values.tolist()
+    return [None if m else v for v, m in zip(values.tolist(), missing.tolist())]
+
+
+class ColumnarStore:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.rows = meta["rows"]
+        self.columns = meta["columns"]
+        self._maps = {}
+
+    @property
+    def names(self):
+        return [c["name"] for c in self.columns]
+
+    def _map(self, filename, dtype, count):
+        if filename not in self._maps:
+            if count == 0:
+                self._maps[filename] = np.zeros(0, dtype=dtype)
+            else:
+                self._maps[filename] = np.memmap(os.path.join(self.path, filename), dtype=dtype, mode="r", shape=(count,))
+        return self._maps[filename]
+
+    def column(self, name):
+        """Memory-mapped float64 array of a numeric column."""
+        i = self.names.index(name)
+        if self.columns[i]["kind"] != "float":
+            raise ValueError(f"Column {name} is not numeric")
+        return self._map(f"{i}.f8", "<f8", self.rows)
+
+    def _slice(self, i, start, stop):
+        col = self.columns[i]
+        if col["kind"] == "float":
+            return _float_list(np.array(self._map(f"{i}.f8", "<f8", self.rows)[start:stop]), col)
+
+        all_offs = self._map(f"{i}.offsets", "<i8", self.rows + 1)
+        offs = all_offs[start:stop + 1]
+        valid = self._map(f"{i}.valid", "u1", self.rows)[start:stop]
+        if not len(valid):
+            return []
+        data = self._map(f"{i}.data", "u1", int(all_offs[-1]))
+        blob = bytes(data[offs[0]:offs[-1]])
+        base = int(offs[0])
+        return [
+            blob[a - base:b - base].decode("utf-8") if ok else None
+            for a, b, ok in zip(offs[:-1].tolist(), offs[1:].tolist(), valid.tolist())
+        ]
+
+    def _take(self, i, indices):
+        col = self.columns[i]
+        if col["kind"] == "float":
+            return _float_list(self._map(f"{i}.f8", "<f8", self.rows)[indices], col)
+
+        offs = self._map(f"{i}.offsets", "<i8", self.rows + 1)
+        valid = self._map(f"{i}.valid", "u1", self.rows)[indices]
+        if not len(indices):
+            return []
+        data = self._map(f"{i}.data", "u1", int(offs[-1]))
+        return [
+            bytes(data[a:b]).decode("utf-8") if ok else None
+            for a, b, ok in zip(offs[indices].tolist(), offs[indices + 1].tolist(), valid.tolist())
+        ]
+
+    def take(self, indices):
+        """Rows at the given (in-range) row numbers, in that order."""
+        indices = np.asarray(indices, dtype=np.int64)
+        names = self.names
+        values = [self._take(i, indices) for i in range(len(names))]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def outlier_index(self):
+        """(rows, severity) memory-mapped from the outlier index, or None if it wasn't written."""
+        rows_path = os.path.join(self.path, "outliers.npy")
+        if not os.path.exists(rows_path):
+            return None
+        return (
+            np.load(rows_path, mmap_mode="r"),
+            np.load(os.path.join(self.path, "outlier_severity.npy"), mmap_mode="r"),
+        )
+
+    def read_rows(self, start=0, stop=None):
+        start = max(0, min(start, self.rows))
+        stop = self.rows if stop is None else max(start, min(stop, self.rows))
+        names = self.names
+        values = [self._slice(i, start, stop) for i in range(len(names))]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def open_columnar(dataset):
+    """Columnar store for dataset, building it from the CSV if it is missing."""
+    path = columnar_dir(dataset)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return write_columnar(dataset.file.path, path, settings.ANALYSIS_CHUNK_ROWS)
+    return ColumnarStore(path)
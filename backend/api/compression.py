@@ -0,0 +1,182 @@
+import io
+import os
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for .csv.zst uploads / zstd storage
+    zstandard = None
+
+# The one place that knows about compressed CSVs. Stored uploads may be
+# plain, gzip or zstd; readers call open_csv / decompressing and always get
+# plain CSV bytes, the format being sniffed from the magic bytes rather
+# than trusted from a file name.
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+CSV_SUFFIXES = (".csv", ".csv.gz", ".csv.zst")
+EXTENSIONS = {"none": ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"}
+
+# assumed plain/compressed size ratio of equipment CSVs, for size estimates
+COMPRESSION_RATIO = 10
+
+# piece size read from the zstd decompressor
+OUTPUT_BYTES = 1024 * 1024
+
+
+def sniff(head):
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "none"
+
+
+def _require_zstd():
+    if zstandard is None:
+        raise ValueError("zstd support needs the zstandard package on the server")
+
+
+def check_csv_name(filename):
+    """Raise ValueError unless filename is a CSV, optionally .gz / .zst compressed."""
+    name = filename.lower()
+    if not name.endswith(CSV_SUFFIXES):
+        raise ValueError("Only CSV allowed (.csv, .csv.gz or .csv.zst)")
+    if name.endswith(".zst"):
+        _require_zstd()
+
+
+def decompressing(fileobj):
+    """
+    Readable binary stream of the plain CSV inside fileobj (seekable, opened "rb").
+    fileobj is not closed by the returned stream.
+    """
+    pos = fileobj.tell()
+    codec = sniff(fileobj.read(4))
+    fileobj.seek(pos)
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if codec == "zstd":
+        _require_zstd()
+        reader = zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True, closefd=False)
+        return io.BufferedReader(reader)
+    return fileobj
+
+
+def csv_size_estimate(path):
+    """Plain CSV size of a stored file; compressed files are estimated with COMPRESSION_RATIO."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if sniff(f.read(4)) != "none":
+            size *= COMPRESSION_RATIO
+    return size
+
+
+def open_csv(path):
+    """Open a stored CSV for reading plain bytes, whatever it was compressed with."""
+    with open(path, "rb") as f:
+        codec = sniff(f.read(4))
+    if codec == "gzip":
+        return gzip.open(path, "rb")
+    if codec == "zstd":
+        _require_zstd()
+        return io.BufferedReader(zstandard.open(path, "rb"))
+    return open(path, "rb")
+
+
+def _gunzip(first, chunks):
+    d = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    started = False
+    for data in _chain(first, chunks):
+        while data:
+            started = True
+            out = d.decompress(data)
+            if out:
+                yield out
+            data = b""
+            if d.eof:
+                # concatenated gzip members
+                data = d.unused_data
+                d = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+                started = False
+    if started:
+        raise ValueError("Compressed upload is truncated")
+
+
+def _unzstd(first, chunks):
+    _require_zstd()
+    reader = zstandard.ZstdDecompressor().stream_reader(_IterReader(_chain(first, chunks)), read_across_frames=True)
+    while True:
+        out = reader.read(OUTPUT_BYTES)
+        if not out:
+            break
+        yield out
+
+
+def _chain(first, chunks):
+    yield first
+    yield from chunks
+
+
+class _IterReader(io.RawIOBase):
+    """Minimal file-like over an iterator of byte strings."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.buffer:
+            self.buffer = next(self.chunks, None)
+            if self.buffer is None:
+                self.buffer = b""
+                return 0
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+def decompress_chunks(chunks):
+    """Plain CSV bytes from an iterable of (possibly gzip / zstd compressed) byte strings."""
+    chunks = iter(chunks)
+    first = b""
+    while len(first) < 4:
+        data = next(chunks, None)
+        if data is None:
+            break
+        first += data
+    codec = sniff(first)
+    if codec == "gzip":
+        return _gunzip(first, chunks)
+    if codec == "zstd":
+        return _unzstd(first, chunks)
+    return _chain(first, chunks)
+
+
+def compressing(fileobj, codec, level):
+    """Writable stream compressing into fileobj with codec (gzip, zstd or none); close() leaves fileobj open."""
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=level, mtime=0)
+    if codec == "zstd":
+        _require_zstd()
+        return zstandard.ZstdCompressor(level=level).stream_writer(fileobj, closefd=False)
+    if codec == "none":
+        return _Uncompressed(fileobj)
+    raise ValueError(f"Unknown storage compression: {codec}")
+
+
+class _Uncompressed:
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+
+    def write(self, data):
+        return self.fileobj.write(data)
+
+    def close(self):
+        self.fileobj.flush()
@@ -0,0 +1,424 @@
+import numpy as np
+import pandas as pd
+from functools import cached_property
+
+from .compression import open_csv
+from .timing import span
+from .sketches import DistributionSketch
+from .schema import NUMERIC_COLUMNS, check_columns, conform, parser, read_options
+from .streaming import MomentAccumulator, TypeAccumulator, grouped_sums, iter_csv_chunks
+from .outliers import (
+    DEFAULT_TOP_K, RowSample, TopKRecords, build_detector, flag, outlier_summary, resolve_threshold,
+)
+
+# The CSV analysis engine.
+#
+# Every summary metric is a plugin registered with @register: it names the
+# shared intermediates it needs ("moments", "groups", "sorted") and folds
+# Batch objects into a mergeable state. Each block of rows becomes one
+# Batch whose intermediates are computed once, vectorized, and shared by
+# all metrics: pairwise moments by matrix products, per-Type sums by a
+# bincount over categorical codes, sorted finite values per column.
+#
+# analyze_csv runs the metrics over a file read whole or in chunks (same
+# code, same results) and then scores outliers with a detector fitted from
+# them; the chunked mode reads the file a second time for that.
+
+# rows sampled to fit the median/quantile outlier detectors in chunked mode
+DEFAULT_SAMPLE_ROWS = 200_000
+
+INTERMEDIATES = ("moments", "groups", "sorted")
+
+# metrics stored as Dataset.stats (DatasetStats) and the one stored as Dataset.sketches
+STATS_METRICS = ("total", "moments", "types")
+ANALYSIS_METRICS = STATS_METRICS + ("sketches",)
+
+METRICS = {}
+
+
+def register(cls):
+    unknown = set(cls.needs) - set(INTERMEDIATES)
+    if unknown:
+        raise ValueError(f"{cls.__name__} needs unknown intermediates: {', '.join(sorted(unknown))}")
+    METRICS[cls.name] = cls
+    return cls
+
+
+class Batch:
+    """A block of rows and the intermediates computed from it, each at most once."""
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def __len__(self):
+        return len(self.frame)
+
+    @cached_property
+    def values(self):
+        # rows x NUMERIC_COLUMNS as float64, anything unparseable as NaN
+        columns = [
+            self.frame[col] if pd.api.types.is_numeric_dtype(self.frame[col])
+            else pd.to_numeric(self.frame[col], errors="coerce")
+            for col in NUMERIC_COLUMNS
+        ]
+        return np.column_stack([c.to_numpy(dtype=float, na_value=np.nan) for c in columns])
+
+    @cached_property
+    def codes(self):
+        """(codes, uniques): Type as integer codes into uniques, -1 where missing; only Types present here."""
+        types = self.frame["Type"]
+        if not isinstance(types.dtype, pd.CategoricalDtype):
+            codes, uniques = pd.factorize(types)
+            return codes, list(uniques)
+        codes = types.cat.codes.to_numpy().astype(np.int64)
+        used = np.flatnonzero(np.bincount(codes[codes >= 0], minlength=len(types.cat.categories)))
+        remap = np.full(len(types.cat.categories), -1, dtype=np.int64)
+        remap[used] = np.arange(len(used))
+        return np.where(codes >= 0, remap[codes], -1), list(types.cat.categories[used])
+
+    @cached_property
+    def moments(self):
+        return MomentAccumulator.from_array(self.values)
+
+    @cached_property
+    def groups(self):
+        """(uniques, rows, sums, counts) per Type, see streaming.grouped_sums."""
+        codes, uniques = self.codes
+        return (uniques, *grouped_sums(codes, len(uniques), self.values))
+
+    @cached_property
+    def sorted(self):
+        """Sorted finite values of each numeric column."""
+        return [np.sort(col[np.isfinite(col)]) for col in self.values.T]
+
+    def prepare(self, needs):
+        for name in INTERMEDIATES:
+            if name in needs:
+                getattr(self, name)
+
+
+class Metric:
+    """Base of the metric plugins: a mergeable state folded from Batches."""
+    name = None
+    needs = ()
+
+    def update(self, batch):
+        raise NotImplementedError
+
+    def merge(self, other):
+        raise NotImplementedError
+
+    def state(self):
+        raise NotImplementedError
+
+    @classmethod
+    def from_state(cls, state):
+        raise NotImplementedError
+
+    def summary(self):
+        """Keys this metric adds to the summary."""
+        return {}
+
+
+@register
+class TotalMetric(Metric):
+    name = "total"
+
+    def __init__(self):
+        self.total = 0
+
+    def update(self, batch):
+        self.total += len(batch)
+
+    def merge(self, other):
+        self.total += other.total
+        return self
+
+    def state(self):
+        return self.total
+
+    @classmethod
+    def from_state(cls, state):
+        metric = cls()
+        metric.total = state
+        return metric
+
+    def summary(self):
+        return {"total_equipment": int(self.total)}
+
+
+@register
+class MomentMetric(Metric):
+    """Per-column means and the pairwise-complete correlation matrix."""
+    name = "moments"
+    needs = ("moments",)
+
+    def __init__(self, acc=None):
+        self.acc = acc or MomentAccumulator(len(NUMERIC_COLUMNS))
+
+    def update(self, batch):
+        self.acc.merge(batch.moments)
+
+    def merge(self, other):
+        self.acc.merge(other.acc)
+        return self
+
+    def state(self):
+        return self.acc.state()
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(MomentAccumulator.from_state(state))
+
+    def summary(self):
+        means = self.acc.means()
+        corr = self.acc.corr()
+        return {
+            "avg_flowrate": float(means[0]),
+            "avg_pressure": float(means[1]),
+            "avg_temperature": float(means[2]),
+            "correlation": {
+                col: {row: round(float(corr[i, j]), 3) for i, row in enumerate(NUMERIC_COLUMNS)}
+                for j, col in enumerate(NUMERIC_COLUMNS)
+            },
+        }
+
+
+@register
+class TypeMetric(Metric):
+    """Type distribution and per-Type averages."""
+    name = "types"
+    needs = ("groups",)
+
+    def __init__(self, acc=None):
+        self.acc = acc or TypeAccumulator(len(NUMERIC_COLUMNS))
+
+    def update(self, batch):
+        self.acc.add_groups(*batch.groups)
+
+    def merge(self, other):
+        self.acc.merge(other.acc)
+        return self
+
+    def state(self):
+        return self.acc.state()
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(TypeAccumulator.from_state(state))
+
+    def summary(self):
+        return {
+            "type_distribution": self.acc.distribution(),
+            "typewise_averages": self.acc.averages(NUMERIC_COLUMNS),
+        }
+
+
+@register
+class SketchMetric(Metric):
+    """Quantile and histogram sketches (served by the distribution endpoint, not in the summary)."""
+    name = "sketches"
+    needs = ("sorted",)
+
+    def __init__(self, sketch=None):
+        self.sketch = sketch or DistributionSketch(NUMERIC_COLUMNS)
+
+    def update(self, batch):
+        codes, uniques = batch.codes
+        self.sketch.update_grouped(codes, uniques, batch.values, batch.sorted)
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        return self
+
+    def state(self):
+        return self.sketch.state()
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(DistributionSketch.from_state(state))
+
+
+class MetricSet:
+    """A set of registered metrics updated together from shared Batches."""
+
+    NAMES = ANALYSIS_METRICS
+
+    def __init__(self, names=None):
+        self.metrics = {name: METRICS[name]() for name in (names or self.NAMES)}
+        self.needs = {need for metric in self.metrics.values() for need in metric.needs}
+
+    def __getitem__(self, name):
+        return self.metrics[name]
+
+    def update(self, batch):
+        batch.prepare(self.needs)
+        for metric in self.metrics.values():
+            metric.update(batch)
+
+    def merge(self, other):
+        for name, metric in self.metrics.items():
+            metric.merge(other.metrics[name])
+        return self
+
+    def state(self, names=None):
+        return {name: self.metrics[name].state() for name in (names or self.metrics)}
+
+    @classmethod
+    def from_state(cls, state):
+        metrics = cls(list(state))
+        metrics.metrics = {name: METRICS[name].from_state(s) for name, s in state.items()}
+        return metrics
+
+    def summary(self):
+        summary = {}
+        for metric in self.metrics.values():
+            summary.update(metric.summary())
+        return summary
+
+
+class DatasetStats(MetricSet):
+    """
+    Sufficient statistics of one or more datasets: row count, pairwise
+    moments of the numeric columns and per-Type counts / sums.
+
+    Everything the summary reports except outliers follows from this state,
+    and merging two states gives the state of the concatenated data, so a
+    rollup over many datasets never needs their raw files.
+    """
+
+    NAMES = STATS_METRICS
+
+    @property
+    def moments(self):
+        return self.metrics["moments"].acc
+
+    @property
+    def types(self):
+        return self.metrics["types"].acc
+
+    @property
+    def total(self):
+        return self.metrics["total"].total
+
+
+def read_header(path):
+    """Column names of a stored CSV; ValueError if it has no header or misses a required column."""
+    with open_csv(path) as f:
+        try:
+            columns = pd.read_csv(f, nrows=0).columns
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            raise ValueError(f"Could not read CSV: {e}")
+    check_columns(columns)
+    return columns
+
+
+def read_frame(path):
+    """The declared columns of a stored CSV as one DataFrame (see schema.py)."""
+    read_header(path)
+    engine = parser()
+    with span("parse"):
+        try:
+            with open_csv(path) as f:
+                return pd.read_csv(f, **read_options(engine))
+        except ValueError:
+            # text in a parameter column
+            with open_csv(path) as f:
+                return conform(pd.read_csv(f, **read_options(engine, strict=False)))
+
+
+def iter_batches(path, chunk_rows, progress=None):
+    """Batches of the declared columns, chunk_rows rows at a time."""
+    read_header(path)
+    done = 0
+    try:
+        for chunk in iter_csv_chunks(path, chunk_rows, progress, **read_options(parser(chunked=True))):
+            done += len(chunk)
+            yield Batch(chunk)
+    except ValueError:
+        # text in a parameter column: re-read leniently and drop the rows
+        # already seen, counted as parsed rows (blank lines and quoted
+        # newlines make file lines a different count)
+        options = read_options(parser(chunked=True), strict=False)
+        for chunk in iter_csv_chunks(path, chunk_rows, progress, **options):
+            if done >= len(chunk):
+                done -= len(chunk)
+                continue
+            yield Batch(conform(chunk.iloc[done:].reset_index(drop=True)))
+            done = 0
+
+
+def scan(batches, names=ANALYSIS_METRICS, sample=None):
+    """Fold batches into a MetricSet of names (and sample, if given) in one pass."""
+    metrics = MetricSet(names)
+    for batch in batches:
+        with span("stats"):
+            metrics.update(batch)
+            if sample is not None:
+                sample.update(batch.values)
+    return metrics
+
+
+def analyze_csv(path, chunk_rows=None, progress=None,
+                outlier_method="zscore", outlier_threshold=None,
+                outlier_top_k=DEFAULT_TOP_K, outlier_sample_rows=DEFAULT_SAMPLE_ROWS):
+    """
+    Summary of an equipment CSV: (summary, DataFrame), or (summary, None)
+    with chunk_rows.
+
+    Without chunk_rows the file is read once and everything runs on the one
+    DataFrame. With chunk_rows it is read twice in bounded-size chunks: the
+    metrics in the first pass, outlier scoring in the second, so memory
+    depends on chunk_rows and the number of flagged rows, not file size.
+    The quantile-based detectors (mad, iqr) are then fitted on a uniform
+    sample of outlier_sample_rows rows taken during the first pass.
+    Only the outlier_top_k most severe outlier records are kept.
+
+    progress, if given, is called with a 0..1 fraction (chunked mode only).
+    """
+    threshold = resolve_threshold(outlier_method, outlier_threshold)
+    needs_sample = outlier_method in ("mad", "iqr")
+
+    if chunk_rows:
+        first_pass = second_pass = None
+        if progress:
+            first_pass = lambda p: progress(p / 2)
+            second_pass = lambda p: progress(0.5 + p / 2)
+        df = None
+        batches = lambda pass_progress: iter_batches(path, chunk_rows, pass_progress)
+    else:
+        df = read_frame(path)
+        whole = Batch(df)
+        first_pass = second_pass = None
+        batches = lambda pass_progress: [whole]
+
+    sample = RowSample(outlier_sample_rows) if chunk_rows else None
+    metrics = scan(batches(first_pass), sample=sample if needs_sample else None)
+
+    with span("outliers"):
+        fit_rows = sample.values if chunk_rows else whole.values
+        detector = build_detector(outlier_method, metrics["moments"].acc, fit_rows if needs_sample else None)
+
+    top = TopKRecords(outlier_top_k)
+    flagged_rows, flagged_severity = [], []
+    offset = 0
+    for batch in batches(second_pass):
+        with span("outliers"):
+            rows, severity = flag(detector, batch.values, threshold)
+            top.offer(batch.frame, rows, severity, offset)
+        flagged_rows.append(rows + offset)
+        flagged_severity.append(severity)
+        offset += len(batch)
+
+    summary = {
+        **metrics.summary(),
+        **outlier_summary(
+            outlier_method, threshold, top.result(),
+            np.concatenate(flagged_rows or [np.zeros(0, dtype=np.int64)]),
+            np.concatenate(flagged_severity or [np.zeros(0)]),
+        ),
+        # mergeable state for cross-dataset rollups (see rollup.py)
+        "stats": metrics.state(STATS_METRICS),
+        "sketches": metrics["sketches"].state(),
+    }
+    return summary, df
@@ -0,0 +1,226 @@
+import os
+import time
+import shutil
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Dataset, Outlier
+from .utils import analyze_equipment_csv
+from .columnar import (
+    staging_dir, adopt_columnar, write_columnar, write_outlier_index, link_columnar, remove_columnar,
+)
+from .storage import release_file
+from .compression import csv_size_estimate
+from .reports import remove_reports
+from .metrics import ROWS_ANALYZED, ANALYSIS_SECONDS
+
+# datasets kept per user
+HISTORY_LIMIT = 5
+
+
+def analyze_saved_file(saved_path, progress=None, record=True):
+    """
+    Run the analysis on a file already in default_storage, chunked if large.
+    record=False leaves the analysis metrics to the caller (see record_analysis).
+    """
+    full_path = os.path.join(settings.MEDIA_ROOT, saved_path)
+
+    chunk_rows = None
+    if csv_size_estimate(full_path) > settings.ANALYSIS_STREAMING_THRESHOLD_BYTES:
+        chunk_rows = settings.ANALYSIS_CHUNK_ROWS
+
+    start = time.perf_counter()
+    summary, df = analyze_equipment_csv(
+        full_path, chunk_rows=chunk_rows, progress=progress,
+        outlier_method=settings.OUTLIER_METHOD,
+        outlier_threshold=settings.OUTLIER_THRESHOLD,
+        outlier_top_k=settings.OUTLIER_TOP_K,
+    )
+    if record:
+        record_analysis(summary, time.perf_counter() - start)
+    return summary
+
+
+def record_analysis(summary, seconds):
+    ANALYSIS_SECONDS.inc(seconds)
+    ROWS_ANALYZED.inc(summary["total_equipment"])
+
+
+class StagedDataset:
+    """An analyzed upload whose columnar copy is written but whose Dataset row isn't, see stage_dataset."""
+
+    def __init__(self, saved_path, summary, outliers, stats, sketches, directory):
+        self.saved_path = saved_path
+        self.summary = summary
+        self.outliers = outliers
+        self.stats = stats
+        self.sketches = sketches
+        self.directory = directory
+
+    def discard(self):
+        # no-op once create_dataset has moved the directory into place
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def stage_dataset(saved_path, summary, progress=None):
+    """
+    The slow, transaction-free half of storing an analysis: the top outlier
+    records are split off a copy of summary (into the Outlier table, later)
+    and the columnar copy plus the full outlier index are written to a
+    staging directory. Needs no database, so it can run in a worker process.
+    """
+    full_path = os.path.join(settings.MEDIA_ROOT, saved_path)
+
+    # the caller's summary is left whole, e.g. for the upload response
+    summary = dict(summary)
+    outliers = summary.pop("outliers", [])
+    index = summary.pop("outlier_index", None)
+    severity = summary.pop("outlier_severity", None)
+    summary.setdefault("outlier_count", len(outliers))
+    stats = summary.pop("stats", None)
+    sketches = summary.pop("sketches", None)
+
+    # typed copy for row reads
+    directory = staging_dir()
+    try:
+        write_columnar(full_path, directory, settings.ANALYSIS_CHUNK_ROWS, progress)
+        if index is not None:
+            write_outlier_index(directory, index, severity)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return StagedDataset(saved_path, summary, outliers, stats, sketches, directory)
+
+
+def create_dataset(user, staged, filename="", sha256=""):
+    """Insert the Dataset and Outlier rows of a StagedDataset and move its columnar copy into place. Call inside a transaction."""
+    dataset = Dataset.objects.create(
+        uploader_id=user.id,
+        file=staged.saved_path,
+        filename=filename or os.path.basename(staged.saved_path),
+        sha256=sha256,
+        summary=staged.summary,
+        stats=staged.stats,
+        sketches=staged.sketches,
+    )
+    Outlier.objects.bulk_create(
+        (Outlier(dataset=dataset, position=i, data=o) for i, o in enumerate(staged.outliers)),
+        batch_size=1000,
+    )
+    adopt_columnar(staged.directory, dataset)
+    return dataset
+
+
+def store_dataset(user, saved_path, summary, progress=None, filename="", sha256=""):
+    """
+    Create the Dataset row, write its columnar copy and prune old uploads.
+
+    The slow part is staged first (see stage_dataset), so the write
+    transaction only inserts the rows, renames the staging directory and
+    bulk-deletes expired datasets. Their files are removed after commit.
+    """
+    staged = stage_dataset(saved_path, summary, progress)
+    try:
+        with transaction.atomic():
+            dataset = create_dataset(user, staged, filename, sha256)
+            _prune(user)
+    finally:
+        staged.discard()
+    return dataset
+
+
+def store_batch(user, entries):
+    """
+    Datasets for a batch upload, created in one transaction with a single
+    prune. entries are (filename, sha256, staged) in upload order; staged
+    is None for content that was already analyzed, which is reused as by
+    reuse_dataset (that dataset may be None if its source is gone).
+
+    Each entry gets a savepoint of its own: one that fails (e.g. a summary
+    the database rejects) is rolled back alone and its exception is
+    returned in its place, the rest of the batch is still stored.
+    """
+    datasets = []
+    try:
+        with transaction.atomic():
+            for filename, sha256, staged in entries:
+                try:
+                    with transaction.atomic():
+                        if staged is not None:
+                            datasets.append(create_dataset(user, staged, filename, sha256))
+                        else:
+                            datasets.append(reuse_dataset(user, sha256, filename, prune=False))
+                except Exception as e:
+                    datasets.append(e)
+            _prune(user)
+    finally:
+        for _, _, staged in entries:
+            if staged is not None:
+                staged.discard()
+    return datasets
+
+
+def reuse_dataset(user, sha256, filename, prune=True):
+    """
+    Dataset for an upload whose content was already analyzed, or None.
+
+    The user's own copy is moved to the top of their history; a copy
+    uploaded by someone else is cloned (summary, outliers and columnar
+    files) without running the analysis again. prune=False leaves the
+    history trimming to the caller's transaction.
+    """
+    own = Dataset.objects.filter(uploader_id=user.id, sha256=sha256).order_by("-uploaded_at").first()
+    if own is not None:
+        Dataset.objects.filter(id=own.id).update(uploaded_at=timezone.now(), filename=filename)
+        own.refresh_from_db()
+        return own
+
+    source = Dataset.objects.filter(sha256=sha256).order_by("-uploaded_at").first()
+    if source is None:
+        return None
+    outliers = list(source.outlier_rows.values_list("position", "data"))
+
+    with transaction.atomic():
+        dataset = Dataset.objects.create(
+            uploader_id=user.id,
+            file=source.file.name,
+            filename=filename,
+            sha256=sha256,
+            summary=source.summary,
+            stats=source.stats,
+            sketches=source.sketches,
+        )
+        Outlier.objects.bulk_create(
+            (Outlier(dataset=dataset, position=p, data=o) for p, o in outliers),
+            batch_size=1000,
+        )
+        link_columnar(source, dataset)
+        if prune:
+            _prune(user)
+    return dataset
+
+
+def _prune(user):
+    """
+    Bulk-delete the user's datasets past HISTORY_LIMIT (Outlier rows
+    cascade). Must run inside the caller's transaction; their files are
+    released once it commits.
+    """
+    expired = list(
+        Dataset.objects.filter(uploader_id=user.id)
+        .order_by("-uploaded_at")
+        .only("id", "file")[HISTORY_LIMIT:]
+    )
+    if not expired:
+        return
+    Dataset.objects.filter(id__in=[d.id for d in expired]).delete()
+    transaction.on_commit(lambda: remove_dataset_files(expired))
+
+
+def remove_dataset_files(datasets):
+    """Delete what deleted datasets left on disk (uploads are shared between identical datasets)."""
+    for dataset in datasets:
+        release_file(dataset.file.name)
+        remove_columnar(dataset)
+        remove_reports(dataset)
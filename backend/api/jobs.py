@@ -0,0 +1,163 @@
+import time
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AnalysisJob
+from .ingest import analyze_saved_file, store_dataset
+from .storage import release_file
+from .reports import prerender_report
+
+# Background analysis for async uploads.
+#
+# AnalysisJob rows are the queue: a job is claimed by flipping it from
+# queued to running in a single UPDATE, so the in-process pool and the
+# run_analysis_jobs management command can both drain it without running
+# anything twice. Jobs left queued by a restarted worker are picked up by
+# that command; ones it left running are failed once nothing has been
+# heard from them (progress updates) for ANALYSIS_JOB_TIMEOUT_SECONDS.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ANALYSIS_WORKERS,
+                thread_name_prefix="analysis",
+            )
+        return _executor
+
+
+def enqueue(job):
+    # only hand the job to a worker once its row is visible
+    transaction.on_commit(lambda: _get_executor().submit(run_job, job.id))
+
+
+def schedule_prerender(dataset):
+    # warm the PDF cache in the background so the first download is a file read
+    if settings.REPORT_PRERENDER:
+        transaction.on_commit(lambda: _get_executor().submit(prerender_report, dataset.id))
+
+
+class _ProgressWriter:
+    """Maps a 0..1 fraction onto [start, start + span] and throttles DB writes."""
+
+    def __init__(self, job_id, start, span):
+        self.job_id = job_id
+        self.start = start
+        self.span = span
+        self.last_value = start
+        self.last_time = time.monotonic()
+
+    def __call__(self, fraction):
+        value = self.start + self.span * fraction
+        now = time.monotonic()
+        if value - self.last_value < 0.05 and now - self.last_time < 1.0:
+            return
+        self.last_value, self.last_time = value, now
+        # doubles as the job's heartbeat
+        AnalysisJob.objects.filter(id=self.job_id).update(progress=round(value, 3), updated_at=timezone.now())
+
+
+def _claim(job_id):
+    now = timezone.now()
+    return AnalysisJob.objects.filter(id=job_id, status=AnalysisJob.QUEUED).update(
+        status=AnalysisJob.RUNNING,
+        started_at=now,
+        updated_at=now,
+    ) == 1
+
+
+def _finish(job_id, status, **fields):
+    # a job already failed as stale stays failed
+    AnalysisJob.objects.filter(id=job_id, status=AnalysisJob.RUNNING).update(
+        status=status,
+        finished_at=timezone.now(),
+        **fields
+    )
+
+
+def run_job(job_id):
+    close_old_connections()
+    try:
+        if not _claim(job_id):
+            return
+        job = AnalysisJob.objects.select_related("uploader").get(id=job_id)
+
+        try:
+            summary = analyze_saved_file(job.file, _ProgressWriter(job.id, 0.0, 0.9))
+        except Exception as e:
+            _finish(job.id, AnalysisJob.FAILED, error=str(e))
+            release_file(job.file)
+            return
+
+        dataset = store_dataset(
+            job.uploader, job.file, summary, _ProgressWriter(job.id, 0.9, 0.1),
+            filename=job.filename, sha256=job.sha256,
+        )
+        _finish(job.id, AnalysisJob.DONE, progress=1.0, dataset=dataset)
+        schedule_prerender(dataset)
+    except Exception as e:
+        _finish(job_id, AnalysisJob.FAILED, error=str(e))
+    finally:
+        close_old_connections()
+
+
+def fail_stale_jobs(timeout=None):
+    """
+    Fail running jobs that haven't reported progress for timeout seconds
+    (ANALYSIS_JOB_TIMEOUT_SECONDS): their worker was killed or restarted,
+    so nothing would ever finish them. Their uploads are left to the
+    storage sweeper. Returns how many.
+    """
+    if timeout is None:
+        timeout = settings.ANALYSIS_JOB_TIMEOUT_SECONDS
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=timeout)
+    return AnalysisJob.objects.filter(
+        Q(updated_at__lt=cutoff) | Q(updated_at__isnull=True, started_at__lt=cutoff),
+        status=AnalysisJob.RUNNING,
+    ).update(
+        status=AnalysisJob.FAILED,
+        finished_at=now,
+        error="Analysis was interrupted, please upload the file again",
+    )
+
+
+def run_pending_jobs():
+    """Fail stale jobs, then run every queued job in this process, oldest first. Returns how many ran."""
+    fail_stale_jobs()
+    ids = list(
+        AnalysisJob.objects.filter(status=AnalysisJob.QUEUED)
+        .order_by("created_at")
+        .values_list("id", flat=True)
+    )
+    for job_id in ids:
+        run_job(job_id)
+    return len(ids)
+
+
+def job_status(job):
+    now = timezone.now()
+    queued_until = job.started_at or now
+    data = {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "filename": job.filename,
+        "queued_seconds": round((queued_until - job.created_at).total_seconds(), 3),
+        "run_seconds": round(((job.finished_at or now) - job.started_at).total_seconds(), 3) if job.started_at else 0.0,
+        "dataset_id": job.dataset_id,
+        "error": job.error or None,
+    }
+    if job.status == AnalysisJob.DONE and job.dataset_id:
+        data["summary"] = job.dataset.summary
+    return data
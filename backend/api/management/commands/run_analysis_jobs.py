@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+
+from api.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued CSV analysis jobs (e.g. ones left behind by a restarted web worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            ran = run_pending_jobs()
+            if ran:
+                self.stdout.write(f"Ran {ran} job(s)")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+
+from api.sweep import sweep
+
+
+class Command(BaseCommand):
+    help = "Delete stored uploads, columnar copies and upload sessions nothing refers to any more"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping")
+        parser.add_argument("--interval", type=float, default=3600.0, help="Seconds between sweeps with --loop")
+        parser.add_argument("--grace", type=int, default=None, help="Keep unreferenced files younger than this many seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            removed = sweep(grace=options["grace"])
+            if any(removed.values()):
+                self.stdout.write(", ".join(f"{kind}: {n}" for kind, n in removed.items()))
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
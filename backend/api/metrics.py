@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import bisect
+import weakref
+import tempfile
+import itertools
+import threading
+from django.conf import settings
+
+# In-process metrics in the Prometheus text format, served at /api/metrics/.
+#
+# Increments go to a per-thread dict, so the hot path takes no lock; a
+# scrape sums the shards of the live threads plus the totals folded in
+# from threads that have ended.
+# With METRICS_DIR set (one directory shared by all gunicorn workers) each
+# process also writes its cumulative totals to <pid>-<id>.json there, at
+# most every METRICS_FLUSH_SECONDS and when asked to scrape, and the scrape
+# adds up every file, so the numbers cover all workers. Files of exited
+# workers are kept so counters never go backwards; clear the directory
+# when the server is restarted.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class _Shard:
+    """One thread's values; a finalizer folds them into the registry when the thread ends."""
+    __slots__ = ("values", "__weakref__")
+
+    def __init__(self):
+        self.values = {}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+    def _reset(self):
+        # a forked worker starts from zero under its own file name
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        self._ids = itertools.count()
+        # shards of the parent's threads must not be folded into a child's totals
+        self._generation = object()
+        self._lock = threading.RLock()
+        self._file = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        self._flushed_at = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def add(self, key, amount):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            shard_id = next(self._ids)
+            with self._lock:
+                self._shards[shard_id] = shard.values
+            weakref.finalize(shard, self._retire, shard_id, shard.values, self._generation)
+        shard.values[key] = shard.values.get(key, 0) + amount
+
+    def _retire(self, shard_id, values, generation):
+        # the thread has ended: keep its totals, drop its shard
+        with self._lock:
+            if generation is not self._generation:
+                return
+            self._shards.pop(shard_id, None)
+            for key, value in values.items():
+                self._retired[key] = self._retired.get(key, 0) + value
+
+    def local_values(self):
+        with self._lock:
+            shards = list(self._shards.values())
+            totals = dict(self._retired)
+        for shard in shards:
+            for key, value in dict(shard).items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def flush(self):
+        """Write this process's totals to METRICS_DIR (no-op without one)."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self._file)
+        # one flush at a time per process, each through a temp file of its own
+        with self._lock:
+            rows = [[name, list(map(list, labels)), field, value]
+                    for (name, labels, field), value in self.local_values().items()]
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(rows, f)
+            os.replace(tmp, path)
+            self._flushed_at = time.monotonic()
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and time.monotonic() - self._flushed_at >= settings.METRICS_FLUSH_SECONDS:
+            self.flush()
+
+    def values(self):
+        """Totals over every process sharing METRICS_DIR, or of this process."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.local_values()
+        self.flush()
+        totals = {}
+        for entry in os.listdir(directory):
+            if not entry.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, entry)) as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, field, value in rows:
+                key = (name, tuple(map(tuple, labels)), field)
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def exposition(self):
+        values = self.values()
+        by_metric = {}
+        for (name, labels, field), value in values.items():
+            by_metric.setdefault(name, {}).setdefault(labels, {})[field] = value
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, fields in sorted(by_metric.get(name, {}).items()):
+                lines.extend(metric.lines(labels, fields))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _number(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, registry=None):
+        self.name = name
+        self.help = help
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        self.registry.add((self.name, _labels_key(labels), ""), amount)
+
+    def lines(self, labels, fields):
+        return [f"{self.name}{_format_labels(labels)} {_number(fields.get('', 0))}"]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DURATION_BUCKETS, registry=None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def observe(self, value, **labels):
+        key = _labels_key(labels)
+        # per-bucket counts (made cumulative on output) keep observe() at two adds
+        self.registry.add((self.name, key, str(bisect.bisect_left(self.buckets, value))), 1)
+        self.registry.add((self.name, key, "sum"), value)
+
+    def lines(self, labels, fields):
+        out = []
+        cumulative = 0
+        for i, bound in enumerate(self.buckets + (float("inf"),)):
+            cumulative += fields.get(str(i), 0)
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            out.append(f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {_number(cumulative)}")
+        out.append(f"{self.name}_sum{_format_labels(labels)} {_number(fields.get('sum', 0))}")
+        out.append(f"{self.name}_count{_format_labels(labels)} {_number(cumulative)}")
+        return out
+
+
+REGISTRY = Registry()
+
+REQUESTS = Counter("cepv_http_requests_total", "HTTP requests by view, method and status.")
+REQUEST_SECONDS = Histogram("cepv_http_request_duration_seconds", "HTTP request latency by view.")
+REQUEST_BYTES = Counter("cepv_http_request_bytes_total", "Request body bytes received by view.")
+RESPONSE_BYTES = Counter("cepv_http_response_bytes_total", "Response body bytes sent by view (when the length is known).")
+ROWS_ANALYZED = Counter("cepv_rows_analyzed_total", "CSV rows analyzed; divide its rate by cepv_analysis_seconds_total's for rows/s.")
+ANALYSIS_SECONDS = Counter("cepv_analysis_seconds_total", "Time spent analyzing CSV files.")
+PDF_RENDER_SECONDS = Histogram("cepv_pdf_render_seconds", "Time to render a PDF report on a report cache miss.")
+CACHE_LOOKUPS = Counter("cepv_cache_lookups_total", "Cache lookups by cache (report, chart, token, analysis) and result (hit or miss).")
+
+
+def cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    view_class = getattr(match.func, "view_class", None)
+    return view_class.__name__ if view_class is not None else match.view_name
+
+
+def _response_bytes(response):
+    if response.has_header("Content-Length"):
+        return int(response["Content-Length"])
+    if not response.streaming:
+        return len(response.content)
+    return None
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view = _view_name(request)
+        REQUESTS.inc(view=view, method=request.method, status=str(response.status_code))
+        REQUEST_SECONDS.observe(elapsed, view=view)
+        received = int(request.META.get("CONTENT_LENGTH") or 0)
+        if received:
+            REQUEST_BYTES.inc(received, view=view)
+        sent = _response_bytes(response)
+        if sent:
+            RESPONSE_BYTES.inc(sent, view=view)
+        REGISTRY.maybe_flush()
+        return response
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def split_outliers(apps, schema_editor):
+    Dataset = apps.get_model("api", "Dataset")
+    Outlier = apps.get_model("api", "Outlier")
+    for dataset in Dataset.objects.all():
+        outliers = dataset.summary.pop("outliers", None) or []
+        Outlier.objects.bulk_create(
+            [Outlier(dataset=dataset, position=i, data=o) for i, o in enumerate(outliers)],
+            batch_size=1000,
+        )
+        dataset.summary["outlier_count"] = len(outliers)
+        dataset.save(update_fields=["summary"])
+
+
+def merge_outliers(apps, schema_editor):
+    Dataset = apps.get_model("api", "Dataset")
+    Outlier = apps.get_model("api", "Outlier")
+    for dataset in Dataset.objects.all():
+        rows = Outlier.objects.filter(dataset=dataset).order_by("position")
+        dataset.summary["outliers"] = [o.data for o in rows]
+        dataset.summary.pop("outlier_count", None)
+        dataset.save(update_fields=["summary"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_analysisjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Outlier",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.PositiveIntegerField()),
+                ("data", models.JSONField()),
+                (
+                    "dataset",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outlier_rows",
+                        to="api.dataset",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["position"],
+                "indexes": [
+                    models.Index(
+                        fields=["dataset", "position"],
+                        name="api_outlier_dataset_8d6627_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(split_outliers, merge_outliers),
+    ]
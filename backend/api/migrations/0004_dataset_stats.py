@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_outlier"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataset",
+            name="stats",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_dataset_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataset",
+            name="sketches",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:44
+
+from django.db import migrations, models
+
+
+def fill_filenames(apps, schema_editor):
+    Dataset = apps.get_model("api", "Dataset")
+    for dataset in Dataset.objects.filter(filename=""):
+        dataset.filename = dataset.file.name.split("/")[-1]
+        dataset.save(update_fields=["filename"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_dataset_sketches"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analysisjob",
+            name="sha256",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="dataset",
+            name="filename",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="dataset",
+            name="sha256",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=64
+            ),
+        ),
+        migrations.RunPython(fill_filenames, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_uploadsession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analysisjob",
+            name="updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
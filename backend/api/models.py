@@ -4,8 +4,73 @@ from django.contrib.auth.models import User
 class Dataset(models.Model):
     uploader = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     file = models.FileField(upload_to='datasets/')
+    # original upload name (file itself is content-addressed, see storage.py)
+    filename = models.CharField(max_length=255, blank=True, default="")
+    sha256 = models.CharField(max_length=64, blank=True, default="", db_index=True)
     summary = models.JSONField()
+    # DatasetStats state (see engine.py); null for datasets stored before it existed
+    stats = models.JSONField(null=True, blank=True)
+    # DistributionSketch state (see sketches.py); null for older datasets too
+    sketches = models.JSONField(null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Dataset {self.id}"
+
+
+class Outlier(models.Model):
+    """One outlier record, kept out of Dataset.summary so summary reads stay small."""
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name="outlier_rows")
+    position = models.PositiveIntegerField()
+    data = models.JSONField()
+
+    class Meta:
+        ordering = ["position"]
+        indexes = [models.Index(fields=["dataset", "position"])]
+
+    def __str__(self):
+        return f"Outlier {self.position} of dataset {self.dataset_id}"
+
+
+class AnalysisJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(s, s) for s in (QUEUED, RUNNING, DONE, FAILED)]
+
+    uploader = models.ForeignKey(User, on_delete=models.CASCADE)
+    file = models.CharField(max_length=255)
+    filename = models.CharField(max_length=255)
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    progress = models.FloatField(default=0.0)
+    error = models.TextField(blank=True, default="")
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # last sign of life from the worker running it (see jobs.fail_stale_jobs)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"AnalysisJob {self.id} ({self.status})"
+
+
+class UploadSession(models.Model):
+    """A resumable chunked upload in progress; received chunks live on disk (see uploads.py)."""
+    uploader = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def __str__(self):
+        return f"UploadSession {self.id} ({self.filename})"
@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+
+# Outlier detectors working on plain (rows x columns) float arrays.
+#
+# Every detector turns a block of rows into one severity score per row
+# (NaN when it can't be scored) and a row is an outlier when its severity
+# reaches the threshold. Scores only need the fitted parameters, so the
+# same detector can be applied to one big array or chunk by chunk.
+
+OUTLIER_METHODS = ("zscore", "mad", "iqr", "mahalanobis")
+
+DEFAULT_THRESHOLDS = {
+    "zscore": 2.0,        # max |z| over the columns
+    "mad": 3.5,           # max robust z (MAD scaled to a normal std)
+    "iqr": 1.5,           # distance past the quartiles, in IQRs (Tukey fences)
+    "mahalanobis": 3.0,   # Mahalanobis distance using the full covariance
+}
+
+DEFAULT_TOP_K = 100
+
+# MAD of normally distributed data times this is its standard deviation
+MAD_SCALE = 1.4826
+
+
+def _row_max(scores):
+    # NaN-ignoring max per row, NaN only if the whole row is NaN
+    if not scores.shape[1]:
+        return np.full(len(scores), np.nan)
+    return np.fmax.reduce(scores, axis=1)
+
+
+class ZScoreDetector:
+    def __init__(self, mean, std):
+        self.mean = np.asarray(mean, dtype=float)
+        self.std = np.asarray(std, dtype=float)
+
+    def scores(self, X):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return _row_max(np.abs((X - self.mean) / self.std))
+
+
+class MADDetector:
+    def __init__(self, median, mad):
+        self.median = np.asarray(median, dtype=float)
+        self.mad = np.asarray(mad, dtype=float)
+
+    @classmethod
+    def fit(cls, X):
+        with np.errstate(invalid="ignore"):
+            median = np.nanmedian(X, axis=0)
+            mad = np.nanmedian(np.abs(X - median), axis=0)
+        return cls(median, mad)
+
+    def scores(self, X):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return _row_max(np.abs(X - self.median) / (MAD_SCALE * self.mad))
+
+
+class IQRDetector:
+    def __init__(self, q1, q3):
+        self.q1 = np.asarray(q1, dtype=float)
+        self.q3 = np.asarray(q3, dtype=float)
+
+    @classmethod
+    def fit(cls, X):
+        with np.errstate(invalid="ignore"):
+            q1, q3 = np.nanpercentile(X, [25, 75], axis=0)
+        return cls(q1, q3)
+
+    def scores(self, X):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            beyond = np.maximum(self.q1 - X, X - self.q3)
+            return _row_max(beyond / (self.q3 - self.q1))
+
+
+class MahalanobisDetector:
+    def __init__(self, mean, cov):
+        self.mean = np.asarray(mean, dtype=float)
+        self.inv = np.linalg.pinv(np.nan_to_num(np.asarray(cov, dtype=float)))
+
+    def scores(self, X):
+        # rows with any missing value get NaN (not scored)
+        d = X - self.mean
+        d2 = np.einsum("ij,jk,ik->i", d, self.inv, d)
+        return np.sqrt(np.maximum(d2, 0.0))
+
+
+def resolve_threshold(method, threshold=None):
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unknown outlier method: {method}. Use one of {', '.join(OUTLIER_METHODS)}")
+    return DEFAULT_THRESHOLDS[method] if threshold is None else float(threshold)
+
+
+def build_detector(method, moments, sample=None):
+    """
+    Detector for method fitted from a MomentAccumulator (zscore, mahalanobis)
+    or from a representative array of rows (mad, iqr).
+    """
+    if method == "zscore":
+        return ZScoreDetector(moments.means(), moments.std())
+    if method == "mahalanobis":
+        return MahalanobisDetector(moments.means(), moments.cov())
+    if method == "mad":
+        return MADDetector.fit(sample)
+    if method == "iqr":
+        return IQRDetector.fit(sample)
+    resolve_threshold(method)
+
+
+def flag(detector, X, threshold):
+    """(row indices, severities) of the rows in X at or above threshold."""
+    severity = detector.scores(X)
+    with np.errstate(invalid="ignore"):
+        rows = np.flatnonzero(severity >= threshold)
+    return rows, severity[rows]
+
+
+def top_k(rows, severity, k):
+    """The k most severe (rows, severity), most severe first, via a partial sort."""
+    if len(rows) > k:
+        part = np.argpartition(-severity, k - 1)[:k]
+        rows, severity = rows[part], severity[part]
+    order = np.argsort(-severity, kind="stable")
+    return rows[order], severity[order]
+
+
+class TopKRecords:
+    """Running top-k outlier records across chunks."""
+
+    def __init__(self, k):
+        self.k = k
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.severity = np.zeros(0)
+        self.records = []
+
+    def offer(self, chunk, local_rows, severity, offset):
+        """local_rows index into chunk (a DataFrame) whose first row is row number offset."""
+        local_rows, severity = top_k(local_rows, severity, self.k)
+        if not len(local_rows):
+            return
+        records = frame_records(chunk.iloc[local_rows])
+
+        rows = np.concatenate([self.rows, local_rows + offset])
+        sev = np.concatenate([self.severity, severity])
+        pool = self.records + records
+
+        keep = np.arange(len(rows))
+        if len(rows) > self.k:
+            keep = np.argpartition(-sev, self.k - 1)[:self.k]
+        keep = keep[np.argsort(-sev[keep], kind="stable")]
+
+        self.rows, self.severity = rows[keep], sev[keep]
+        self.records = [pool[i] for i in keep]
+
+    def result(self):
+        return outlier_records(self.records, self.rows, self.severity)
+
+
+def _severity(value):
+    # inf when a column has zero spread; JSON can't carry it
+    return round(float(value), 4) if np.isfinite(value) else None
+
+
+def frame_records(frame):
+    # float32 columns go through their shortest repr, so a 107.588 read as
+    # float32 comes back as 107.588 rather than 107.58799743652344
+    narrow = {col: str for col in frame.columns if frame[col].dtype == np.float32}
+    if narrow:
+        frame = frame.astype(narrow).astype({col: float for col in narrow})
+    return frame.to_dict(orient="records")
+
+
+def _cell(value):
+    # blank CSV cells come back as NaN (pd.NA in arrow string columns), which JSON (and JSONField) can't store
+    return None if pd.isna(value) else value
+
+
+def outlier_records(records, rows, severity):
+    return [
+        {**{k: _cell(v) for k, v in record.items()}, "row": int(row), "severity": _severity(sev)}
+        for record, row, sev in zip(records, rows, severity)
+    ]
+
+
+def outlier_summary(method, threshold, records, rows, severity):
+    """
+    Summary keys shared by both analysis paths. outlier_index and
+    outlier_severity are numpy arrays covering every flagged row (in file
+    order), never Python lists: on a large file they can hold millions of
+    rows. They are moved out of the summary when the dataset is stored.
+    """
+    return {
+        "outliers": records,
+        "outlier_count": int(len(rows)),
+        "outlier_method": method,
+        "outlier_threshold": threshold,
+        "outlier_index": rows,
+        "outlier_severity": severity,
+    }
+
+
+class RowSample:
+    """
+    Uniform fixed-size sample of rows (bottom-k by random key), used to fit
+    the quantile-based detectors when the data is only seen in chunks.
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.zeros(0)
+        self.values = None
+
+    def update(self, X):
+        keys = self.rng.random(len(X))
+        if self.values is None:
+            self.values = np.zeros((0, X.shape[1]))
+        keys = np.concatenate([self.keys, keys])
+        values = np.vstack([self.values, X])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size - 1)[:self.size]
+            keys, values = keys[keep], values[keep]
+        self.keys, self.values = keys, values
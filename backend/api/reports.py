@@ -0,0 +1,111 @@
+import os
+import glob
+import json
+import time
+import hashlib
+import tempfile
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Dataset
+from .utils import generate_pdf_report
+from .metrics import PDF_RENDER_SECONDS, cache_lookup
+
+# Bump whenever generate_pdf_report's layout changes so old PDFs stop matching.
+REPORT_TEMPLATE_VERSION = 1
+
+# summary fields generate_pdf_report reads
+REPORT_FIELDS = ("total_equipment", "avg_flowrate", "avg_pressure", "avg_temperature", "type_distribution")
+
+
+def report_cache_dir():
+    return os.path.join(settings.MEDIA_ROOT, "report_cache")
+
+
+def report_cache_path(dataset):
+    inputs = {k: dataset.summary.get(k) for k in REPORT_FIELDS}
+    payload = json.dumps([REPORT_TEMPLATE_VERSION, inputs], sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(report_cache_dir(), f"{dataset.id}-{digest}.pdf")
+
+
+def evict_reports(max_bytes=None):
+    """Drop least recently used reports until the cache fits in max_bytes."""
+    if max_bytes is None:
+        max_bytes = settings.REPORT_CACHE_MAX_BYTES
+
+    entries = []
+    for path in glob.glob(os.path.join(report_cache_dir(), "*.pdf")):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def render_report(dataset):
+    """Render dataset's report into the cache (if needed) and return its path."""
+    path = report_cache_path(dataset)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(report_cache_dir(), exist_ok=True)
+    start = time.perf_counter()
+    pdf = generate_pdf_report(dataset.summary)
+    PDF_RENDER_SECONDS.observe(time.perf_counter() - start)
+    # a temp file of its own: another thread may be rendering the same report
+    fd, tmp = tempfile.mkstemp(dir=report_cache_dir(), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf.getvalue())
+    os.replace(tmp, path)
+
+    evict_reports()
+    return path
+
+
+def open_report(dataset):
+    """
+    Open dataset's PDF report for streaming, rendering it only on a cache miss.
+    Hits are touched so eviction is least-recently-used.
+    """
+    path = report_cache_path(dataset)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        cache_lookup("report", False)
+        f = open(render_report(dataset), "rb")
+    else:
+        cache_lookup("report", True)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+    return f
+
+
+def remove_reports(dataset):
+    for path in glob.glob(os.path.join(report_cache_dir(), f"{dataset.id}-*.pdf")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def prerender_report(dataset_id):
+    close_old_connections()
+    try:
+        dataset = Dataset.objects.filter(id=dataset_id).first()
+        if dataset:
+            render_report(dataset)
+    finally:
+        close_old_connections()
@@ -0,0 +1,53 @@
+from django.conf import settings
+
+from .engine import DatasetStats, STATS_METRICS, iter_batches, scan
+from .streaming import NUMERIC_COLUMNS
+from .sketches import DistributionSketch, DEFAULT_QUANTILES
+
+
+def _backfill(dataset):
+    # datasets stored before stats/sketches were recorded get both
+    # computed from their file in one pass and saved
+    metrics = scan(iter_batches(dataset.file.path, settings.ANALYSIS_CHUNK_ROWS))
+    stats = DatasetStats.from_state(metrics.state(STATS_METRICS))
+    sketches = metrics["sketches"].sketch
+    dataset.stats = stats.state()
+    dataset.sketches = sketches.state()
+    dataset.save(update_fields=["stats", "sketches"])
+    return stats, sketches
+
+
+def dataset_stats(dataset):
+    """DatasetStats of one dataset."""
+    if dataset.stats:
+        return DatasetStats.from_state(dataset.stats)
+    return _backfill(dataset)[0]
+
+
+def dataset_sketches(dataset):
+    """DistributionSketch of one dataset."""
+    if dataset.sketches:
+        return DistributionSketch.from_state(dataset.sketches)
+    return _backfill(dataset)[1]
+
+
+def rollup(datasets):
+    """
+    (combined summary, per-dataset summaries) for datasets, merged from
+    their stored statistics. Outliers are per dataset and not rolled up.
+    """
+    combined = DatasetStats()
+    per_dataset = []
+    for dataset in datasets:
+        stats = dataset_stats(dataset)
+        per_dataset.append(stats.summary())
+        combined.merge(stats)
+    return combined.summary(), per_dataset
+
+
+def distribution(datasets, quantiles=DEFAULT_QUANTILES):
+    """Quantiles and histograms of the numeric columns over all datasets, overall and per Type."""
+    combined = DistributionSketch(NUMERIC_COLUMNS)
+    for dataset in datasets:
+        combined.merge(dataset_sketches(dataset))
+    return combined.describe(quantiles)
@@ -0,0 +1,73 @@
+import pandas as pd
+from django.conf import settings
+
+try:
+    import pyarrow
+except ImportError:  # optional, faster in-memory parsing and compact strings
+    pyarrow = None
+
+# The declared columns of an equipment CSV and how the analysis parses them.
+#
+# Only these columns are loaded (a plant export's extra columns are skipped
+# by the parser). Type is read as a categorical, the parameters straight
+# into ANALYSIS_FLOAT_DTYPE, and with pyarrow installed whole-file reads use
+# its multithreaded parser and keep Equipment Name as arrow strings instead
+# of Python objects. A file whose parameter columns hold text that isn't a
+# number is re-read leniently, the text becoming NaN.
+
+NAME_COLUMN = "Equipment Name"
+TYPE_COLUMN = "Type"
+NUMERIC_COLUMNS = ["Flowrate", "Pressure", "Temperature"]
+REQUIRED_COLUMNS = (NAME_COLUMN, TYPE_COLUMN, *NUMERIC_COLUMNS)
+
+FLOAT_DTYPES = ("float32", "float64")
+PARSERS = ("auto", "pyarrow", "c")
+
+
+def check_columns(columns):
+    missing = [c for c in REQUIRED_COLUMNS if c not in set(columns)]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+
+def float_dtype():
+    dtype = settings.ANALYSIS_FLOAT_DTYPE
+    if dtype not in FLOAT_DTYPES:
+        raise ValueError(f"ANALYSIS_FLOAT_DTYPE must be one of {', '.join(FLOAT_DTYPES)}, not {dtype}")
+    return dtype
+
+
+def parser(chunked=False):
+    """read_csv engine: pyarrow when installed and allowed (it can't read in chunks), else the C parser."""
+    choice = settings.CSV_PARSER
+    if choice not in PARSERS:
+        raise ValueError(f"CSV_PARSER must be one of {', '.join(PARSERS)}, not {choice}")
+    if choice == "pyarrow" and pyarrow is None:
+        raise ValueError("CSV_PARSER=pyarrow needs the pyarrow package on the server")
+    if chunked or choice == "c" or pyarrow is None:
+        return "c"
+    return "pyarrow"
+
+
+def read_options(engine="c", strict=True):
+    """
+    read_csv keyword arguments for the declared columns. strict parses the
+    parameters as floats (a ValueError on non-numeric text); otherwise they
+    are read as text for conform() to coerce.
+    """
+    dtype = {TYPE_COLUMN: "category"}
+    if engine == "pyarrow":
+        dtype[NAME_COLUMN] = "string[pyarrow]"
+    if strict:
+        dtype.update({col: float_dtype() for col in NUMERIC_COLUMNS})
+    else:
+        dtype.update({col: "object" for col in NUMERIC_COLUMNS})
+    return {"usecols": list(REQUIRED_COLUMNS), "dtype": dtype, "engine": engine}
+
+
+def conform(frame):
+    """Coerce leniently read parameter columns to ANALYSIS_FLOAT_DTYPE (unparseable -> NaN)."""
+    for col in NUMERIC_COLUMNS:
+        if not pd.api.types.is_float_dtype(frame[col]):
+            frame[col] = pd.to_numeric(frame[col], errors="coerce").astype(float_dtype())
+    return frame
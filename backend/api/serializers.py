@@ -22,16 +22,45 @@ class LoginSerializer(serializers.Serializer):
 
 
 
+# scalar keys stored in Dataset.summary; the top outlier records live in the Outlier table
+SUMMARY_FIELDS = (
+    "total_equipment", "avg_flowrate", "avg_pressure", "avg_temperature",
+    "type_distribution", "correlation", "typewise_averages", "outlier_count",
+    "outlier_method", "outlier_threshold",
+)
+
+
+def parse_fields(raw, allowed):
+    """Split a fields= query value; None when absent, ValueError on unknown names."""
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return fields
+
+
+def pick_fields(summary, fields):
+    if fields is None:
+        return summary
+    return {k: summary.get(k) for k in fields}
+
+
 class DatasetSerializer(serializers.ModelSerializer):
     filename = serializers.SerializerMethodField()
     uploaded = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
 
     class Meta:
         model = Dataset
         fields = ["id", "filename", "uploaded", "summary"]
 
+    def get_summary(self, obj):
+        return pick_fields(obj.summary, self.context.get("fields"))
+
     def get_filename(self, obj):
-        return obj.file.name.split("/")[-1]
+        return obj.filename or obj.file.name.split("/")[-1]
 
     def get_uploaded(self, obj):
         return obj.uploaded_at.strftime("%b %d, %Y – %I:%M %p")
@@ -0,0 +1,307 @@
+import math
+import numpy as np
+import pandas as pd
+
+# Bounded-memory, mergeable distribution sketches for the numeric columns.
+#
+# KLLSketch answers approximate quantiles (rank error around 1-2% with the
+# default k) from a few hundred retained values, whatever the input size.
+# Histogram counts values into power-of-two wide bins aligned on multiples
+# of the width, so two histograms can always be merged exactly by
+# coarsening the finer one.
+
+DEFAULT_K = 200
+DEFAULT_MAX_BINS = 64
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _finite(values):
+    values = np.asarray(values, dtype=float)
+    return values[np.isfinite(values)]
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch. Level h holds sorted-on-compaction values that each
+    stand for 2**h inputs; a full level is compacted by keeping every other
+    value (random offset) and promoting those to the next level.
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [np.zeros(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+                items = np.sort(items)
+                # an odd one out stays behind so the promoted count is even
+                keep = items[:len(items) % 2]
+                items = items[len(items) % 2:]
+                promoted = items[self.rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # capacities shrink when a level is added, so start over
+                level = 0
+                continue
+            level += 1
+
+    def update(self, values):
+        values = _finite(values)
+        if not len(values):
+            return
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        if not self.n:
+            return [None] * len(qs)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cum = values[order], np.cumsum(weights[order])
+        result = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+            elif q >= 1:
+                result.append(self.max)
+            else:
+                i = min(int(np.searchsorted(cum, q * cum[-1])), len(values) - 1)
+                result.append(float(values[i]))
+        return result
+
+    def state(self):
+        return {
+            "k": self.k,
+            "n": self.n,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+            "levels": [items.tolist() for items in self.levels],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state["k"], seed=state["n"])
+        sketch.n = state["n"]
+        if sketch.n:
+            sketch.min, sketch.max = state["min"], state["max"]
+        sketch.levels = [np.array(items, dtype=float) for items in state["levels"]] or [np.zeros(0)]
+        return sketch
+
+
+class Histogram:
+    """Counts in bins [i * width, (i + 1) * width), width a power of two, at most max_bins bins."""
+
+    def __init__(self, max_bins=DEFAULT_MAX_BINS):
+        self.max_bins = max_bins
+        self.exponent = None
+        self.start = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def width(self):
+        return 2.0 ** self.exponent
+
+    def _coarsen(self, exponent):
+        # bin i at width w is bin i // 2 at width 2w
+        while self.exponent < exponent:
+            first = self.start // 2
+            last = (self.start + len(self.counts) - 1) // 2
+            index = np.arange(self.start, self.start + len(self.counts)) // 2 - first
+            self.counts = np.bincount(index, weights=self.counts, minlength=last - first + 1).astype(np.int64)
+            self.start = first
+            self.exponent += 1
+
+    def _fit(self, lo, hi):
+        # smallest power-of-two width whose aligned bins cover [lo, hi] in max_bins bins
+        # (the span floor keeps bin indices well inside int64 for constant data)
+        span = max(hi - lo, max(abs(lo), abs(hi), 1.0) * 2.0 ** -40)
+        exponent = math.frexp(span / self.max_bins)[1]
+        while math.floor(hi / 2.0 ** exponent) - math.floor(lo / 2.0 ** exponent) + 1 > self.max_bins:
+            exponent += 1
+        return exponent
+
+    def _extend(self, start, stop):
+        # grow the bin range to cover bin indices start..stop at the current width
+        new_start = min(self.start, start) if len(self.counts) else start
+        new_stop = max(self.start + len(self.counts) - 1, stop) if len(self.counts) else stop
+        counts = np.zeros(new_stop - new_start + 1, dtype=np.int64)
+        counts[self.start - new_start:self.start - new_start + len(self.counts)] = self.counts
+        self.counts, self.start = counts, new_start
+
+    def _prepare(self, lo, hi, exponent=None):
+        if len(self.counts):
+            lo = min(lo, self.start * self.width)
+            hi = max(hi, (self.start + len(self.counts)) * self.width - self.width / 2)
+        target = self._fit(lo, hi)
+        if exponent is not None:
+            target = max(target, exponent)
+        if self.exponent is None:
+            self.exponent = target
+        else:
+            self._coarsen(max(target, self.exponent))
+        self._extend(math.floor(lo / self.width), math.floor(hi / self.width))
+
+    def update(self, values):
+        values = _finite(values)
+        if not len(values):
+            return
+        self._prepare(float(values.min()), float(values.max()))
+        index = np.floor(values / self.width).astype(np.int64) - self.start
+        self.counts += np.bincount(index, minlength=len(self.counts))
+
+    def merge(self, other):
+        if other.exponent is None or not len(other.counts):
+            return self
+        other = Histogram.from_state(other.state())
+        lo = other.start * other.width
+        hi = (other.start + len(other.counts)) * other.width - other.width / 2
+        self._prepare(lo, hi, other.exponent)
+        other._coarsen(self.exponent)
+        self.counts[other.start - self.start:other.start - self.start + len(other.counts)] += other.counts
+        return self
+
+    def state(self):
+        return {"max_bins": self.max_bins, "exponent": self.exponent, "start": self.start, "counts": self.counts.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        hist = cls(state["max_bins"])
+        hist.exponent, hist.start = state["exponent"], state["start"]
+        hist.counts = np.array(state["counts"], dtype=np.int64)
+        return hist
+
+    def bins(self):
+        if self.exponent is None:
+            return {"edges": [], "counts": []}
+        edges = (np.arange(len(self.counts) + 1) + self.start) * self.width
+        return {"edges": edges.tolist(), "counts": self.counts.tolist()}
+
+
+class ColumnSketch:
+    def __init__(self):
+        self.quantile = KLLSketch()
+        self.histogram = Histogram()
+
+    def update(self, values):
+        self.quantile.update(values)
+        self.histogram.update(values)
+
+    def merge(self, other):
+        self.quantile.merge(other.quantile)
+        self.histogram.merge(other.histogram)
+        return self
+
+    def state(self):
+        return {"quantile": self.quantile.state(), "histogram": self.histogram.state()}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls()
+        sketch.quantile = KLLSketch.from_state(state["quantile"])
+        sketch.histogram = Histogram.from_state(state["histogram"])
+        return sketch
+
+    def describe(self, qs):
+        q = self.quantile
+        return {
+            "count": q.n,
+            "min": q.min if q.n else None,
+            "max": q.max if q.n else None,
+            "quantiles": {f"p{round(x * 100, 2):g}": v for x, v in zip(qs, q.quantiles(qs))},
+            "histogram": self.histogram.bins(),
+        }
+
+
+class DistributionSketch:
+    """Quantile + histogram sketch of each numeric column, overall and per Type."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.overall = {col: ColumnSketch() for col in self.columns}
+        self.by_type = {}
+
+    def update(self, types, values):
+        codes, uniques = pd.factorize(types)
+        self.update_grouped(codes, uniques, values)
+
+    def update_grouped(self, codes, uniques, values, columns=None):
+        """
+        Add rows whose Type is uniques[code] (code -1: no Type). columns, if
+        given, are the finite values of each column, e.g. already sorted.
+        """
+        values = np.asarray(values, dtype=float)
+        for j, col in enumerate(self.columns):
+            self.overall[col].update(values[:, j] if columns is None else columns[j])
+
+        # one stable sort by code, then each Type is a contiguous slice
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        grouped = values[order]
+        for code, name in enumerate(uniques):
+            rows = grouped[bounds[code]:bounds[code + 1]]
+            sketches = self.by_type.setdefault(name, {col: ColumnSketch() for col in self.columns})
+            for j, col in enumerate(self.columns):
+                sketches[col].update(rows[:, j])
+
+    def merge(self, other):
+        for col in self.columns:
+            self.overall[col].merge(other.overall[col])
+        for name, sketches in other.by_type.items():
+            mine = self.by_type.setdefault(name, {col: ColumnSketch() for col in self.columns})
+            for col in self.columns:
+                mine[col].merge(sketches[col])
+        return self
+
+    def state(self):
+        return {
+            "columns": self.columns,
+            "overall": {col: s.state() for col, s in self.overall.items()},
+            "by_type": [[name, {col: s.state() for col, s in sketches.items()}] for name, sketches in self.by_type.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state["columns"])
+        sketch.overall = {col: ColumnSketch.from_state(s) for col, s in state["overall"].items()}
+        sketch.by_type = {
+            name: {col: ColumnSketch.from_state(s) for col, s in sketches.items()}
+            for name, sketches in state["by_type"]
+        }
+        return sketch
+
+    def describe(self, qs=DEFAULT_QUANTILES):
+        return {
+            "overall": {col: s.describe(qs) for col, s in self.overall.items()},
+            "by_type": {
+                name: {col: s.describe(qs) for col, s in self.by_type[name].items()}
+                for name in sorted(self.by_type)
+            },
+        }
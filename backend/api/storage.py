@@ -0,0 +1,181 @@
+import os
+import time
+import uuid
+import zlib
+import hashlib
+import tempfile
+from django.conf import settings
+
+from .models import Dataset, AnalysisJob
+from .compression import EXTENSIONS, compressing, decompress_chunks
+
+# Uploads are stored content-addressed under MEDIA_ROOT/blobs/<aa>/<sha256>.csv[.gz|.zst],
+# so identical uploads share one file (and, see ingest.reuse_dataset, one analysis).
+# The hash is of the plain CSV and the file is compressed with STORAGE_COMPRESSION,
+# whatever compression the upload itself used; readers go through compression.open_csv.
+#
+# An upload is claimed from the moment save_chunks has it until the caller's
+# dataset or job row refers to it (or it gives up on it): a file per claim in
+# CLAIM_DIR, so every web worker sees it. release_file leaves claimed blobs
+# alone. To not race a claim being taken, a release first marks the blob as
+# being released and only then looks for claims, while save_chunks claims
+# first and then waits out any release in progress; one of the two always
+# sees the other.
+
+BLOB_DIR = "blobs"
+CLAIM_DIR = f"{BLOB_DIR}/claims"
+
+# releases marked longer ago than this died halfway and are ignored
+RELEASE_TIMEOUT_SECONDS = 10
+
+
+def blob_name(digest, codec):
+    return f"{BLOB_DIR}/{digest[:2]}/{digest}{EXTENSIONS[codec]}"
+
+
+def _existing_blob(digest):
+    for codec in EXTENSIONS:
+        name = blob_name(digest, codec)
+        if os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+            return name
+    return None
+
+
+def save_upload(file):
+    """Stream an UploadedFile to content-addressed storage, see save_chunks."""
+    return save_chunks(file.chunks())
+
+
+def save_chunks(chunks):
+    """
+    Write an iterable of byte strings (a plain, gzip or zstd CSV) to
+    content-addressed storage: decompressed, hashed and recompressed in one
+    streaming pass. Returns (storage name, sha256 hex digest).
+    ValueError if the compressed data is corrupt. The upload is claimed
+    for the caller, who settles it with unclaim or release_file(claimed=True).
+    """
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, BLOB_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    codec = settings.STORAGE_COMPRESSION
+    sha = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix=".part", delete=False) as out:
+        try:
+            writer = compressing(out, codec, settings.STORAGE_COMPRESSION_LEVEL)
+            for chunk in decompress_chunks(chunks):
+                sha.update(chunk)
+                writer.write(chunk)
+            writer.close()
+        except BaseException as e:
+            out.close()
+            os.remove(out.name)
+            if isinstance(e, (zlib.error, EOFError)) or type(e).__name__ == "ZstdError":
+                raise ValueError(f"Could not decompress upload: {e}")
+            raise
+
+    digest = sha.hexdigest()
+    # claim the content before looking for it, see the top of this module
+    _mark(digest)
+    try:
+        _wait_for_release(digest)
+        name = _existing_blob(digest)
+        if name is not None:
+            os.remove(out.name)
+        else:
+            name = blob_name(digest, codec)
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(out.name, path)
+    except BaseException:
+        unclaim(blob_name(digest, codec))
+        raise
+    return name, digest
+
+
+def _digest(name):
+    return os.path.basename(name).split(".", 1)[0]
+
+
+def _claim_dir():
+    return os.path.join(settings.MEDIA_ROOT, CLAIM_DIR)
+
+
+def _mark(digest, suffix=""):
+    path = os.path.join(_claim_dir(), f"{digest}.{uuid.uuid4().hex}{suffix}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "x").close()
+    return path
+
+
+def _marks(digest):
+    """(claims, releases in progress) on the content digest, as paths."""
+    prefix = digest + "."
+    try:
+        entries = [e for e in os.listdir(_claim_dir()) if e.startswith(prefix)]
+    except FileNotFoundError:
+        return [], []
+    paths = [os.path.join(_claim_dir(), e) for e in entries]
+    return [p for p in paths if not p.endswith(".release")], [p for p in paths if p.endswith(".release")]
+
+
+def _recent(path, cutoff):
+    try:
+        return os.path.getmtime(path) > cutoff
+    except OSError:
+        return False
+
+
+def _wait_for_release(digest):
+    while True:
+        cutoff = time.time() - RELEASE_TIMEOUT_SECONDS
+        if not any(_recent(p, cutoff) for p in _marks(digest)[1]):
+            return
+        time.sleep(0.01)
+
+
+def unclaim(name):
+    """Drop one claim save_chunks took on the stored upload name: a row refers to it now, or nothing will."""
+    # claims are counted, not owned: any one of them will do
+    while True:
+        claims = _marks(_digest(name))[0]
+        if not claims:
+            return
+        for path in claims:
+            try:
+                os.remove(path)
+                return
+            except FileNotFoundError:
+                # dropped by a concurrent unclaim, try the next one
+                continue
+
+
+def remove_unclaimed(name):
+    """Delete a stored upload unless an upload in flight claimed it. Returns whether it was deleted."""
+    digest = _digest(name)
+    release = _mark(digest, ".release")
+    try:
+        if _marks(digest)[0]:
+            return False
+        os.remove(os.path.join(settings.MEDIA_ROOT, name))
+        return True
+    except OSError:
+        return False
+    finally:
+        os.remove(release)
+
+
+def release_file(name, dataset=None, claimed=False):
+    """
+    Delete a stored upload unless another dataset (other than dataset), a
+    pending job or an upload in flight still uses it. claimed=True first
+    drops the claim the caller's own save_chunks took.
+    """
+    if claimed:
+        unclaim(name)
+    others = Dataset.objects.filter(file=name)
+    if dataset is not None:
+        others = others.exclude(id=dataset.id)
+    pending = AnalysisJob.objects.filter(file=name, status__in=(AnalysisJob.QUEUED, AnalysisJob.RUNNING))
+    if others.exists() or pending.exists():
+        return
+    remove_unclaimed(name)
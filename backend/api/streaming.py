@@ -0,0 +1,209 @@
+import os
+import numpy as np
+import pandas as pd
+
+from .compression import decompressing
+from .timing import span
+from .schema import NUMERIC_COLUMNS
+
+# Mergeable accumulators and the chunked CSV reader the analysis engine
+# (engine.py) is built on.
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+class MomentAccumulator:
+    """
+    Mergeable count / mean / M2 / co-moment state for a fixed set of columns.
+
+    Every matrix is indexed [i, j] and describes column i over the rows where
+    both column i and column j are present. The diagonal is therefore the
+    per-column (NaN-skipping) mean and variance, and the off-diagonal entries
+    give pandas-style pairwise-complete correlation.
+    """
+
+    def __init__(self, k):
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.cxy = np.zeros((k, k))
+
+    @classmethod
+    def from_array(cls, values):
+        values = np.asarray(values, dtype=float)
+        acc = cls(values.shape[1])
+        if not len(values):
+            return acc
+
+        valid = ~np.isnan(values)
+        v = valid.astype(float)
+
+        # shift by the chunk mean first so the sums below don't cancel
+        with np.errstate(invalid="ignore"):
+            shift = np.nanmean(np.where(valid, values, np.nan), axis=0)
+        shift = np.nan_to_num(shift)
+        x = np.where(valid, values - shift, 0.0)
+
+        n = v.T @ v
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, (x.T @ v) / n, 0.0)
+        acc.n = n
+        acc.m2 = (x ** 2).T @ v - n * mean ** 2
+        acc.cxy = x.T @ x - n * mean * mean.T
+        acc.mean = mean + shift[:, None]
+        return acc
+
+    def update(self, values):
+        self.merge(MomentAccumulator.from_array(values))
+
+    def state(self):
+        return {"n": self.n.tolist(), "mean": self.mean.tolist(), "m2": self.m2.tolist(), "cxy": self.cxy.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls(len(state["n"]))
+        acc.n, acc.mean, acc.m2, acc.cxy = (np.array(state[key], dtype=float) for key in ("n", "mean", "m2", "cxy"))
+        return acc
+
+    def merge(self, other):
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(n > 0, self.n * other.n / n, 0.0)
+            frac = np.where(n > 0, other.n / n, 0.0)
+        self.mean = self.mean + delta * frac
+        self.m2 = self.m2 + other.m2 + delta ** 2 * weight
+        self.cxy = self.cxy + other.cxy + delta * delta.T * weight
+        self.n = n
+        return self
+
+    def count(self):
+        return np.diag(self.n).copy()
+
+    def means(self):
+        return np.where(self.count() > 0, np.diag(self.mean), np.nan)
+
+    def std(self, ddof=1):
+        n = self.count()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > ddof, np.sqrt(np.diag(self.m2) / (n - ddof)), np.nan)
+
+    def cov(self, ddof=1):
+        # pairwise-complete covariance; the diagonal is the per-column variance
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > ddof, self.cxy / (self.n - ddof), np.nan)
+
+    def corr(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.cxy / np.sqrt(self.m2 * self.m2.T)
+        return np.where(self.n > 1, corr, np.nan)
+
+
+def grouped_sums(codes, size, values):
+    """
+    (rows, sums, counts) per group for integer group codes (-1 = no group):
+    row counts, and per-column NaN-skipping sums and non-NaN counts, each
+    from a single bincount over a group * column index.
+    """
+    values = np.asarray(values, dtype=float)
+    keep = codes >= 0
+    codes, values = codes[keep], values[keep]
+    k = values.shape[1]
+    rows = np.bincount(codes, minlength=size).astype(float)
+    valid = ~np.isnan(values)
+    cells = (codes[:, None] * k + np.arange(k)).ravel()
+    sums = np.bincount(cells, weights=np.where(valid, values, 0.0).ravel(), minlength=size * k)
+    counts = np.bincount(cells, weights=valid.ravel(), minlength=size * k)
+    return rows, sums.reshape(size, k), counts.reshape(size, k)
+
+
+class TypeAccumulator:
+    """
+    Mergeable per-Type row counts plus per-column sums / non-NaN counts.
+    Types are kept in first-seen order.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.index = {}
+        self.rows = np.zeros(0)
+        self.sums = np.zeros((0, k))
+        self.counts = np.zeros((0, k))
+
+    def _grow(self, size):
+        if size <= len(self.rows):
+            return
+        pad = size - len(self.rows)
+        self.rows = np.concatenate([self.rows, np.zeros(pad)])
+        self.sums = np.vstack([self.sums, np.zeros((pad, self.k))])
+        self.counts = np.vstack([self.counts, np.zeros((pad, self.k))])
+
+    def update(self, types, values):
+        codes, uniques = pd.factorize(types)
+        self.add_groups(uniques, *grouped_sums(codes, len(uniques), values))
+
+    def add_groups(self, uniques, rows, sums, counts):
+        """Add per-group totals (see grouped_sums) of the groups named uniques."""
+        slots = np.array([self.index.setdefault(u, len(self.index)) for u in uniques], dtype=int)
+        self._grow(len(self.index))
+        if len(slots):
+            self.rows[slots] += rows
+            self.sums[slots] += sums
+            self.counts[slots] += counts
+
+    def merge(self, other):
+        slots = np.array([self.index.setdefault(u, len(self.index)) for u in other.index], dtype=int)
+        self._grow(len(self.index))
+        if len(slots):
+            self.rows[slots] += other.rows
+            self.sums[slots] += other.sums
+            self.counts[slots] += other.counts
+        return self
+
+    def state(self):
+        return {
+            "types": list(self.index),
+            "rows": self.rows.tolist(),
+            "sums": self.sums.tolist(),
+            "counts": self.counts.tolist(),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls(len(NUMERIC_COLUMNS))
+        acc.index = {name: i for i, name in enumerate(state["types"])}
+        acc.rows = np.array(state["rows"], dtype=float)
+        acc.sums = np.array(state["sums"], dtype=float).reshape(len(acc.index), acc.k)
+        acc.counts = np.array(state["counts"], dtype=float).reshape(len(acc.index), acc.k)
+        return acc
+
+    def distribution(self):
+        # most frequent first, ties keep first-seen order (same as value_counts)
+        order = np.argsort(-self.rows, kind="stable")
+        names = list(self.index)
+        return {names[i]: int(self.rows[i]) for i in order}
+
+    def averages(self, columns):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = self.sums / self.counts
+        names = list(self.index)
+        return {
+            names[i]: {col: round(float(means[i, j]), 2) for j, col in enumerate(columns)}
+            for i in sorted(range(len(names)), key=lambda i: names[i])
+        }
+
+
+def iter_csv_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, **options):
+    # progress, if given, is called with the fraction of the (possibly
+    # compressed) file read so far; options go to pd.read_csv
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as f, decompressing(f) as stream:
+        reader = pd.read_csv(stream, chunksize=chunk_rows, **options)
+        while True:
+            with span("parse"):
+                chunk = next(reader, None)
+            if chunk is None:
+                break
+            yield chunk
+            if progress:
+                progress(min(f.tell() / size, 1.0))
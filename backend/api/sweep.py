@@ -0,0 +1,100 @@
+import os
+import time
+import shutil
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Dataset, AnalysisJob, UploadSession
+from .storage import BLOB_DIR, CLAIM_DIR, remove_unclaimed
+from .uploads import remove_session
+from .jobs import fail_stale_jobs
+from .reports import evict_reports
+
+# Background cleanup of files nothing refers to any more: uploads whose
+# datasets were pruned while a job still used them, columnar copies left
+# by a crash between writing and committing, abandoned upload sessions.
+# Jobs orphaned by a dead worker are failed first, so they stop pinning
+# their upload.
+# Ingest deletes files right after its commit; this catches what it missed.
+# Claims on uploads (see storage.py) older than the grace period were left
+# by a request that died and are dropped, and anything else younger than it
+# is kept. Run it periodically: manage.py sweep_storage --loop.
+
+
+def _old(path, cutoff):
+    try:
+        return os.path.getmtime(path) < cutoff
+    except OSError:
+        return False
+
+
+def _blobs(cutoff):
+    root = os.path.join(settings.MEDIA_ROOT, BLOB_DIR)
+    used = set(Dataset.objects.values_list("file", flat=True))
+    used.update(AnalysisJob.objects.filter(
+        status__in=(AnalysisJob.QUEUED, AnalysisJob.RUNNING)
+    ).values_list("file", flat=True))
+
+    claims = os.path.join(settings.MEDIA_ROOT, CLAIM_DIR)
+
+    # expired claims first, so the blobs they held can go in the same sweep
+    removed = 0
+    for dirpath, _, filenames in sorted(os.walk(root), key=lambda entry: entry[0] != claims):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+            if name in used or not _old(path, cutoff):
+                continue
+            if dirpath != claims and dirpath != os.path.join(root, "tmp"):
+                removed += remove_unclaimed(name)
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def _columnar(cutoff):
+    root = os.path.join(settings.MEDIA_ROOT, "columnar")
+    try:
+        entries = os.listdir(root)
+    except FileNotFoundError:
+        return 0
+    ids = set(str(i) for i in Dataset.objects.values_list("id", flat=True))
+
+    removed = 0
+    for entry in entries:
+        path = os.path.join(root, entry)
+        if entry not in ids and _old(path, cutoff):
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def _sessions(max_age):
+    expired = UploadSession.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=max_age))
+    removed = 0
+    for session in expired:
+        remove_session(session)
+        removed += 1
+    return removed
+
+
+def sweep(grace=None, session_max_age=None):
+    """Delete orphaned storage; returns the number of items removed per kind."""
+    if grace is None:
+        grace = settings.STORAGE_SWEEP_GRACE_SECONDS
+    if session_max_age is None:
+        session_max_age = settings.UPLOAD_SESSION_MAX_AGE_SECONDS
+    cutoff = time.time() - grace
+    result = {
+        "jobs": fail_stale_jobs(),
+        "sessions": _sessions(session_max_age),
+        "blobs": _blobs(cutoff),
+        "columnar": _columnar(cutoff),
+    }
+    evict_reports()
+    return result
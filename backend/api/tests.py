@@ -0,0 +1,550 @@
+import os
+import gc
+import math
+import time
+import shutil
+import tempfile
+import zipfile
+import threading
+from datetime import timedelta
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from .engine import analyze_csv
+from .streaming import MomentAccumulator, TypeAccumulator
+from .sketches import KLLSketch, Histogram, DistributionSketch
+from .reports import render_report, report_cache_dir
+from .charts import CHART_TEMPLATES, ChartRenderer, chart_cache_key, render_chart
+from .models import Dataset, AnalysisJob
+from .storage import CLAIM_DIR, save_chunks, release_file, unclaim
+from .sweep import sweep
+from .metrics import Registry, Counter
+from . import batch, ingest
+from .columnar import write_columnar, open_columnar, columnar_dir
+from .jobs import fail_stale_jobs, _ProgressWriter, _finish
+
+HEADER = "Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+TYPES = ("Pump", "Valve", "Compressor", "Heat Exchanger")
+
+
+def write_csv(directory, name, rows):
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(HEADER)
+        for row in rows:
+            f.write(",".join("" if v is None else str(v) for v in row) + "\n")
+    return path
+
+
+def sample_rows(count, seed=0, blanks=True):
+    """Equipment rows with a few extreme values and, if blanks, empty cells."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(count):
+        row = [f"EQ-{i}", TYPES[rng.integers(len(TYPES))],
+               round(rng.normal(120, 15), 3), round(rng.normal(6, 1), 3), round(rng.normal(110, 20), 3)]
+        if i % 37 == 5:
+            row[2 + i % 3] *= 4
+        if blanks and i % 11 == 3:
+            row[2 + i % 3] = None
+        rows.append(row)
+    return rows
+
+
+def login(client, username):
+    """Register username and return the auth header kwargs for client requests."""
+    credentials = {"username": username, "password": "secret1"}
+    client.post("/api/auth/register/", credentials, content_type="application/json")
+    token = client.post("/api/auth/login/", credentials, content_type="application/json").json()["token"]
+    return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+
+class CloseMixin:
+    def assertClose(self, a, b, where="value"):
+        if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+            np.testing.assert_allclose(np.asarray(a, dtype=float), np.asarray(b, dtype=float), rtol=1e-9, err_msg=where)
+        elif isinstance(a, dict):
+            self.assertEqual(set(a), set(b), where)
+            for key in a:
+                self.assertClose(a[key], b[key], f"{where}[{key!r}]")
+        elif isinstance(a, (list, tuple)):
+            self.assertEqual(len(a), len(b), where)
+            for i, (x, y) in enumerate(zip(a, b)):
+                self.assertClose(x, y, f"{where}[{i}]")
+        elif isinstance(a, float) and isinstance(b, float):
+            if math.isnan(a) or math.isnan(b):
+                self.assertTrue(math.isnan(a) and math.isnan(b), where)
+            else:
+                self.assertAlmostEqual(a, b, delta=1e-9 * max(1.0, abs(a)), msg=where)
+        else:
+            self.assertEqual(a, b, where)
+
+
+class TempDirMixin:
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+
+def run_threads(target, count=8, rounds=1):
+    """Run target on count threads at once, rounds times; the exceptions they raised."""
+    errors = []
+
+    def run():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    for _ in range(rounds):
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return errors
+
+
+class ChunkedAnalysisTests(TempDirMixin, CloseMixin, SimpleTestCase):
+    """Chunked analysis must give the whole-file answer, whatever the chunk size."""
+
+    KEYS = (
+        "total_equipment", "avg_flowrate", "avg_pressure", "avg_temperature",
+        "type_distribution", "correlation", "typewise_averages", "outliers", "outlier_count",
+    )
+
+    def check(self, rows, method="zscore"):
+        path = write_csv(self.dir, "data.csv", rows)
+        whole, _ = analyze_csv(path, outlier_method=method)
+        for chunk_rows in (1, 7, 64, len(rows) + 1):
+            chunked, _ = analyze_csv(path, chunk_rows=chunk_rows, outlier_method=method)
+            for key in self.KEYS:
+                self.assertClose(whole[key], chunked[key], f"{key} (chunk_rows={chunk_rows})")
+            np.testing.assert_array_equal(whole["outlier_index"], chunked["outlier_index"])
+            self.assertClose(whole["outlier_severity"], chunked["outlier_severity"], "outlier_severity")
+            self.assertEqual(whole["stats"]["total"], chunked["stats"]["total"])
+            self.assertClose(whole["stats"]["moments"], chunked["stats"]["moments"], f"moments (chunk_rows={chunk_rows})")
+
+    def test_with_blank_cells(self):
+        self.check(sample_rows(300))
+
+    def test_without_blank_cells(self):
+        self.check(sample_rows(200, seed=1, blanks=False))
+
+    def test_column_blank_in_a_whole_chunk(self):
+        rows = sample_rows(120, seed=2)
+        for row in rows[10:30]:
+            row[3] = None
+        self.check(rows)
+
+    def test_robust_detector(self):
+        self.check(sample_rows(250, seed=3), method="mad")
+
+    def test_outlier_index_stays_in_arrays(self):
+        path = write_csv(self.dir, "data.csv", sample_rows(300))
+        for chunk_rows in (None, 50):
+            summary, _ = analyze_csv(path, chunk_rows=chunk_rows)
+            # never millions of boxed Python numbers on a large file
+            self.assertIsInstance(summary["outlier_index"], np.ndarray)
+            self.assertIsInstance(summary["outlier_severity"], np.ndarray)
+            self.assertEqual(len(summary["outlier_index"]), summary["outlier_count"])
+
+
+class AccumulatorTests(CloseMixin, SimpleTestCase):
+    def values(self, seed=0):
+        rng = np.random.default_rng(seed)
+        values = rng.normal([100, 5, 60], [20, 1, 10], size=(500, 3))
+        values[rng.random(values.shape) < 0.1] = np.nan
+        return values
+
+    def test_moment_merge_matches_one_pass(self):
+        values = self.values()
+        merged = MomentAccumulator(3)
+        for part in np.array_split(values, [1, 2, 50, 51, 300]):
+            merged.merge(MomentAccumulator.from_array(part))
+        whole = MomentAccumulator.from_array(values)
+        for name in ("n", "mean", "m2", "cxy"):
+            np.testing.assert_allclose(getattr(merged, name), getattr(whole, name), rtol=1e-9, atol=1e-6, err_msg=name)
+
+    def test_moments_match_pandas(self):
+        values = self.values(1)
+        acc = MomentAccumulator(3)
+        for part in np.array_split(values, 9):
+            acc.update(part)
+        frame = pd.DataFrame(values)
+        np.testing.assert_allclose(acc.means(), frame.mean().to_numpy(), rtol=1e-12)
+        np.testing.assert_allclose(acc.std(), frame.std().to_numpy(), rtol=1e-9)
+        np.testing.assert_allclose(acc.corr(), frame.corr().to_numpy(), rtol=1e-9)
+
+    def test_type_merge_matches_one_pass(self):
+        values = self.values(2)
+        types = np.array([TYPES[i % 3 if i < 250 else i % 4] for i in range(len(values))], dtype=object)
+        whole = TypeAccumulator(3)
+        whole.update(types, values)
+        merged = TypeAccumulator(3)
+        for lo, hi in ((0, 100), (100, 250), (250, 251), (251, 500)):
+            part = TypeAccumulator(3)
+            part.update(types[lo:hi], values[lo:hi])
+            merged.merge(part)
+        self.assertEqual(whole.distribution(), merged.distribution())
+        self.assertClose(whole.averages(["a", "b", "c"]), merged.averages(["a", "b", "c"]))
+        self.assertClose(TypeAccumulator.from_state(merged.state()).state(), whole.state())
+
+
+class SketchMergeTests(SimpleTestCase):
+    def parts(self, values, sizes):
+        return np.split(values, np.cumsum(sizes)[:-1])
+
+    def merged(self, cls, parts):
+        sketch = cls()
+        for part in parts:
+            piece = cls()
+            piece.update(part)
+            # through the stored state, as rollups do
+            sketch.merge(type(piece).from_state(piece.state()))
+        return sketch
+
+    def test_kll_merge_is_exact_while_small(self):
+        values = np.random.default_rng(0).normal(size=150)
+        whole = KLLSketch()
+        whole.update(values)
+        merged = self.merged(KLLSketch, self.parts(values, [50, 1, 99]))
+        qs = [0, 0.1, 0.5, 0.9, 1]
+        self.assertEqual(whole.quantiles(qs), merged.quantiles(qs))
+
+    def test_kll_merge_rank_error(self):
+        values = np.random.default_rng(1).lognormal(size=20000)
+        values[::97] = np.nan
+        merged = self.merged(KLLSketch, self.parts(values, [5000, 3, 7000, 7997]))
+        finite = np.sort(values[np.isfinite(values)])
+        self.assertEqual(merged.n, len(finite))
+        self.assertEqual((merged.min, merged.max), (finite[0], finite[-1]))
+        for q, value in zip((0.05, 0.25, 0.5, 0.75, 0.95), merged.quantiles((0.05, 0.25, 0.5, 0.75, 0.95))):
+            rank = np.searchsorted(finite, value, side="right") / len(finite)
+            self.assertLess(abs(rank - q), 0.03, q)
+
+    def test_histogram_merge_counts_every_value_once(self):
+        rng = np.random.default_rng(2)
+        parts = [rng.normal(10, 1, 300), rng.normal(500, 50, 200), np.array([np.nan, 7.0]), rng.normal(-40, 5, 100)]
+        merged = self.merged(Histogram, parts)
+        values = np.concatenate(parts)
+        values = values[np.isfinite(values)]
+        expected = np.bincount(np.floor(values / merged.width).astype(np.int64) - merged.start, minlength=len(merged.counts))
+        np.testing.assert_array_equal(merged.counts, expected)
+        self.assertLessEqual(len(merged.counts), merged.max_bins)
+
+    def test_distribution_merge_by_type(self):
+        rng = np.random.default_rng(3)
+        values = rng.normal(size=(400, 2))
+        types = np.array([TYPES[i % 3] for i in range(400)], dtype=object)
+        merged = DistributionSketch(["a", "b"])
+        for lo, hi in ((0, 150), (150, 400)):
+            part = DistributionSketch(["a", "b"])
+            part.update(types[lo:hi], values[lo:hi])
+            merged.merge(DistributionSketch.from_state(part.state()))
+        summary = merged.describe()
+        self.assertEqual(summary["overall"]["a"]["count"], 400)
+        for name in TYPES[:3]:
+            column = values[types == name, 1]
+            self.assertEqual(summary["by_type"][name]["b"]["count"], len(column))
+            self.assertEqual(summary["by_type"][name]["b"]["max"], column.max())
+
+
+class ReportCacheTests(TempDirMixin, SimpleTestCase):
+    def test_concurrent_renders_of_one_report(self):
+        with override_settings(MEDIA_ROOT=self.dir):
+            summary, _ = analyze_csv(write_csv(self.dir, "data.csv", sample_rows(50)))
+            dataset = SimpleNamespace(id=1, summary=summary)
+
+            def render():
+                with open(render_report(dataset), "rb") as f:
+                    self.assertTrue(f.read().startswith(b"%PDF"))
+
+            for _ in range(3):
+                shutil.rmtree(report_cache_dir(), ignore_errors=True)
+                self.assertEqual(run_threads(render), [])
+                # no temp file of a render left behind
+                self.assertEqual([name for name in os.listdir(report_cache_dir()) if not name.endswith(".pdf")], [])
+
+
+class ChartTests(SimpleTestCase):
+    def test_key_follows_data_order(self):
+        # the pie is drawn in the data's order, so a reordered dict is another chart
+        self.assertNotEqual(chart_cache_key("type_pie", {"Pump": 2, "Valve": 1}), chart_cache_key("type_pie", {"Valve": 1, "Pump": 2}))
+        self.assertEqual(chart_cache_key("type_pie", {"Pump": 2, "Valve": 1}), chart_cache_key("type_pie", {"Pump": 2, "Valve": 1}))
+
+    def test_concurrent_renders_match_a_fresh_figure(self):
+        data = [{f"Concurrent {i}": n for n, i in enumerate(range(seed, seed + 4), 1)} for seed in range(12)]
+        expected = [ChartRenderer(CHART_TEMPLATES["type_pie"]).render(d) for d in data]
+
+        def render():
+            # pooled figures are reused across threads: each must come out clean
+            for i, d in enumerate(data):
+                self.assertEqual(render_chart("type_pie", dict(d)), expected[i])
+
+        self.assertEqual(run_threads(render), [])
+
+
+class StorageTests(TempDirMixin, TransactionTestCase):
+    DATA = [(HEADER + "P1,Pump,1,2,3\n").encode()]
+
+    def setUp(self):
+        super().setUp()
+        media = override_settings(MEDIA_ROOT=self.dir)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def claims(self):
+        try:
+            return os.listdir(os.path.join(self.dir, CLAIM_DIR))
+        except FileNotFoundError:
+            return []
+
+    def test_failed_upload_is_deleted_at_once(self):
+        name, _ = save_chunks(self.DATA)
+        release_file(name, claimed=True)
+        self.assertFalse(os.path.exists(self.path(name)))
+        self.assertEqual(self.claims(), [])
+
+    def test_upload_kept_while_an_identical_one_is_in_flight(self):
+        first, _ = save_chunks(self.DATA)
+        second, _ = save_chunks(self.DATA)
+        self.assertEqual(first, second)
+        release_file(first, claimed=True)
+        self.assertTrue(os.path.exists(self.path(first)))
+        release_file(second, claimed=True)
+        self.assertFalse(os.path.exists(self.path(first)))
+
+    def test_upload_kept_for_its_dataset(self):
+        name, sha256 = save_chunks(self.DATA)
+        user = User.objects.create_user("storage", password="x")
+        Dataset.objects.create(uploader=user, file=name, sha256=sha256, summary={})
+        unclaim(name)
+        release_file(name)
+        self.assertTrue(os.path.exists(self.path(name)))
+
+    def test_concurrent_saves_and_releases(self):
+        names = set()
+
+        def upload():
+            for _ in range(100):
+                name, _ = save_chunks(self.DATA)
+                names.add(name)
+                # whoever holds a claim must find the file
+                self.assertTrue(os.path.exists(self.path(name)))
+                release_file(name, claimed=True)
+
+        self.assertEqual(run_threads(upload, count=6), [])
+        self.assertEqual(self.claims(), [])
+        self.assertFalse(any(os.path.exists(self.path(name)) for name in names))
+
+    def test_sweep_drops_claims_of_dead_requests(self):
+        name, _ = save_chunks(self.DATA)
+        release_file(name)
+        self.assertTrue(os.path.exists(self.path(name)))
+        old = time.time() - 2 * 3600
+        for entry in self.claims():
+            os.utime(os.path.join(self.dir, CLAIM_DIR, entry), (old, old))
+        os.utime(self.path(name), (old, old))
+        sweep(grace=3600)
+        self.assertEqual(self.claims(), [])
+        self.assertFalse(os.path.exists(self.path(name)))
+
+
+class MetricsTests(TempDirMixin, SimpleTestCase):
+    def counter(self):
+        registry = Registry()
+        return registry, Counter("test_total", "test counter", registry=registry)
+
+    def total(self, registry):
+        return sum(v for (name, _, _), v in registry.values().items() if name == "test_total")
+
+    def test_concurrent_increments_and_flushes(self):
+        registry, counter = self.counter()
+
+        def work():
+            for _ in range(200):
+                counter.inc()
+                registry.flush()
+
+        with override_settings(METRICS_DIR=self.dir):
+            self.assertEqual(run_threads(work), [])
+            self.assertEqual(self.total(registry), 8 * 200)
+            # one file for the process, no temp file of a flush left behind
+            self.assertEqual(len(os.listdir(self.dir)), 1)
+
+    def test_ended_threads_keep_their_counts(self):
+        registry, counter = self.counter()
+        for _ in range(300):
+            thread = threading.Thread(target=counter.inc, args=(2,))
+            thread.start()
+            thread.join()
+        gc.collect()
+        self.assertEqual(self.total(registry), 600)
+        # their shards are folded in, not kept one per dead thread
+        self.assertLess(len(registry._shards), 10)
+
+
+class BatchUploadTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # analysis inline: pool workers would not see the overridden settings
+        overrides = override_settings(MEDIA_ROOT=self.dir, BATCH_WORKERS=1)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.auth = login(self.client, "batch")
+
+    def csv(self, name, seed):
+        rows = sample_rows(30, seed=seed, blanks=False)
+        return SimpleUploadedFile(name, (HEADER + "".join(",".join(map(str, r)) + "\n" for r in rows)).encode())
+
+    def upload(self, files):
+        return self.client.post("/api/upload/batch/", {"files": files}, **self.auth)
+
+    def test_parts_with_the_same_name_are_stored_apart(self):
+        response = self.upload([self.csv("data.csv", 1), self.csv("data.csv", 2)])
+        self.assertEqual(response.status_code, 200)
+        files = response.json()["files"]
+        self.assertEqual(len(set(f["dataset_id"] for f in files)), 2)
+        shas = set(Dataset.objects.filter(id__in=[f["dataset_id"] for f in files]).values_list("sha256", flat=True))
+        self.assertEqual(len(shas), 2)
+
+    def test_zip_members_are_named_without_their_directory(self):
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("plant/a.csv", self.csv("a.csv", 3).read())
+            zf.writestr("__MACOSX/plant/._a.csv", b"")
+        response = self.upload([SimpleUploadedFile("plant.zip", archive.getvalue())])
+        self.assertEqual([f["filename"] for f in response.json()["files"]], ["a.csv"])
+        self.assertEqual(Dataset.objects.get().filename, "a.csv")
+
+    def test_one_failing_entry_does_not_lose_the_batch(self):
+        create = ingest.create_dataset
+
+        def failing(user, staged, filename="", sha256=""):
+            if filename == "bad.csv":
+                raise ValueError("rejected by the database")
+            return create(user, staged, filename, sha256)
+
+        with mock.patch.object(ingest, "create_dataset", failing):
+            response = self.upload([self.csv("good.csv", 4), self.csv("bad.csv", 5), self.csv("other.csv", 6)])
+        self.assertEqual(response.status_code, 200)
+        by_name = {f["filename"]: f for f in response.json()["files"]}
+        self.assertEqual(by_name["bad.csv"]["error"], "rejected by the database")
+        self.assertEqual(
+            sorted(Dataset.objects.values_list("filename", flat=True)),
+            ["good.csv", "other.csv"],
+        )
+        # the failed entry's upload is released, the stored ones' are kept
+        stored = set(Dataset.objects.values_list("file", flat=True))
+        blobs = set()
+        for directory, _, filenames in os.walk(os.path.join(self.dir, "blobs")):
+            for filename in filenames:
+                blobs.add(os.path.relpath(os.path.join(directory, filename), self.dir).replace(os.sep, "/"))
+        self.assertEqual(blobs, stored)
+
+
+class BatchPoolTests(SimpleTestCase):
+    def test_pool_is_shared_and_replaced_once_dropped(self):
+        # no work is submitted, so no worker process is started
+        self.addCleanup(setattr, batch, "_pool", batch._pool)
+        batch._pool = None
+        pool = batch._get_pool()
+        self.assertIs(batch._get_pool(), pool)
+        batch._drop_pool(pool)
+        replacement = batch._get_pool()
+        self.assertIsNot(replacement, pool)
+        replacement.shutdown()
+
+
+class ColumnarTests(TempDirMixin, SimpleTestCase):
+    def test_concurrent_lazy_builds(self):
+        path = write_csv(self.dir, "data.csv", sample_rows(3000))
+        dataset = SimpleNamespace(id=1, file=SimpleNamespace(path=path))
+        with override_settings(MEDIA_ROOT=self.dir, ANALYSIS_CHUNK_ROWS=100):
+            rows = []
+            self.assertEqual(run_threads(lambda: rows.append(open_columnar(dataset).rows), count=6), [])
+            self.assertEqual(rows, [3000] * 6)
+            # the losers' temp dirs are gone, the winner's store is whole
+            self.assertEqual(os.listdir(os.path.dirname(columnar_dir(dataset))), ["1"])
+            self.assertEqual(open_columnar(dataset).read_rows(2999)[0]["Equipment Name"], "EQ-2999")
+
+    def test_text_after_numeric_chunks_is_kept(self):
+        rows = sample_rows(250, blanks=False)
+        for i, row in enumerate(rows):
+            row[0] = str(1000 + i) if i < 120 else f"P-{i}"
+        rows[200][0] = "0042"
+        path = write_csv(self.dir, "data.csv", rows)
+        store = write_columnar(path, os.path.join(self.dir, "store"), chunk_rows=50)
+        self.assertEqual(store.columns[0]["kind"], "string")
+        self.assertEqual(store.columns[2]["kind"], "float")
+        names = [row["Equipment Name"] for row in store.read_rows()]
+        self.assertEqual(names, [row[0] for row in rows])
+
+
+class StaleJobTests(TestCase):
+    def job(self, started, beat):
+        user, _ = User.objects.get_or_create(username="jobs")
+        return AnalysisJob.objects.create(
+            uploader=user, file="blobs/x.csv", filename="x.csv",
+            status=AnalysisJob.RUNNING, started_at=started, updated_at=beat,
+        )
+
+    def test_only_silent_jobs_are_failed(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        dead = self.job(long_ago, long_ago)
+        legacy = self.job(long_ago, None)
+        alive = self.job(long_ago, long_ago)
+        _ProgressWriter(alive.id, 0.0, 1.0)(0.5)
+
+        self.assertEqual(fail_stale_jobs(timeout=3600), 2)
+        for job, status in ((dead, AnalysisJob.FAILED), (legacy, AnalysisJob.FAILED), (alive, AnalysisJob.RUNNING)):
+            job.refresh_from_db()
+            self.assertEqual(job.status, status)
+
+    def test_failed_job_is_not_finished_again(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        job = self.job(long_ago, long_ago)
+        fail_stale_jobs(timeout=3600)
+        _finish(job.id, AnalysisJob.DONE, progress=1.0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.FAILED)
+
+
+class UploadTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media = override_settings(MEDIA_ROOT=self.dir)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.auth = login(self.client, "upload")
+
+    def test_response_keeps_the_outlier_records(self):
+        path = write_csv(self.dir, "data.csv", sample_rows(200))
+        for message in ("Uploaded & analyzed", "Already analyzed"):
+            with open(path, "rb") as f:
+                response = self.client.post("/api/upload/", {"file": f}, **self.auth)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(data["message"], message)
+            summary = data["summary"]
+            self.assertTrue(summary["outliers"])
+            self.assertEqual(len(summary["outliers"]), min(summary["outlier_count"], settings.OUTLIER_TOP_K))
+            # the full index and the rollup state stay server-side
+            self.assertFalse({"outlier_index", "outlier_severity", "stats", "sketches"} & set(summary))
+        stored = Dataset.objects.get()
+        self.assertNotIn("outliers", stored.summary)
+        self.assertEqual(stored.outlier_rows.count(), len(summary["outliers"]))
@@ -0,0 +1,93 @@
+import os
+import shutil
+import hashlib
+from django.conf import settings
+
+from .storage import save_chunks
+
+# Chunks of a resumable upload are kept as
+# <MEDIA_ROOT>/upload_sessions/<session id>/<index>.part until the session
+# is completed. Each chunk is written to a temp name and renamed once its
+# length and checksum check out, so a file with the final name is always a
+# complete, verified chunk and re-sending a chunk is harmless.
+
+READ_BYTES = 64 * 1024
+
+
+def session_dir(session):
+    return os.path.join(settings.MEDIA_ROOT, "upload_sessions", str(session.id))
+
+
+def received_chunks(session):
+    try:
+        names = os.listdir(session_dir(session))
+    except FileNotFoundError:
+        return []
+    return sorted(int(n[:-5]) for n in names if n.endswith(".part") and n[:-5].isdigit())
+
+
+def missing_chunks(session):
+    received = set(received_chunks(session))
+    return [i for i in range(session.chunk_count) if i not in received]
+
+
+def write_chunk(session, index, stream, sha256):
+    """
+    Store chunk index read from stream (file-like). Raises ValueError when the
+    index is out of range or the length or SHA-256 doesn't match.
+    """
+    if not 0 <= index < session.chunk_count:
+        raise ValueError(f"Chunk index must be between 0 and {session.chunk_count - 1}")
+    expected = session.chunk_length(index)
+
+    directory = session_dir(session)
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, f"{index}.{os.getpid()}.{id(stream)}.tmp")
+
+    digest = hashlib.sha256()
+    length = 0
+    try:
+        with open(tmp, "wb") as f:
+            while length <= expected:
+                data = stream.read(min(READ_BYTES, expected + 1 - length))
+                if not data:
+                    break
+                digest.update(data)
+                f.write(data)
+                length += len(data)
+        if length != expected:
+            raise ValueError(f"Chunk {index} must be {expected} bytes, got {length if length <= expected else 'more'}")
+        if sha256 and digest.hexdigest() != sha256.lower():
+            raise ValueError(f"Chunk {index} checksum mismatch")
+        os.replace(tmp, os.path.join(directory, f"{index}.part"))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _read_chunks(session, digest):
+    directory = session_dir(session)
+    for index in range(session.chunk_count):
+        with open(os.path.join(directory, f"{index}.part"), "rb") as f:
+            while True:
+                data = f.read(1024 * 1024)
+                if not data:
+                    break
+                digest.update(data)
+                yield data
+
+
+def assemble(session):
+    """
+    Concatenate every chunk into content-addressed storage. Returns
+    (storage name, sha256 of the CSV, sha256 of the uploaded bytes); the
+    two differ when the upload was compressed.
+    """
+    sent = hashlib.sha256()
+    name, sha256 = save_chunks(_read_chunks(session, sent))
+    return name, sha256, sent.hexdigest()
+
+
+def remove_session(session):
+    shutil.rmtree(session_dir(session), ignore_errors=True)
+    session.delete()
@@ -1,14 +1,25 @@
 from django.urls import path
-from .views import RegisterView, LoginView, UploadCSVView, SummaryView, HistoryView, GeneratePDFView, DatasetDataView
+from .views import RegisterView, LoginView, RefreshView, UploadCSVView, BatchUploadView, SummaryView, HistoryView, GeneratePDFView, DatasetDataView, DatasetOutliersView, JobStatusView, RollupView, DistributionView, UploadSessionCreateView, UploadSessionView, UploadChunkView, UploadCompleteView, MetricsView
 from rest_framework.permissions import AllowAny
 
 urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('auth/login/', LoginView.as_view(), name='login'),
+    path('auth/refresh/', RefreshView.as_view(), name='token_refresh'),
     path('upload/', UploadCSVView.as_view(), name='upload_csv'),
+    path('upload/batch/', BatchUploadView.as_view(), name='upload_batch'),
+    path('uploads/', UploadSessionCreateView.as_view(), name='upload_session_create'),
+    path('uploads/<int:upload_id>/', UploadSessionView.as_view(), name='upload_session'),
+    path('uploads/<int:upload_id>/chunks/<int:index>/', UploadChunkView.as_view(), name='upload_chunk'),
+    path('uploads/<int:upload_id>/complete/', UploadCompleteView.as_view(), name='upload_complete'),
     path('summary/', SummaryView.as_view(), name='summary'),
     path('history/', HistoryView.as_view(), name='history'),
+    path('rollup/', RollupView.as_view(), name='rollup'),
+    path('distribution/', DistributionView.as_view(), name='distribution'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('jobs/<int:job_id>/', JobStatusView.as_view(), name='job_status'),
     path('generate_pdf/<int:dataset_id>/', GeneratePDFView.as_view(), name='generate_pdf'),
     path("dataset/<int:dataset_id>/data/", DatasetDataView.as_view()),
+    path("dataset/<int:dataset_id>/outliers/", DatasetOutliersView.as_view(), name="dataset_outliers"),
 
 ]
@@ -1,84 +1,35 @@
-import pandas as pd
 from io import BytesIO
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')
 
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.utils import ImageReader
 
-# CSV ANALYSIS FUNCTION
-
-def analyze_equipment_csv(path):
-    df = pd.read_csv(path)
-
-    total = len(df)
-    avg_flow = df["Flowrate"].mean()
-    avg_pressure = df["Pressure"].mean()
-    avg_temp = df["Temperature"].mean()
-
-    # Type distribution
-    type_dist = df["Type"].value_counts().to_dict()
-
-     #Correlation Matrix
-    corr = df[["Flowrate", "Pressure", "Temperature"]].corr()
-    corr_matrix = corr.round(3).to_dict()
+from .engine import analyze_csv
+from .outliers import DEFAULT_TOP_K
+from .charts import render_chart
+from .timing import timed
 
-    #Outlier Detection using Z-score
-    df["z_flow"] = (df["Flowrate"] - avg_flow) / df["Flowrate"].std()
-    df["z_pressure"] = (df["Pressure"] - avg_pressure) / df["Pressure"].std()
-    df["z_temp"] = (df["Temperature"] - avg_temp) / df["Temperature"].std()
-
-    outliers = df[
-        (df["z_flow"].abs() >= 2) |
-        (df["z_pressure"].abs() >= 2) |
-        (df["z_temp"].abs() >= 2)
-    ]
-
-    outlier_rows = outliers.to_dict(orient="records")
+# CSV ANALYSIS FUNCTION
 
-    # Type-wise averages
-    typewise = (
-        df.groupby("Type")[["Flowrate", "Pressure", "Temperature"]]
-        .mean()
-        .round(2)
-        .to_dict(orient="index")
+@timed("analysis")
+def analyze_equipment_csv(path, chunk_rows=None, progress=None,
+                          outlier_method="zscore", outlier_threshold=None, outlier_top_k=DEFAULT_TOP_K):
+    # one engine for both modes (see engine.py); chunked keeps memory flat for large files
+    return analyze_csv(
+        path, chunk_rows, progress,
+        outlier_method=outlier_method, outlier_threshold=outlier_threshold, outlier_top_k=outlier_top_k,
     )
 
-    summary = {
-        "total_equipment": int(total),
-        "avg_flowrate": float(avg_flow),
-        "avg_pressure": float(avg_pressure),
-        "avg_temperature": float(avg_temp),
-        "type_distribution": type_dist,
-
-        "correlation": corr_matrix,
-        "outliers": outlier_rows,
-        "typewise_averages": typewise,
-    }
-
-    return summary, df
-
 
 #pie chart
+@timed("chart")
 def generate_pie_chart(type_distribution):
-    labels = list(type_distribution.keys())
-    values = list(type_distribution.values())
-
-    fig, ax = plt.subplots(figsize=(4, 4))
-    ax.pie(values, labels=labels, autopct="%1.1f%%")
-    ax.set_title("Equipment Type Distribution")
-
-    buffer = BytesIO()
-    plt.savefig(buffer, format="png", dpi=150, bbox_inches="tight")
-    buffer.seek(0)
-    plt.close(fig)
-
-    return buffer
+    # pooled, pyplot-free renderer with a PNG cache (see charts.py)
+    return BytesIO(render_chart("type_pie", type_distribution))
 
 
 #pdf generation
+@timed("pdf")
 def generate_pdf_report(summary):
     buffer = BytesIO()
     pdf = canvas.Canvas(buffer, pagesize=A4)
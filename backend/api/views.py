@@ -1,29 +1,39 @@
-import os
+import hmac
 import jwt
-import pandas as pd
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from django.db import transaction
+from django.db.models import Max, Count
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 
-from django.http import FileResponse
-
-from .models import Dataset
-from .utils import analyze_equipment_csv, generate_pdf_report
-from .serializers import DatasetSerializer
+from django.http import FileResponse, HttpResponse
+
+from .models import Dataset, AnalysisJob, Outlier, UploadSession
+from .serializers import DatasetSerializer, SUMMARY_FIELDS, parse_fields, pick_fields
+from .authentication import user_from_access_token, issue_tokens, decode_token, REFRESH
+from .columnar import open_columnar
+from .outliers import outlier_records
+from .rollup import rollup, distribution
+from .sketches import DEFAULT_QUANTILES
+from .ingest import analyze_saved_file, store_dataset, reuse_dataset
+from .storage import save_upload, release_file, unclaim
+from .batch import save_batch, ingest_batch
+from .compression import check_csv_name
+from .uploads import received_chunks, missing_chunks, write_chunk, assemble, remove_session
+from .jobs import enqueue, job_status, schedule_prerender
+from .reports import open_report
+from .timing import span
+from .metrics import REGISTRY, cache_lookup
 
 
 def authenticate_request(request):
-  
+    # stateless: the access token's claims are enough, no User query
     auth = request.headers.get("Authorization") or request.META.get("HTTP_AUTHORIZATION")
     if not auth:
         return None
@@ -33,15 +43,7 @@ def authenticate_request(request):
     else:
         token = auth
 
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        user_id = payload.get("user_id")
-        if not user_id:
-            return None
-        return User.objects.get(id=user_id)
-
-    except Exception:
-        return None
+    return user_from_access_token(token)
 
 
 
@@ -84,10 +86,34 @@ class LoginView(APIView):
         if not user:
             return Response({"error": "Invalid credentials"}, status=400)
 
-        payload = { "user_id": user.id }
-        token = jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+        return Response(issue_tokens(user))
+
+
+# REFRESH
+@method_decorator(csrf_exempt, name="dispatch")
+class RefreshView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+    parser_classes = [JSONParser, FormParser]
+
+    def post(self, request):
+        refresh = request.data.get("refresh")
+        if not refresh:
+            return Response({"error": "refresh token required"}, status=400)
+
+        try:
+            payload = decode_token(refresh, REFRESH)
+        except jwt.ExpiredSignatureError:
+            return Response({"error": "Refresh token has expired"}, status=401)
+        except jwt.InvalidTokenError:
+            return Response({"error": "Invalid refresh token"}, status=401)
+
+        # the one place the account is re-checked
+        user = User.objects.filter(id=payload["user_id"], is_active=True).first()
+        if not user:
+            return Response({"error": "User not found"}, status=401)
 
-        return Response({"token": token})
+        return Response(issue_tokens(user))
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -96,7 +122,6 @@ class UploadCSVView(APIView):
     authentication_classes = ()
     parser_classes = [MultiPartParser, FormParser]
 
-    @transaction.atomic
     def post(self, request):
         user = authenticate_request(request)
         if not user:
@@ -107,45 +132,284 @@ class UploadCSVView(APIView):
             return Response({"error": "File missing"}, status=400)
 
         filename = file.name
-        if not filename.lower().endswith(".csv"):
-            return Response({"error": "Only CSV allowed"}, status=400)
-
-        saved_path = default_storage.save(
-            f"datasets/{filename}",
-            ContentFile(file.read())
-        )
-        full_path = os.path.join(settings.MEDIA_ROOT, saved_path)
+        try:
+            check_csv_name(filename)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
-        # run analysis
+        # streamed (and decompressed, if .gz / .zst) to content-addressed storage
         try:
-            summary, df = analyze_equipment_csv(full_path)
-        except Exception as e:
-            default_storage.delete(saved_path)
+            with span("save"):
+                saved_path, sha256 = save_upload(file)
+        except ValueError as e:
             return Response({"error": str(e)}, status=400)
+        return _analyze_upload(request, user, saved_path, sha256, filename)
 
-        dataset = Dataset.objects.create(
-            uploader=user,
-            file=saved_path,
-            summary=summary
-        )
 
-       
-        qs = Dataset.objects.filter(uploader=user).order_by("-uploaded_at")
-        if qs.count() > 5:
-            for old in qs[5:]:
-                try:
-                    default_storage.delete(old.file.name)
-                except:
-                    pass
-                old.delete()
+def _wants_async(request):
+    return str(request.data.get("async", request.GET.get("async", ""))).lower() in ("1", "true", "yes")
 
+
+def _analyze_upload(request, user, saved_path, sha256, filename):
+    """Shared tail of the plain and the resumable upload: dedup, then sync or queued analysis."""
+    # identical content is answered from the existing analysis
+    with span("dedup"):
+        dataset = reuse_dataset(user, sha256, filename)
+    cache_lookup("analysis", dataset is not None)
+    if dataset is not None:
+        unclaim(saved_path)
         return Response({
-            "message": "Uploaded & analyzed",
+            "message": "Already analyzed",
             "dataset_id": dataset.id,
             "filename": filename,
-            "summary": summary
+            "summary": {**dataset.summary, "outliers": list(dataset.outlier_rows.values_list("data", flat=True))},
+            "deduplicated": True,
         })
 
+    # async mode: queue the analysis and answer right away
+    if _wants_async(request):
+        job = AnalysisJob.objects.create(uploader_id=user.id, file=saved_path, filename=filename, sha256=sha256)
+        unclaim(saved_path)
+        enqueue(job)
+        return Response({
+            "message": "Upload queued for analysis",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/jobs/{job.id}/",
+        }, status=202)
+
+    # run analysis
+    try:
+        summary = analyze_saved_file(saved_path)
+    except Exception as e:
+        release_file(saved_path, claimed=True)
+        return Response({"error": str(e)}, status=400)
+
+    try:
+        with span("store"):
+            dataset = store_dataset(user, saved_path, summary, filename=filename, sha256=sha256)
+    finally:
+        unclaim(saved_path)
+    schedule_prerender(dataset)
+
+    return Response({
+        "message": "Uploaded & analyzed",
+        "dataset_id": dataset.id,
+        "filename": filename,
+        # the stored summary, plus the top outlier records uploads have always returned
+        "summary": {**dataset.summary, "outliers": summary["outliers"]},
+    })
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class BatchUploadView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        user = authenticate_request(request)
+        if not user:
+            return Response({"error": "Not authenticated"}, status=401)
+
+        # any number of "files" parts: CSVs (.gz / .zst too) or zip archives of them
+        uploads = request.FILES.getlist("files")
+        if not uploads:
+            return Response({"error": "Files missing"}, status=400)
+
+        try:
+            with span("save"):
+                files = save_batch(uploads)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        combined = ingest_batch(user, files)
+        results = [file.result() for file in files]
+        if combined is None:
+            return Response({"error": "No file could be analyzed", "files": results}, status=400)
+        return Response({
+            "message": "Batch analyzed",
+            "dataset_ids": list(dict.fromkeys(f.dataset.id for f in files if f.dataset is not None)),
+            "files": results,
+            "combined": combined,
+        })
+
+
+def _session_status(session):
+    received = received_chunks(session)
+    return {
+        "upload_id": session.id,
+        "filename": session.filename,
+        "size": session.size,
+        "chunk_size": session.chunk_size,
+        "chunk_count": session.chunk_count,
+        "received": received,
+        "missing": sorted(set(range(session.chunk_count)) - set(received)),
+    }
+
+
+class UploadSessionCreateView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+    parser_classes = [JSONParser]
+
+    def post(self, request):
+        user = authenticate_request(request)
+        if not user:
+            return Response({"error": "Not authenticated"}, status=401)
+
+        filename = str(request.data.get("filename", ""))
+        try:
+            check_csv_name(filename)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        try:
+            size = int(request.data.get("size"))
+            chunk_size = int(request.data.get("chunk_size") or settings.UPLOAD_CHUNK_BYTES)
+        except (TypeError, ValueError):
+            return Response({"error": "size and chunk_size must be integers"}, status=400)
+        if size < 1:
+            return Response({"error": "size must be >= 1"}, status=400)
+        if not 1 <= chunk_size <= settings.UPLOAD_CHUNK_MAX_BYTES:
+            return Response({"error": f"chunk_size must be between 1 and {settings.UPLOAD_CHUNK_MAX_BYTES}"}, status=400)
+
+        session = UploadSession.objects.create(uploader_id=user.id, filename=filename, size=size, chunk_size=chunk_size)
+        return Response(_session_status(session), status=201)
+
+
+def _user_session(request, upload_id):
+    """(user, session, error response) for the session routes."""
+    user = authenticate_request(request)
+    if not user:
+        return None, None, Response({"error": "Not authenticated"}, status=401)
+    try:
+        return user, UploadSession.objects.get(id=upload_id, uploader_id=user.id), None
+    except UploadSession.DoesNotExist:
+        return user, None, Response({"error": "Upload not found"}, status=404)
+
+
+class UploadSessionView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+
+    def get(self, request, upload_id):
+        # which chunks the server already has, for resuming
+        user, session, error = _user_session(request, upload_id)
+        if error:
+            return error
+        return Response(_session_status(session))
+
+    def delete(self, request, upload_id):
+        user, session, error = _user_session(request, upload_id)
+        if error:
+            return error
+        remove_session(session)
+        return Response(status=204)
+
+
+class UploadChunkView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+
+    def put(self, request, upload_id, index):
+        # raw chunk bytes as the body, X-Chunk-SHA256 = hex digest of them
+        user, session, error = _user_session(request, upload_id)
+        if error:
+            return error
+        try:
+            write_chunk(session, index, request, request.headers.get("X-Chunk-SHA256"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"upload_id": session.id, "received": index})
+
+
+class UploadCompleteView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+    parser_classes = [JSONParser, FormParser]
+
+    def post(self, request, upload_id):
+        user, session, error = _user_session(request, upload_id)
+        if error:
+            return error
+
+        missing = missing_chunks(session)
+        if missing:
+            return Response({"error": "Upload incomplete", "missing": missing}, status=409)
+
+        try:
+            saved_path, sha256, sent_sha256 = assemble(session)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        # optional checksum of the whole file as sent
+        expected = request.data.get("sha256")
+        if expected and expected.lower() != sent_sha256:
+            release_file(saved_path, claimed=True)
+            return Response({"error": "File checksum mismatch"}, status=400)
+
+        filename = session.filename
+        remove_session(session)
+        return _analyze_upload(request, user, saved_path, sha256, filename)
+
+
+class MetricsView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+
+    def get(self, request):
+        if not settings.METRICS_ENABLED:
+            return Response({"error": "Metrics disabled"}, status=404)
+        if settings.METRICS_TOKEN:
+            auth = request.headers.get("Authorization", "")
+            if not hmac.compare_digest(auth.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+                return Response({"error": "Not authenticated"}, status=401)
+        return HttpResponse(REGISTRY.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class JobStatusView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+
+    def get(self, request, job_id):
+        user = authenticate_request(request)
+        if not user:
+            return Response({"error": "Not authenticated"}, status=401)
+
+        try:
+            job = AnalysisJob.objects.select_related("dataset").get(id=job_id, uploader_id=user.id)
+        except AnalysisJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=404)
+
+        return Response(job_status(job))
+
+
+def _dataset_etag(user, prefix):
+    # strong validator from the newest dataset; changes on every upload/prune
+    latest = Dataset.objects.filter(uploader_id=user.id).aggregate(
+        last_id=Max("id"), last_at=Max("uploaded_at"), count=Count("id")
+    )
+    if not latest["count"]:
+        return None
+    stamp = int(latest["last_at"].timestamp() * 1e6)
+    return f'"{prefix}-{latest["last_id"]}-{stamp}-{latest["count"]}"'
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get("If-None-Match", "")
+    return etag is not None and (header.strip() == "*" or etag in [t.strip() for t in header.split(",")])
+
+
+def _page_params(request):
+    """(offset, limit) from the query string; raises ValueError on bad input."""
+    try:
+        offset = int(request.GET.get("offset", 0))
+        limit = int(request.GET.get("limit", 100))
+    except ValueError:
+        raise ValueError("offset and limit must be integers")
+    if offset < 0 or limit < 1:
+        raise ValueError("offset must be >= 0 and limit >= 1")
+    return offset, min(limit, settings.DATASET_PAGE_MAX_ROWS)
+
 
 class SummaryView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -156,12 +420,26 @@ class SummaryView(APIView):
         if not user:
             return Response({"error": "Not authenticated"}, status=401)
 
-        datasets = Dataset.objects.filter(uploader=user).order_by("-uploaded_at")
+        # ?fields=a,b picks summary keys; without it the full summary
+        # (including the top outlier records) is returned as before
+        try:
+            fields = parse_fields(request.GET.get("fields"), SUMMARY_FIELDS + ("outliers",))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
-        if not datasets.exists():
+        etag = _dataset_etag(user, "summary" if fields is None else "summary:" + ",".join(fields))
+        if etag is None:
             return Response({"error": "No datasets yet"}, status=404)
+        if _etag_matches(request, etag):
+            return Response(status=304, headers={"ETag": etag})
+
+        dataset = Dataset.objects.filter(uploader_id=user.id).defer("stats", "sketches").order_by("-uploaded_at").first()
+
+        data = {"dataset_id": dataset.id, **pick_fields(dataset.summary, fields)}
+        if fields is None or "outliers" in fields:
+            data["outliers"] = list(dataset.outlier_rows.values_list("data", flat=True))
 
-        return Response(datasets.first().summary)
+        return Response(data, headers={"ETag": etag})
 
 
 class HistoryView(APIView):
@@ -173,9 +451,144 @@ class HistoryView(APIView):
         if not user:
             return Response({"error": "Not authenticated"}, status=401)
 
-        qs = Dataset.objects.filter(uploader=user).order_by("-uploaded_at")[:5]
-        data = DatasetSerializer(qs, many=True).data
-        return Response(data)
+        try:
+            fields = parse_fields(request.GET.get("fields"), SUMMARY_FIELDS)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        prefix = "history" if fields is None else "history:" + ",".join(fields)
+        etag = _dataset_etag(user, prefix) or f'"{prefix}-empty"'
+        if _etag_matches(request, etag):
+            return Response(status=304, headers={"ETag": etag})
+
+        qs = Dataset.objects.filter(uploader_id=user.id).defer("stats", "sketches").order_by("-uploaded_at")[:5]
+        data = DatasetSerializer(qs, many=True, context={"fields": fields}).data
+        return Response(data, headers={"ETag": etag})
+
+
+class DatasetOutliersView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+
+    def get(self, request, dataset_id):
+        user = authenticate_request(request)
+        if not user:
+            return Response({"error": "Not authenticated"}, status=401)
+
+        try:
+            dataset = Dataset.objects.get(id=dataset_id, uploader_id=user.id)
+        except Dataset.DoesNotExist:
+            return Response({"error": "Not found"}, status=404)
+
+        try:
+            offset, limit = _page_params(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        # every flagged row, most severe first, read from the columnar copy;
+        # datasets stored before the outlier index existed page the Outlier table
+        store = open_columnar(dataset)
+        index = store.outlier_index()
+        if index is not None:
+            rows, severity = index
+            total = len(rows)
+            page = rows[offset:offset + limit]
+            rows = outlier_records(store.take(page), page, severity[offset:offset + limit])
+        else:
+            total = dataset.summary.get("outlier_count", 0)
+            rows = list(
+                Outlier.objects.filter(dataset=dataset)
+                .order_by("position")
+                .values_list("data", flat=True)[offset:offset + limit]
+            )
+        next_offset = offset + len(rows)
+
+        return Response({
+            "outliers": rows,
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "next_offset": next_offset if next_offset < total else None,
+        })
+
+
+def _selected_datasets(request, user, qs):
+    """
+    The user's datasets named by ?ids=1,2,3 (all of them when absent), newest first.
+    ValueError on a malformed list, Dataset.DoesNotExist when one is missing or none exist.
+    """
+    raw = request.GET.get("ids")
+    try:
+        ids = [int(i) for i in raw.split(",") if i.strip()] if raw else None
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers")
+
+    qs = qs.filter(uploader_id=user.id).order_by("-uploaded_at")
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    datasets = list(qs)
+    if ids is not None:
+        missing = sorted(set(ids) - {d.id for d in datasets})
+        if missing:
+            raise Dataset.DoesNotExist(f"Datasets not found: {', '.join(map(str, missing))}")
+    if not datasets:
+        raise Dataset.DoesNotExist("No datasets yet")
+    return datasets
+
+
+class RollupView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+
+    def get(self, request):
+        user = authenticate_request(request)
+        if not user:
+            return Response({"error": "Not authenticated"}, status=401)
+
+        # ?ids=1,2,3 picks datasets; without it every dataset in the user's history
+        try:
+            datasets = _selected_datasets(request, user, Dataset.objects.defer("sketches"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        except Dataset.DoesNotExist as e:
+            return Response({"error": str(e)}, status=404)
+
+        combined, per_dataset = rollup(datasets)
+        return Response({
+            "dataset_ids": [d.id for d in datasets],
+            "combined": combined,
+            "datasets": [
+                {"dataset_id": d.id, "filename": d.filename or d.file.name.split("/")[-1], **summary}
+                for d, summary in zip(datasets, per_dataset)
+            ],
+        })
+
+
+class DistributionView(APIView):
+    permission_classes = ()
+    authentication_classes = ()
+
+    def get(self, request):
+        user = authenticate_request(request)
+        if not user:
+            return Response({"error": "Not authenticated"}, status=401)
+
+        # same ?ids= selection as the rollup; ?q=0.5,0.95 picks the quantiles
+        try:
+            datasets = _selected_datasets(request, user, Dataset.objects.defer("stats"))
+            raw = request.GET.get("q")
+            quantiles = [float(q) for q in raw.split(",") if q.strip()] if raw else DEFAULT_QUANTILES
+            if not all(0 <= q <= 1 for q in quantiles):
+                raise ValueError("q values must be between 0 and 1")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        except Dataset.DoesNotExist as e:
+            return Response({"error": str(e)}, status=404)
+
+        return Response({
+            "dataset_ids": [d.id for d in datasets],
+            **distribution(datasets, quantiles),
+        })
 
 
 class GeneratePDFView(APIView):
@@ -188,11 +601,11 @@ class GeneratePDFView(APIView):
             return Response({"error": "Not authenticated"}, status=401)
 
         try:
-            dataset = Dataset.objects.get(id=dataset_id, uploader=user)
+            dataset = Dataset.objects.get(id=dataset_id, uploader_id=user.id)
         except Dataset.DoesNotExist:
             return Response({"error": "Dataset not found"}, status=404)
 
-        pdf = generate_pdf_report(dataset.summary)
+        pdf = open_report(dataset)
 
         return FileResponse(
             pdf,
@@ -211,13 +624,26 @@ class DatasetDataView(APIView):
             return Response({"error": "Not authenticated"}, status=401)
 
         try:
-            dataset = Dataset.objects.get(id=dataset_id, uploader=user)
+            dataset = Dataset.objects.get(id=dataset_id, uploader_id=user.id)
         except Dataset.DoesNotExist:
             return Response({"error": "Not found"}, status=404)
 
-        df = pd.read_csv(dataset.file.path)
+        try:
+            offset, limit = _page_params(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        # the sidecar's fixed-width columns and string offsets act as the
+        # row index, so any page is a direct slice
+        store = open_columnar(dataset)
+        rows = store.read_rows(offset, offset + limit)
+        next_offset = offset + len(rows)
 
         return Response({
-            "columns": df.columns.tolist(),
-            "rows": df.head(100).to_dict(orient="records")
+            "columns": store.names,
+            "rows": rows,
+            "offset": offset,
+            "limit": limit,
+            "total_rows": store.rows,
+            "next_offset": next_offset if next_offset < store.rows else None,
         })
@@ -56,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware",
+    "api.timing.TimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -159,7 +161,94 @@ MEDIA_URL = '/media/'
 # JWT config
 JWT_SECRET = os.getenv('JWT_SECRET', SECRET_KEY)
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
-JWT_EXP_DELTA_SECONDS = int(os.getenv('JWT_EXP_DELTA_SECONDS', 60 * 60 * 24))  # default 24h
+JWT_EXP_DELTA_SECONDS = int(os.getenv('JWT_EXP_DELTA_SECONDS', 60 * 60 * 24))  # refresh token lifetime, default 24h
+JWT_ACCESS_TTL_SECONDS = int(os.getenv('JWT_ACCESS_TTL_SECONDS', 15 * 60))  # access token lifetime, default 15 min
+JWT_CACHE_TTL_SECONDS = int(os.getenv('JWT_CACHE_TTL_SECONDS', 60))
+JWT_CACHE_MAX_ENTRIES = int(os.getenv('JWT_CACHE_MAX_ENTRIES', 1024))
+
+# CSV analysis: files above the threshold are analyzed in chunks of ANALYSIS_CHUNK_ROWS
+ANALYSIS_STREAMING_THRESHOLD_BYTES = int(os.getenv('ANALYSIS_STREAMING_THRESHOLD_BYTES', 50 * 1024 * 1024))
+ANALYSIS_CHUNK_ROWS = int(os.getenv('ANALYSIS_CHUNK_ROWS', 100_000))
+# Parameter columns are parsed as float64 or float32 (half the memory, ~7 digits);
+# CSV_PARSER auto uses pyarrow for whole-file reads when it is installed (c: never)
+ANALYSIS_FLOAT_DTYPE = os.getenv('ANALYSIS_FLOAT_DTYPE', 'float64')
+CSV_PARSER = os.getenv('CSV_PARSER', 'auto')
+
+# Outlier detection: zscore, mad, iqr or mahalanobis. OUTLIER_THRESHOLD defaults
+# per method (see api/outliers.py); the summary keeps the OUTLIER_TOP_K most severe records
+OUTLIER_METHOD = os.getenv('OUTLIER_METHOD', 'zscore')
+OUTLIER_THRESHOLD = float(os.getenv('OUTLIER_THRESHOLD')) if os.getenv('OUTLIER_THRESHOLD') else None
+OUTLIER_TOP_K = int(os.getenv('OUTLIER_TOP_K', 100))
+
+# Stored uploads are compressed at rest: gzip, zstd (needs the zstandard package) or none
+STORAGE_COMPRESSION = os.getenv('STORAGE_COMPRESSION', 'gzip')
+STORAGE_COMPRESSION_LEVEL = int(os.getenv('STORAGE_COMPRESSION_LEVEL', 3))
+
+# Resumable uploads: default and largest accepted chunk size
+UPLOAD_CHUNK_BYTES = int(os.getenv('UPLOAD_CHUNK_BYTES', 8 * 1024 * 1024))
+UPLOAD_CHUNK_MAX_BYTES = int(os.getenv('UPLOAD_CHUNK_MAX_BYTES', 64 * 1024 * 1024))
+
+# manage.py sweep_storage: files unreferenced for this long are deleted, upload
+# sessions untouched for UPLOAD_SESSION_MAX_AGE_SECONDS are dropped
+STORAGE_SWEEP_GRACE_SECONDS = int(os.getenv('STORAGE_SWEEP_GRACE_SECONDS', 3600))
+UPLOAD_SESSION_MAX_AGE_SECONDS = int(os.getenv('UPLOAD_SESSION_MAX_AGE_SECONDS', 7 * 24 * 3600))
+
+# Background threads running async upload analysis (per web worker process).
+# A running job that hasn't reported progress for ANALYSIS_JOB_TIMEOUT_SECONDS
+# is taken to be orphaned by a dead worker and failed
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 2))
+ANALYSIS_JOB_TIMEOUT_SECONDS = int(os.getenv('ANALYSIS_JOB_TIMEOUT_SECONDS', 3600))
+
+# Batch uploads (/api/upload/batch/): files are analyzed by BATCH_WORKERS
+# processes (0: one per core); BATCH_MAX_BYTES caps the unpacked size of a zip
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 0))
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 100))
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+# Rendered PDF reports are cached on disk under MEDIA_ROOT/report_cache
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+REPORT_PRERENDER = os.getenv('REPORT_PRERENDER', 'false').lower() in ('1', 'true', 'yes')
+
+# Per-request timing: Server-Timing header plus a JSON line per request on the
+# api.timing logger. PROFILE_REQUESTS saves cProfile stats of requests slower
+# than PROFILE_SLOW_REQUEST_MS to PROFILE_DIR (see api/timing.py)
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes')
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', 'false').lower() in ('1', 'true', 'yes')
+PROFILE_SLOW_REQUEST_MS = float(os.getenv('PROFILE_SLOW_REQUEST_MS', 1000))
+PROFILE_DIR = os.getenv('PROFILE_DIR', BASE_DIR / 'profiles')
+
+# Prometheus-text metrics at /api/metrics/, off unless METRICS_ENABLED: they
+# show per-view traffic. With METRICS_TOKEN set a scrape must send it as
+# "Authorization: Bearer <token>"; without one, only expose the endpoint where
+# just the scraper can reach it. With several worker processes set
+# METRICS_DIR to a directory they share (emptied on restart); each process
+# writes its totals there at most every METRICS_FLUSH_SECONDS
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 1))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api.timing": {
+            "handlers": ["console"],
+            "level": os.getenv('REQUEST_TIMING_LOG_LEVEL', 'INFO'),
+            "propagate": False,
+        },
+    },
+}
+
+# Chart rendering: warm figures per chart template and cached PNGs per process
+CHART_RENDERER_POOL_SIZE = int(os.getenv('CHART_RENDERER_POOL_SIZE', 4))
+CHART_CACHE_ENTRIES = int(os.getenv('CHART_CACHE_ENTRIES', 128))
+
+# Largest page DatasetDataView will return
+DATASET_PAGE_MAX_ROWS = int(os.getenv('DATASET_PAGE_MAX_ROWS', 5000))
 
 # Rest framework
 REST_FRAMEWORK = {
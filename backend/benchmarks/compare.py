@@ -0,0 +1,61 @@
+"""
+Compare two benchmarks.run result files:
+
+    python -m benchmarks.compare base.json new.json [--threshold 1.2]
+
+Prints new/base ratios of the fastest time and the peak memory for every
+case in both files; exits with status 1 when a time ratio exceeds the
+threshold.
+"""
+import sys
+import json
+import argparse
+
+
+def _load(path):
+    with open(path) as f:
+        payload = json.load(f)
+    return payload, {(r["name"], r["rows"]): r for r in payload["results"]}
+
+
+def _ratio(new, base):
+    if new is None or not base:
+        return None
+    return new / base
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Time ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    base_run, base = _load(args.base)
+    new_run, new = _load(args.new)
+    print(f"base {base_run['environment']['commit']}  new {new_run['environment']['commit']}")
+    print(f"{'case':<24} {'rows':>10} {'base s':>10} {'new s':>10} {'time':>7} {'memory':>7}")
+
+    regressions = []
+    for key in sorted(base.keys() & new.keys(), key=lambda k: (k[1], k[0])):
+        b, n = base[key], new[key]
+        time_ratio = _ratio(n["seconds_min"], b["seconds_min"])
+        mem_ratio = _ratio(n.get("peak_bytes"), b.get("peak_bytes"))
+        flag = ""
+        if time_ratio is not None and time_ratio > args.threshold:
+            flag = "  <- slower"
+            regressions.append(key)
+        memory = "-" if mem_ratio is None else f"{mem_ratio:.2f}x"
+        print(
+            f"{key[0]:<24} {key[1]:>10} {b['seconds_min']:>10.4f} {n['seconds_min']:>10.4f} "
+            f"{time_ratio:>6.2f}x {memory:>7}{flag}"
+        )
+
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than {args.threshold}x")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Synthetic equipment CSVs for the benchmarks, in the upload format
+# (Equipment Name, Type, Flowrate, Pressure, Temperature). Written in
+# blocks so 10M-row files never sit in memory whole.
+
+BASE_TYPES = ["Pump", "Valve", "Reactor", "Compressor", "HeatExchanger", "Condenser"]
+
+# mean / std of the normal each parameter is drawn from
+PARAMETERS = {
+    "Flowrate": (120.0, 30.0),
+    "Pressure": (6.0, 1.5),
+    "Temperature": (110.0, 20.0),
+}
+
+# outliers are placed this many standard deviations from the mean
+OUTLIER_SIGMAS = 8.0
+
+BLOCK_ROWS = 1_000_000
+
+
+def type_names(count):
+    names = BASE_TYPES[:count]
+    return names + [f"Type{i}" for i in range(len(names), count)]
+
+
+def _block(rng, start, rows, types, nan_rate, outlier_rate, extra_columns):
+    df = pd.DataFrame({
+        "Equipment Name": [f"EQ-{i}" for i in range(start, start + rows)],
+        "Type": types[rng.integers(len(types), size=rows)],
+    })
+    # unrelated export columns the analysis doesn't need, alternately text and numbers
+    for j in range(extra_columns):
+        if j % 2:
+            df[f"Extra{j}"] = rng.normal(0.0, 1.0, rows)
+        else:
+            df[f"Extra{j}"] = [f"note-{i % 97}" for i in range(start, start + rows)]
+    for col, (mean, std) in PARAMETERS.items():
+        values = rng.normal(mean, std, rows)
+        outliers = rng.random(rows) < outlier_rate
+        values[outliers] = mean + rng.choice([-1.0, 1.0], outliers.sum()) * OUTLIER_SIGMAS * std
+        values[rng.random(rows) < nan_rate] = np.nan
+        df[col] = values
+    df.loc[rng.random(rows) < nan_rate, "Type"] = np.nan
+    return df
+
+
+def generate_csv(path, rows, type_count=len(BASE_TYPES), nan_rate=0.01, outlier_rate=0.001, seed=0,
+                 extra_columns=0):
+    """
+    Write a rows-long equipment CSV to path. nan_rate is the share of blank
+    cells per column, outlier_rate the share of values per numeric column
+    moved OUTLIER_SIGMAS standard deviations out, extra_columns the number
+    of additional unrelated columns. Same arguments, same file.
+    """
+    rng = np.random.default_rng(seed)
+    types = np.array(type_names(type_count), dtype=object)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="") as f:
+        for start in range(0, rows, BLOCK_ROWS):
+            block = _block(rng, start, min(BLOCK_ROWS, rows - start), types, nan_rate, outlier_rate, extra_columns)
+            block.to_csv(f, index=False, header=start == 0, float_format="%.4f")
+        if not rows:
+            extra = [f"Extra{j}" for j in range(extra_columns)]
+            f.write(",".join(["Equipment Name", "Type", *extra, *PARAMETERS]) + "\n")
+    os.replace(tmp, path)
+    return path
+
+
+def cached_csv(data_dir, rows, **options):
+    """Path of a generated CSV in data_dir, generating it on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    key = "-".join(f"{k}{v}" for k, v in sorted(options.items()))
+    path = os.path.join(data_dir, f"equipment-{rows}{'-' + key if key else ''}.csv")
+    if not os.path.exists(path):
+        generate_csv(path, rows, **options)
+    return path
@@ -0,0 +1,397 @@
+"""
+Benchmarks for the analysis, report and API hot paths.
+
+Run from backend/:
+
+    python -m benchmarks.run                       # 1k, 100k and 10M rows
+    python -m benchmarks.run --rows 1000 100000 --only api.
+    python -m benchmarks.compare old.json new.json
+
+Each case is timed --repeat times (min and median are recorded) and run
+once more under tracemalloc for its peak Python/numpy heap. Results go to
+a JSON file (benchmarks/results/<commit>-<time>.json by default) together
+with the commit and library versions, for benchmarks.compare.
+
+The ingest.* cases read the CSV with a plain pd.read_csv and with the
+declared schema (api/schema.py); their DataFrame size is recorded as
+frame_bytes and the schema/plain ratios are printed and saved under
+"reductions".
+
+api.upload_serial and api.upload_batch send the same BATCH_FILES smaller
+CSVs (rows / BATCH_FILES each) one request at a time and as one batch
+upload; the batch is analyzed by worker processes, whose memory the
+tracemalloc peak doesn't see, so only their times are compared.
+
+The API cases go through the Django test client against a throwaway test
+database and MEDIA_ROOT, so the configured database is never touched.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+
+from .generate import BASE_TYPES, cached_csv
+
+DEFAULT_ROWS = (1_000, 100_000, 10_000_000)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# rows per page requested from the data endpoint
+PAGE_ROWS = 100
+
+# CSVs per batch upload, one history's worth
+BATCH_FILES = 5
+
+# (case, baseline, compared keys) printed and saved as "reductions"
+REDUCTIONS = (
+    ("ingest.schema", "ingest.untyped", ("seconds_min", "peak_bytes", "frame_bytes")),
+    ("ingest.schema_float32", "ingest.untyped", ("seconds_min", "peak_bytes", "frame_bytes")),
+    ("api.upload_batch", "api.upload_serial", ("seconds_min",)),
+)
+
+
+def _setup_django(media_root):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production-use")
+    os.environ["MEDIA_ROOT"] = media_root
+    # keep the per-request timing log (api/timing.py) out of the results table
+    os.environ.setdefault("REQUEST_TIMING_LOG_LEVEL", "WARNING")
+
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    return connection.creation.create_test_db(verbosity=0)
+
+
+def _teardown_django(old_name):
+    from django.db import connection
+    from django.test.utils import teardown_test_environment
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+    teardown_test_environment()
+
+
+def measure(fn, repeat, memory=True, setup=None):
+    """Time fn repeat times (setup runs untimed before each call) and, with memory, its tracemalloc peak."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    result = {
+        "repeat": repeat,
+        "seconds_min": min(times),
+        "seconds_median": statistics.median(times),
+    }
+    if memory:
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _environment():
+    import numpy
+    import pandas
+    import django
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "django": django.__version__,
+    }
+
+
+class Cases:
+    """The benchmark cases for one generated CSV, sharing one test-client user."""
+
+    def __init__(self, path, rows, batch_paths=()):
+        from django.conf import settings
+        from django.test import Client
+        from django.contrib.auth.models import User
+
+        self.path = path
+        self.rows = rows
+        self.batch_paths = list(batch_paths)
+        self.chunk_rows = settings.ANALYSIS_CHUNK_ROWS
+        self.client = Client()
+
+        username = f"bench{rows}"
+        User.objects.filter(username=username).delete()
+        User.objects.create_user(username=username, password="benchmark")
+        self.user = User.objects.get(username=username)
+        login = self.client.post(
+            "/api/auth/login/", {"username": username, "password": "benchmark"},
+            content_type="application/json",
+        ).json()
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {login['token']}"}
+        self.summary = None
+        self.dataset_id = None
+        self.history_filled = False
+        self.frame = None
+
+    def _get(self, url, **params):
+        response = self.client.get(url, params, **self.auth)
+        assert response.status_code == 200, (url, response.status_code)
+        return response
+
+    # ingest: the declared schema (api/schema.py) against a plain read_csv
+
+    def ingest_untyped(self):
+        import pandas as pd
+        from api.compression import open_csv
+        with open_csv(self.path) as f:
+            self.frame = pd.read_csv(f)
+
+    def ingest_schema(self):
+        from api.engine import read_frame
+        self.frame = read_frame(self.path)
+
+    def ingest_schema_float32(self):
+        from django.test import override_settings
+        with override_settings(ANALYSIS_FLOAT_DTYPE="float32"):
+            self.ingest_schema()
+
+    # analysis
+
+    def analysis_utils(self):
+        from api.utils import analyze_equipment_csv
+        self.summary, _ = analyze_equipment_csv(self.path)
+
+    def analysis_utils_chunked(self):
+        from api.utils import analyze_equipment_csv
+        analyze_equipment_csv(self.path, chunk_rows=self.chunk_rows)
+
+    # report / serializer
+
+    def ensure_summary(self):
+        if self.summary is None:
+            self.analysis_utils()
+
+    def report_pdf(self):
+        from api.utils import generate_pdf_report
+        generate_pdf_report(self.summary)
+
+    def _history_queryset(self):
+        from api.models import Dataset
+        return Dataset.objects.filter(uploader_id=self.user.id).defer("stats", "sketches").order_by("-uploaded_at")
+
+    def serializer_history(self):
+        from api.serializers import DatasetSerializer
+        DatasetSerializer(self._history_queryset(), many=True).data
+
+    # endpoints
+
+    def _clear_datasets(self):
+        # a repeated upload of the same file would be answered from the
+        # existing analysis, so drop it first
+        from api.models import Dataset
+        from api.ingest import remove_dataset_files
+        datasets = list(Dataset.objects.filter(uploader_id=self.user.id))
+        Dataset.objects.filter(uploader_id=self.user.id).delete()
+        remove_dataset_files(datasets)
+        self.dataset_id = None
+        self.history_filled = False
+
+    def api_upload(self):
+        with open(self.path, "rb") as f:
+            response = self.client.post("/api/upload/", {"file": f}, **self.auth)
+        assert response.status_code == 200, response.content[:200]
+        self.dataset_id = response.json()["dataset_id"]
+
+    def api_upload_serial(self):
+        for path in self.batch_paths:
+            with open(path, "rb") as f:
+                response = self.client.post("/api/upload/", {"file": f}, **self.auth)
+            assert response.status_code == 200, response.content[:200]
+
+    def api_upload_batch(self):
+        files = [open(path, "rb") for path in self.batch_paths]
+        try:
+            response = self.client.post("/api/upload/batch/", {"files": files}, **self.auth)
+        finally:
+            for f in files:
+                f.close()
+        assert response.status_code == 200, response.content[:200]
+
+    def ensure_history(self):
+        # history shows HISTORY_LIMIT datasets; copies of the uploaded one will do
+        from api.models import Dataset
+        from api.ingest import HISTORY_LIMIT
+        if self.dataset_id is None:
+            self.api_upload()
+        if self.history_filled:
+            return
+        self.history_filled = True
+        source = Dataset.objects.get(id=self.dataset_id)
+        for i in range(HISTORY_LIMIT - 1):
+            Dataset.objects.create(
+                uploader_id=self.user.id, file=source.file.name, filename=f"copy{i}.csv",
+                sha256=source.sha256, summary=source.summary,
+            )
+
+    def api_summary(self):
+        self._get("/api/summary/")
+
+    def api_history(self):
+        self._get("/api/history/")
+
+    def api_data(self):
+        self._get(f"/api/dataset/{self.dataset_id}/data/", offset=max(0, self.rows // 2), limit=PAGE_ROWS)
+
+    def plan(self):
+        """(name, fn, setup) in run order; setup runs untimed before every call."""
+        return [
+            ("ingest.untyped", self.ingest_untyped, None),
+            ("ingest.schema", self.ingest_schema, None),
+            ("ingest.schema_float32", self.ingest_schema_float32, None),
+            ("analysis.utils", self.analysis_utils, None),
+            ("analysis.utils_chunked", self.analysis_utils_chunked, None),
+            ("report.pdf", self.report_pdf, self.ensure_summary),
+            ("api.upload", self.api_upload, self._clear_datasets),
+            ("api.upload_serial", self.api_upload_serial, self._clear_datasets),
+            ("api.upload_batch", self.api_upload_batch, self._clear_datasets),
+            ("serializer.history", self.serializer_history, self.ensure_history),
+            ("api.summary", self.api_summary, self.ensure_history),
+            ("api.history", self.api_history, self.ensure_history),
+            ("api.data", self.api_data, self.ensure_history),
+        ]
+
+
+def _reductions(results, rows):
+    """How the REDUCTIONS cases compare with their baselines at one size."""
+    by_name = {r["name"]: r for r in results if r["rows"] == rows}
+    reductions = []
+    for name, base, keys in REDUCTIONS:
+        if name not in by_name or base not in by_name:
+            continue
+        entry = {"name": name, "against": base, "rows": rows}
+        for key in keys:
+            if key in by_name[name] and by_name[base].get(key):
+                entry[key.replace("_min", "") + "_ratio"] = by_name[name][key] / by_name[base][key]
+        reductions.append(entry)
+    return reductions
+
+
+def _format(result):
+    line = f"{result['seconds_min']:9.4f}s min {result['seconds_median']:9.4f}s median"
+    if "peak_bytes" in result:
+        line += f" {result['peak_bytes'] / 2 ** 20:9.1f} MiB peak"
+    if "frame_bytes" in result:
+        line += f" {result['frame_bytes'] / 2 ** 20:9.1f} MiB frame"
+    return line
+
+
+def run(args):
+    media_root = tempfile.mkdtemp(prefix="cepv-bench-media-")
+    old_name = _setup_django(media_root)
+    results, reductions = [], []
+    try:
+        for rows in args.rows:
+            print(f"generating {rows} rows ...", flush=True)
+            path = cached_csv(
+                args.data_dir, rows, type_count=args.types, nan_rate=args.nan_rate,
+                outlier_rate=args.outlier_rate, seed=args.seed, extra_columns=args.extra_columns,
+            )
+            batch_paths = [
+                cached_csv(
+                    args.data_dir, max(1, rows // BATCH_FILES), type_count=args.types, nan_rate=args.nan_rate,
+                    outlier_rate=args.outlier_rate, seed=args.seed + 1 + i, extra_columns=args.extra_columns,
+                )
+                for i in range(BATCH_FILES)
+            ]
+            cases = Cases(path, rows, batch_paths)
+            for name, fn, setup in cases.plan():
+                if args.only and not any(pattern in name for pattern in args.only):
+                    continue
+                result = measure(fn, args.repeat, memory=not args.no_memory, setup=setup)
+                if cases.frame is not None:
+                    result["frame_bytes"] = int(cases.frame.memory_usage(deep=True).sum())
+                    cases.frame = None
+                results.append({"name": name, "rows": rows, **result})
+                print(f"{rows:>10} {name:<24} {_format(result)}", flush=True)
+            for entry in _reductions(results, rows):
+                reductions.append(entry)
+                ratios = ", ".join(f"{k[:-6]} {v:.2f}x" for k, v in entry.items() if k.endswith("_ratio"))
+                print(f"{rows:>10} {entry['name']} vs {entry['against']}: {ratios}", flush=True)
+    finally:
+        _teardown_django(old_name)
+        shutil.rmtree(media_root, ignore_errors=True)
+    return results, reductions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS), help="CSV sizes to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--types", type=int, default=len(BASE_TYPES), help="Distinct equipment types")
+    parser.add_argument("--nan-rate", type=float, default=0.01, help="Share of blank cells per column")
+    parser.add_argument("--outlier-rate", type=float, default=0.001, help="Share of outlying values per numeric column")
+    parser.add_argument("--extra-columns", type=int, default=4, help="Unrelated columns added to the CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", default=None, help="Only cases whose name contains one of these")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument(
+        "--data-dir", default=os.path.join(tempfile.gettempdir(), "cepv-benchmarks"),
+        help="Where generated CSVs are cached",
+    )
+    parser.add_argument("--out", default=None, help="Results JSON (default benchmarks/results/<commit>-<time>.json)")
+    args = parser.parse_args(argv)
+
+    environment = _environment()
+    started = datetime.now(timezone.utc)
+    results, reductions = run(args)
+
+    out = args.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"{environment['commit']}-{started:%Y%m%d-%H%M%S}.json")
+    payload = {
+        "started": started.isoformat(),
+        "environment": environment,
+        "options": {k: v for k, v in vars(args).items() if k not in ("out", "data_dir")},
+        "results": results,
+        "reductions": reductions,
+    }
+    with open(out, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,4 +11,27 @@ api.interceptors.request.use(cfg => {
   return cfg;
 });
 
+// access tokens are short-lived: on a 401, swap the refresh token for a new one and retry once
+api.interceptors.response.use(
+  res => res,
+  async err => {
+    const cfg = err.config;
+    const refresh = localStorage.getItem("refresh");
+    if (err.response?.status !== 401 || !refresh || cfg._retried || cfg.url.includes("/auth/")) {
+      return Promise.reject(err);
+    }
+    cfg._retried = true;
+    try {
+      const res = await api.post("/auth/refresh/", { refresh });
+      localStorage.setItem("token", res.data.token);
+      localStorage.setItem("refresh", res.data.refresh);
+    } catch (e) {
+      localStorage.removeItem("token");
+      localStorage.removeItem("refresh");
+      return Promise.reject(err);
+    }
+    return api(cfg);
+  }
+);
+
 export default api;
@@ -44,7 +44,7 @@ export default function CollapsibleSidebar({ open, onClose }) {
 
       <List>
         <ListItemButton
-          onClick={() => { localStorage.removeItem("token"); go("/"); }}
+          onClick={() => { localStorage.removeItem("token"); localStorage.removeItem("refresh"); go("/"); }}
           sx={{ borderRadius: 1 }}
         >
           <ListItemText
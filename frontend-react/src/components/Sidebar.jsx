@@ -35,7 +35,7 @@ export default function Sidebar() {
         <ListItemButton
           sx={{ mt: 2, color: "red" }}
           onClick={() => {
-            localStorage.removeItem("token");
+            localStorage.removeItem("token"); localStorage.removeItem("refresh");
             navigate("/");
           }}
         >
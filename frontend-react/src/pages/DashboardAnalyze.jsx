@@ -55,8 +55,8 @@ export default function DashboardAnalyze({ mode, toggleMode }) {
     setError(null);
 
     if (!file) return setError("Please choose a CSV file first.");
-    if (!file.name.toLowerCase().endsWith(".csv"))
-      return setError("Invalid file type — only CSV files allowed.");
+    if (![".csv", ".csv.gz", ".csv.zst"].some((ext) => file.name.toLowerCase().endsWith(ext)))
+      return setError("Invalid file type — only CSV files (optionally .gz / .zst) allowed.");
 
     const fd = new FormData();
     fd.append("file", file);
@@ -223,7 +223,7 @@ export default function DashboardAnalyze({ mode, toggleMode }) {
             <input
               id="upload-input"
               type="file"
-              accept=".csv"
+              accept=".csv,.gz,.zst"
               style={{ display: "none" }}
               onChange={(e) => setFile(e.target.files?.[0] ?? null)}
             />
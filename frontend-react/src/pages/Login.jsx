@@ -12,6 +12,7 @@ export default function Login() {
     try {
       const res = await api.post("/auth/login/", { username, password });
       localStorage.setItem("token", res.data.token);
+      localStorage.setItem("refresh", res.data.refresh);
       window.location.href = "/dashboard";
     } catch (err) {
       setError("Invalid credentials");
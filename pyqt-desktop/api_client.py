@@ -1,15 +1,32 @@
 import requests
+from requests.adapters import HTTPAdapter
 import os
 import json
+import time
+import gzip
+import shutil
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 TOKEN_STORE = os.path.expanduser("~/.cepv_token.json")
+# unfinished resumable uploads, file -> upload session id
+UPLOAD_STORE = os.path.expanduser("~/.cepv_uploads.json")
 
 class APIClient:
     def __init__(self, base_url: str):
         if not base_url.endswith("/"):
             base_url += "/"
         self.base = base_url + "api/"
+        # one pooled keep-alive session shared by every call (and every worker thread)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.token = None
+        self.refresh_token = None
+        self._validators = {}
         self._load_token()
 
   
@@ -19,20 +36,48 @@ class APIClient:
                 with open(TOKEN_STORE, "r") as f:
                     data = json.load(f)
                     self.token = data.get("token")
+                    self.refresh_token = data.get("refresh")
         except Exception:
             self.token = None
+            self.refresh_token = None
 
     def _save_token(self):
         try:
             with open(TOKEN_STORE, "w") as f:
-                json.dump({"token": self.token}, f)
+                json.dump({"token": self.token, "refresh": self.refresh_token}, f)
         except Exception:
             pass
 
-    def set_token(self, token: str):
+    def set_token(self, token: str, refresh: str = None):
         self.token = token
+        self._validators.clear()
+        if refresh is not None or token is None:
+            self.refresh_token = refresh
         self._save_token()
 
+    def refresh(self):
+        # trade the refresh token for a new access token; False if that's not possible
+        if not self.refresh_token:
+            return False
+        url = self.base + "auth/refresh/"
+        res = self.session.post(url, json={"refresh": self.refresh_token}, headers=self._headers(json_body=True))
+        if res.status_code != 200:
+            return False
+        data = res.json()
+        self.set_token(data.get("token"), data.get("refresh"))
+        return True
+
+    def _send(self, method, url, extra_headers=None, **kwargs):
+        # access tokens are short-lived: on 401 refresh once and retry
+        res = self.session.request(method, url, headers={**self._headers(), **(extra_headers or {})}, **kwargs)
+        if res.status_code == 401 and self.refresh():
+            files = kwargs.get("files", {})
+            # a dict, or a list of (field, file) for repeated fields
+            for v in (files.values() if isinstance(files, dict) else (v for _, v in files)):
+                v[1].seek(0)
+            res = self.session.request(method, url, headers={**self._headers(), **(extra_headers or {})}, **kwargs)
+        return res
+
     
     def _headers(self, json_body=False):
         h = {"Accept": "application/json"}
@@ -46,7 +91,7 @@ class APIClient:
     def register(self, username, password):
         url = self.base + "auth/register/"
         payload = {"username": username, "password": password}
-        res = requests.post(url, json=payload, headers=self._headers(json_body=True))
+        res = self.session.post(url, json=payload, headers=self._headers(json_body=True))
         try:
             data = res.json()
         except Exception:
@@ -59,25 +104,81 @@ class APIClient:
     def login(self, username, password):
         url = self.base + "auth/login/"
         payload = {"username": username, "password": password}
-        res = requests.post(url, json=payload, headers=self._headers(json_body=True))
+        res = self.session.post(url, json=payload, headers=self._headers(json_body=True))
         try:
             data = res.json()
         except Exception:
             res.raise_for_status()
         if res.status_code != 200:
             raise Exception(data.get("error", f"Login failed ({res.status_code})"))
-        self.token = data.get("token")
-        self._save_token()
+        self.set_token(data.get("token"), data.get("refresh"))
         return data
 
-    def upload_csv(self, file_path):
+    @staticmethod
+    def _gzipped(file_path):
+        # (path to send, name to send, temp file to remove): plain CSVs are
+        # gzipped first (they shrink ~10x), compressed ones are sent as they are
+        with open(file_path, "rb") as f:
+            head = f.read(4)
+        if head[:2] == b"\x1f\x8b" or head == b"\x28\xb5\x2f\xfd":
+            return file_path, os.path.basename(file_path), None
+        fd, tmp = tempfile.mkstemp(suffix=".csv.gz")
+        # mtime=0 keeps the output identical between runs, so a resumed upload matches
+        with open(file_path, "rb") as src, os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        return tmp, os.path.basename(file_path) + ".gz", tmp
+
+    def upload_csv(self, file_path, poll_interval=1.0, on_progress=None, compress=True):
+        # uploads in async mode and polls the job until the analysis is done
         url = self.base + "upload/"
         if not self.token:
             raise Exception("Not logged in")
-        with open(file_path, "rb") as f:
-            files = {"file": (os.path.basename(file_path), f, "text/csv")}
-            headers = {"Authorization": f"Bearer {self.token}"}
-            res = requests.post(url, files=files, headers=headers)
+        send_path, name, tmp = self._gzipped(file_path) if compress else (file_path, os.path.basename(file_path), None)
+        try:
+            with open(send_path, "rb") as f:
+                files = {"file": (name, f, "application/gzip" if tmp else "text/csv")}
+                res = self._send("POST", url, files=files, data={"async": "1"})
+        finally:
+            if tmp:
+                os.remove(tmp)
+        try:
+            data = res.json()
+        except Exception:
+            res.raise_for_status()
+        return self._wait_for_analysis(res, data, poll_interval, on_progress)
+
+    def upload_many(self, file_paths, compress=True):
+        """
+        Batch upload: CSVs and/or zip archives of them in one request, analyzed
+        in parallel on the server. Returns per-file results ("files") and the
+        combined summary of the batch ("combined"). Plain CSVs are gzipped
+        before sending unless compress is False; zips are sent as they are.
+        """
+        if not self.token:
+            raise Exception("Not logged in")
+        temps = []
+        handles = []
+        try:
+            files = []
+            for file_path in file_paths:
+                if file_path.lower().endswith(".zip"):
+                    send_path, name, tmp, kind = file_path, os.path.basename(file_path), None, "application/zip"
+                elif compress:
+                    send_path, name, tmp = self._gzipped(file_path)
+                    kind = "application/gzip" if tmp else "text/csv"
+                else:
+                    send_path, name, tmp, kind = file_path, os.path.basename(file_path), None, "text/csv"
+                if tmp:
+                    temps.append(tmp)
+                f = open(send_path, "rb")
+                handles.append(f)
+                files.append(("files", (name, f, kind)))
+            res = self._send("POST", self.base + "upload/batch/", files=files)
+        finally:
+            for f in handles:
+                f.close()
+            for tmp in temps:
+                os.remove(tmp)
         try:
             data = res.json()
         except Exception:
@@ -86,31 +187,234 @@ class APIClient:
             raise Exception(data.get("error", f"Upload failed ({res.status_code})"))
         return data
 
-    def get_summary(self):
-        url = self.base + "summary/"
-        res = requests.get(url, headers=self._headers())
+    def _wait_for_analysis(self, res, data, poll_interval, on_progress):
+        # 200: analyzed (or deduplicated) already; 202: poll the job until it is done
+        if res.status_code == 200:
+            return data
+        if res.status_code != 202:
+            raise Exception(data.get("error", f"Upload failed ({res.status_code})"))
+
+        while True:
+            job = self.get_job(data["job_id"])
+            if on_progress:
+                on_progress(job)
+            if job["status"] == "done":
+                return {
+                    "message": "Uploaded & analyzed",
+                    "dataset_id": job["dataset_id"],
+                    "filename": job["filename"],
+                    "summary": job.get("summary"),
+                }
+            if job["status"] == "failed":
+                raise Exception(job.get("error") or "Analysis failed")
+            time.sleep(poll_interval)
+
+    def upload_csv_resumable(self, file_path, chunk_size=8 * 1024 * 1024, workers=4,
+                             poll_interval=1.0, on_progress=None, retries=3, compress=True):
+        """
+        Chunked upload for large files: chunks go up concurrently with a
+        SHA-256 each, and a session interrupted earlier (crash, dropped VPN)
+        is resumed from the chunks the server already has. Plain CSVs are
+        gzipped before sending unless compress is False.
+        """
+        if not self.token:
+            raise Exception("Not logged in")
+        key = self._resume_key(file_path)
+        send_path, name, tmp = self._gzipped(file_path) if compress else (file_path, os.path.basename(file_path), None)
+        try:
+            return self._upload_chunks(key, send_path, name, chunk_size, workers, poll_interval, on_progress, retries)
+        finally:
+            if tmp:
+                os.remove(tmp)
+
+    def _upload_chunks(self, key, file_path, name, chunk_size, workers, poll_interval, on_progress, retries):
+        size = os.path.getsize(file_path)
+
+        session = None
+        upload_id = self._load_uploads().get(key)
+        if upload_id:
+            res = self._send("GET", self.base + f"uploads/{upload_id}/")
+            if res.status_code == 200 and res.json()["size"] == size:
+                session = res.json()
+        if session is None:
+            payload = {"filename": name, "size": size, "chunk_size": chunk_size}
+            res = self._send("POST", self.base + "uploads/", json=payload)
+            session = res.json()
+            if res.status_code != 201:
+                raise Exception(session.get("error", f"Upload failed ({res.status_code})"))
+            self._remember_upload(key, session["upload_id"])
+
+        upload_id = session["upload_id"]
+        missing = session["missing"]
+        total = session["chunk_count"]
+        done = [total - len(missing)]
+        lock = threading.Lock()
+
+        def send(index):
+            with open(file_path, "rb") as f:
+                f.seek(index * session["chunk_size"])
+                body = f.read(session["chunk_size"])
+            headers = {"Content-Type": "application/octet-stream", "X-Chunk-SHA256": hashlib.sha256(body).hexdigest()}
+            url = self.base + f"uploads/{upload_id}/chunks/{index}/"
+            for attempt in range(retries):
+                try:
+                    res = self._send("PUT", url, extra_headers=headers, data=body)
+                    if res.status_code == 200:
+                        break
+                except requests.RequestException:
+                    if attempt == retries - 1:
+                        raise
+                else:
+                    if attempt == retries - 1:
+                        raise Exception(f"Chunk {index} failed ({res.status_code})")
+                time.sleep(2 ** attempt)
+            if on_progress:
+                with lock:
+                    done[0] += 1
+                    on_progress({"status": "uploading", "progress": done[0] / total})
+
+        # a failed chunk stops the upload; the session stays on the server
+        # and the next call for the same file resumes it
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(send, missing):
+                pass
+
+        res = self._send("POST", self.base + f"uploads/{upload_id}/complete/",
+                         json={"async": True, "sha256": self._file_sha256(file_path)})
+        try:
+            data = res.json()
+        except Exception:
+            res.raise_for_status()
+        if res.status_code != 409:  # 409: chunks still missing, keep the session to resume
+            self._forget_upload(key)
+        return self._wait_for_analysis(res, data, poll_interval, on_progress)
+
+    @staticmethod
+    def _file_sha256(file_path):
+        sha = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _resume_key(file_path):
+        st = os.stat(file_path)
+        return f"{os.path.abspath(file_path)}|{st.st_size}|{int(st.st_mtime)}"
+
+    def _load_uploads(self):
+        try:
+            with open(UPLOAD_STORE, "r") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _remember_upload(self, key, upload_id):
+        uploads = self._load_uploads()
+        uploads[key] = upload_id
+        try:
+            with open(UPLOAD_STORE, "w") as f:
+                json.dump(uploads, f)
+        except Exception:
+            pass
+
+    def _forget_upload(self, key):
+        uploads = self._load_uploads()
+        if uploads.pop(key, None) is not None:
+            try:
+                with open(UPLOAD_STORE, "w") as f:
+                    json.dump(uploads, f)
+            except Exception:
+                pass
+
+    def get_job(self, job_id):
+        url = self.base + f"jobs/{job_id}/"
+        res = self._send("GET", url)
+        try:
+            data = res.json()
+        except Exception:
+            res.raise_for_status()
+        if res.status_code != 200:
+            raise Exception(data.get("error", f"Job status load failed ({res.status_code})"))
+        return data
+
+    def _get_cached(self, url, what):
+        # conditional GET: an unchanged resource costs a 304 with no body
+        cached = self._validators.get(url)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        res = self._send("GET", url, extra_headers=headers)
+        if res.status_code == 304 and cached:
+            return cached[1]
         try:
             data = res.json()
         except Exception:
             res.raise_for_status()
         if res.status_code != 200:
-            raise Exception(data.get("error", f"Summary load failed ({res.status_code})"))
+            self._validators.pop(url, None)
+            raise Exception(data.get("error", f"{what} load failed ({res.status_code})"))
+        etag = res.headers.get("ETag")
+        if etag:
+            self._validators[url] = (etag, data)
         return data
 
-    def get_history(self):
+    def get_summary(self, fields=None):
+        # fields: optional list of summary keys, e.g. to leave out the outlier records
+        url = self.base + "summary/"
+        if fields:
+            url += "?fields=" + ",".join(fields)
+        return self._get_cached(url, "Summary")
+
+    def get_history(self, fields=None):
         url = self.base + "history/"
-        res = requests.get(url, headers=self._headers())
+        if fields:
+            url += "?fields=" + ",".join(fields)
+        return self._get_cached(url, "History")
+
+    def get_rollup(self, dataset_ids=None):
+        # combined + per-dataset summaries of several uploads (all recent ones by default)
+        url = self.base + "rollup/"
+        params = {"ids": ",".join(map(str, dataset_ids))} if dataset_ids else None
+        res = self._send("GET", url, params=params)
+        try:
+            data = res.json()
+        except Exception:
+            res.raise_for_status()
+        if res.status_code != 200:
+            raise Exception(data.get("error", f"Rollup load failed ({res.status_code})"))
+        return data
+
+    def get_distribution(self, dataset_ids=None, quantiles=None):
+        # percentiles + histograms per parameter, overall and per Type
+        url = self.base + "distribution/"
+        params = {}
+        if dataset_ids:
+            params["ids"] = ",".join(map(str, dataset_ids))
+        if quantiles:
+            params["q"] = ",".join(map(str, quantiles))
+        res = self._send("GET", url, params=params)
         try:
             data = res.json()
         except Exception:
             res.raise_for_status()
         if res.status_code != 200:
-            raise Exception(data.get("error", f"History load failed ({res.status_code})"))
+            raise Exception(data.get("error", f"Distribution load failed ({res.status_code})"))
         return data
 
-    def get_dataset_rows(self, dataset_id):
+    def get_outliers(self, dataset_id, offset=0, limit=100):
+        url = self.base + f"dataset/{dataset_id}/outliers/"
+        res = self._send("GET", url, params={"offset": offset, "limit": limit})
+        try:
+            data = res.json()
+        except Exception:
+            res.raise_for_status()
+        if res.status_code != 200:
+            raise Exception(data.get("error", f"Outliers load failed ({res.status_code})"))
+        return data
+
+    def get_dataset_rows(self, dataset_id, offset=0, limit=100):
         url = self.base + f"dataset/{dataset_id}/data/"
-        res = requests.get(url, headers=self._headers())
+        params = {"offset": offset, "limit": limit}
+        res = self._send("GET", url, params=params)
         try:
             data = res.json()
         except Exception:
@@ -119,11 +423,17 @@ class APIClient:
             raise Exception(data.get("error", f"Dataset rows load failed ({res.status_code})"))
         return data
 
+    def iter_dataset_pages(self, dataset_id, page_size=1000, offset=0):
+        # lazily yields one page at a time; nothing is fetched until iterated
+        while offset is not None:
+            page = self.get_dataset_rows(dataset_id, offset=offset, limit=page_size)
+            yield page
+            offset = page.get("next_offset")
+
    
     def download_pdf(self, dataset_id, save_path):
         url = self.base + f"generate_pdf/{dataset_id}/"
-        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
-        res = requests.get(url, headers=headers, stream=True)
+        res = self._send("GET", url, stream=True)
         if res.status_code != 200:
             try:
                 data = res.json()
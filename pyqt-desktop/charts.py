@@ -1,4 +1,5 @@
 
+import copy
 import matplotlib
 matplotlib.use("Agg")
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
@@ -26,71 +27,172 @@ def _autopct_counts(sizes):
     return inner
 
 
-def plot_type_distribution(canvas: MplCanvas, dist: dict):
-    canvas.clear()
-    ax = canvas.ax
-
-    
-    ax.set_title("Equipment Type Distribution", fontsize=14, fontweight="bold")
-
-    if not dist:
-        ax.text(0.5, 0.5, "No data", ha="center", va="center")
-        canvas.draw()
-        return
-
-    labels = list(dist.keys())
-    sizes = list(dist.values())
-
-    palette = ["#ffb300", "#42a5f5", "#ef5350", "#8e24aa",
-               "#ffa726", "#8d6e63", "#26a69a", "#5c6bc0"]
-    colors = [palette[i % len(palette)] for i in range(len(labels))]
-
-    ax.pie(
-        sizes,
-        labels=labels,
-        autopct=_autopct_counts(sizes),
-        pctdistance=0.75,
-        startangle=90,
-        colors=colors,
-        wedgeprops=dict(width=0.45, edgecolor="white")
-    )
-
-    ax.axis("equal")
-    canvas.draw()
-
-
-def plot_correlation_heatmap(canvas: MplCanvas, corr: dict):
-    canvas.clear()
-    ax = canvas.ax
-
-    ax.set_title("Correlation Heatmap", fontsize=14, fontweight="bold")
-
-    if not corr:
-        ax.text(0.5, 0.5, "No correlation data", ha="center", va="center")
-        canvas.draw()
-        return
-
-    keys = ["Flowrate", "Pressure", "Temperature"]
-    N = len(keys)
+PALETTE = ["#ffb300", "#42a5f5", "#ef5350", "#8e24aa",
+           "#ffa726", "#8d6e63", "#26a69a", "#5c6bc0"]
+HEATMAP_KEYS = ["Flowrate", "Pressure", "Temperature"]
+
+
+class ChartController:
+    """
+    Keeps the artists of one chart alive between polls.
+
+    update() is a no-op when the input hasn't changed; otherwise the
+    subclass either patches its existing artists in place or, when the
+    shape of the data changed, rebuilds the axes once. Either way the
+    canvas is only asked for a draw_idle(), never a full clear + draw.
+    """
+
+    def __init__(self, canvas: MplCanvas):
+        self.canvas = canvas
+        self.data = None
+        self.reset()
+
+    def update(self, data):
+        if data == self.data:
+            return
+        self.data = copy.deepcopy(data)
+        if not data:
+            self.show_empty()
+        elif not self.patch(data):
+            self.canvas.ax.cla()
+            self.build(data)
+        self.canvas.draw_idle()
+
+    def show_empty(self):
+        ax = self.canvas.ax
+        ax.cla()
+        ax.set_title(self.title, fontsize=14, fontweight="bold")
+        ax.text(0.5, 0.5, self.empty_text, ha="center", va="center")
+        self.reset()
+
+    def reset(self):
+        pass
+
+    def build(self, data):
+        raise NotImplementedError
+
+    def patch(self, data):
+        """Update existing artists for data; return False if a rebuild is needed."""
+        return False
+
+
+class TypeDistributionChart(ChartController):
+    title = "Equipment Type Distribution"
+    empty_text = "No data"
+
+    def reset(self):
+        self.labels = None
+        self.wedges = self.texts = self.autotexts = None
+
+    def build(self, dist):
+        ax = self.canvas.ax
+        ax.set_title(self.title, fontsize=14, fontweight="bold")
+
+        self.labels = list(dist.keys())
+        sizes = list(dist.values())
+        colors = [PALETTE[i % len(PALETTE)] for i in range(len(self.labels))]
+
+        self.wedges, self.texts, self.autotexts = ax.pie(
+            sizes,
+            labels=self.labels,
+            autopct=_autopct_counts(sizes),
+            pctdistance=0.75,
+            startangle=90,
+            colors=colors,
+            wedgeprops=dict(width=0.45, edgecolor="white")
+        )
+
+        ax.axis("equal")
+
+    def patch(self, dist):
+        if not self.wedges or list(dist.keys()) != self.labels:
+            return False
+
+        sizes = list(dist.values())
+        total = float(sum(sizes))
+        if total <= 0:
+            return False
+
+        # same walk ax.pie does: counter-clockwise from startangle=90
+        theta1 = 90.0
+        for wedge, label, count_text, size in zip(self.wedges, self.texts, self.autotexts, sizes):
+            theta2 = theta1 + 360.0 * size / total
+            wedge.set_theta1(theta1)
+            wedge.set_theta2(theta2)
+
+            mid = np.deg2rad((theta1 + theta2) / 2)
+            x, y = np.cos(mid), np.sin(mid)
+            label.set_position((1.1 * x, 1.1 * y))
+            label.set_horizontalalignment("left" if x > 0 else "right")
+            count_text.set_position((0.75 * x, 0.75 * y))
+            count_text.set_text(str(size))
+            theta1 = theta2
+        return True
+
+
+class CorrelationHeatmapChart(ChartController):
+    title = "Correlation Heatmap"
+    empty_text = "No correlation data"
+
+    def reset(self):
+        self.image = self.cells = None
+
+    def build(self, corr):
+        ax = self.canvas.ax
+        ax.set_title(self.title, fontsize=14, fontweight="bold")
+
+        M = _corr_matrix(corr)
+        N = len(HEATMAP_KEYS)
+        self.image = ax.imshow(M, cmap="RdYlBu_r", vmin=-1, vmax=1)
+
+        self.cells = [[ax.text(j, i, f"{M[i,j]:.2f}", ha="center", va="center", color="black", fontsize=9)
+                       for j in range(N)] for i in range(N)]
+
+        ax.set_xticks(range(N))
+        ax.set_yticks(range(N))
+        ax.set_xticklabels(HEATMAP_KEYS, rotation=30)
+        ax.set_yticklabels(HEATMAP_KEYS)
+
+        # the colorbar gets its own axes, so it is made once per canvas
+        if not getattr(self.canvas, "colorbar", None):
+            self.canvas.colorbar = self.canvas.figure.colorbar(self.image, ax=ax, fraction=0.046, pad=0.04)
+        else:
+            self.canvas.colorbar.update_normal(self.image)
+
+    def patch(self, corr):
+        if self.image is None:
+            return False
+        M = _corr_matrix(corr)
+        self.image.set_data(M)
+        for i, row in enumerate(self.cells):
+            for j, cell in enumerate(row):
+                cell.set_text(f"{M[i,j]:.2f}")
+        return True
+
+
+def _corr_matrix(corr):
+    N = len(HEATMAP_KEYS)
     M = np.zeros((N, N))
 
-    for i, r in enumerate(keys):
-        for j, c in enumerate(keys):
+    for i, r in enumerate(HEATMAP_KEYS):
+        for j, c in enumerate(HEATMAP_KEYS):
             try:
                 M[i, j] = float(corr.get(r, {}).get(c, 0))
             except:
                 M[i, j] = 0.0
+    return M
 
-    im = ax.imshow(M, cmap="RdYlBu_r", vmin=-1, vmax=1)
 
-    for i in range(N):
-        for j in range(N):
-            ax.text(j, i, f"{M[i,j]:.2f}", ha="center", va="center", color="black", fontsize=9)
+def _controller(canvas, cls):
+    ctl = getattr(canvas, "controller", None)
+    if not isinstance(ctl, cls):
+        ctl = canvas.controller = cls(canvas)
+    return ctl
 
-    ax.set_xticks(range(N))
-    ax.set_yticks(range(N))
-    ax.set_xticklabels(keys, rotation=30)
-    ax.set_yticklabels(keys)
 
-    canvas.figure.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
-    canvas.draw()
+def plot_type_distribution(canvas: MplCanvas, dist: dict):
+    _controller(canvas, TypeDistributionChart).update(dist)
+
+
+def plot_correlation_heatmap(canvas: MplCanvas, corr: dict):
+    _controller(canvas, CorrelationHeatmapChart).update(corr)
@@ -2,17 +2,25 @@ import sys
 import os
 import tempfile
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QMainWindow, QVBoxLayout, QHBoxLayout,QLineEdit, QPushButton, QLabel, QFileDialog, QListWidgetItem,QGroupBox, QTableWidget, QTableWidgetItem, QFrame, QMessageBox,QSizePolicy, QScrollArea
+    QApplication, QWidget, QMainWindow, QVBoxLayout, QHBoxLayout,QLineEdit, QPushButton, QLabel, QFileDialog, QListWidgetItem,QGroupBox, QTableWidget, QTableWidgetItem, QTableView, QFrame, QMessageBox,QSizePolicy, QScrollArea
 )
 from PyQt5.QtCore import Qt, QTimer, QSize
 from PyQt5.QtGui import QFont,QMovie
 from PyQt5.QtWidgets import QHeaderView
 
 from api_client import APIClient
+from workers import TaskRunner
+from table_model import DatasetTableModel
 from charts import MplCanvas, plot_type_distribution, plot_correlation_heatmap
 
 BACKEND_URL = "http://127.0.0.1:8000"
 POLL_INTERVAL_MS = 3000
+PREVIEW_PAGE_ROWS = 500
+OUTLIERS_SHOWN = 100
+# files above this go through the resumable chunked upload
+RESUMABLE_UPLOAD_BYTES = 32 * 1024 * 1024
+DASHBOARD_FIELDS = ["total_equipment", "avg_flowrate", "avg_pressure", "avg_temperature",
+                    "type_distribution", "correlation", "typewise_averages", "outlier_count"]
 
 APP_STYLE = """
 QWidget { background: #f6f6f7; font-family: "Segoe UI", Arial, sans-serif; }
@@ -21,7 +29,7 @@ QGroupBox { border: 1px solid #e6e6e6; border-radius: 10px; padding: 12px; backg
 QPushButton.primary { background: #ffb300; color: #000; border-radius: 8px; padding: 8px 12px; font-weight:700; }
 QPushButton.ghost { background: transparent; border: 2px solid #ffb300; color: #ffb300; border-radius: 18px; padding: 6px 10px; font-weight:700; }
 QFrame.sidebar { background: #efefef; border-right: 1px solid #e0e0e0; }
-QTableWidget { background: white; }
+QTableView { background: white; }
 """
 
 
@@ -177,10 +185,12 @@ class LoginDialog(QWidget):
 
 
 class DashboardPane(QWidget):
-    def __init__(self, api: APIClient):
+    def __init__(self, api: APIClient, tasks: TaskRunner):
         super().__init__()
         self.api = api
-        self.selected_file = None
+        self.tasks = tasks
+        self.selected_files = []
+        self.summary = None
         self.init_ui()
 
     def init_ui(self):
@@ -239,28 +249,57 @@ class DashboardPane(QWidget):
         self.setLayout(v)
 
     def choose(self):
-        p,_ = QFileDialog.getOpenFileName(self,"Select CSV","","CSV files (*.csv)")
-        if p:
-            self.selected_file = p
-            self.file_lbl.setText(os.path.basename(p))
+        # several files (or zip archives of them) go up as one batch
+        paths,_ = QFileDialog.getOpenFileNames(self,"Select CSV","","CSV files (*.csv *.csv.gz *.csv.zst *.zip)")
+        if paths:
+            self.selected_files = paths
+            self.file_lbl.setText(self._files_label())
+
+    def _files_label(self):
+        if len(self.selected_files) == 1:
+            return os.path.basename(self.selected_files[0])
+        return f"{len(self.selected_files)} files"
 
     def do_upload(self):
-        if not self.selected_file:
+        if not self.selected_files:
             QMessageBox.warning(self,"No file","Select CSV first.")
             return
-        try:
-            self.api.upload_csv(self.selected_file)
+        self.file_lbl.setText(f"Uploading {self._files_label()}...")
+        path = self.selected_files[0]
+        if len(self.selected_files) > 1 or path.lower().endswith(".zip"):
+            self.tasks.submit("upload", self.api.upload_many, self.selected_files,
+                              on_done=self.upload_done, on_error=self.upload_failed, replace=False)
+            return
+        upload = self.api.upload_csv
+        if os.path.getsize(path) > RESUMABLE_UPLOAD_BYTES:
+            upload = self.api.upload_csv_resumable
+        self.tasks.submit("upload", upload, path,
+                          on_done=self.upload_done, on_error=self.upload_failed, replace=False)
+
+    def upload_done(self, result):
+        failed = [f for f in result.get("files", []) if f.get("error")]
+        if failed:
+            QMessageBox.warning(self,"Partly uploaded","Not analyzed:\n" + "\n".join(f"{f['filename']}: {f['error']}" for f in failed))
+        else:
             QMessageBox.information(self,"OK","Uploaded & analyzed.")
-            self.refresh_all()
-            self.selected_file=None; self.file_lbl.setText("No file chosen")
-        except Exception as e:
-            show_error(self,"Upload failed",e)
+        self.refresh_all()
+        self.selected_files=[]; self.file_lbl.setText("No file chosen")
+
+    def upload_failed(self, e):
+        self.file_lbl.setText(self._files_label())
+        show_error(self,"Upload failed",e)
 
     def refresh_all(self):
-        try:
-            s = self.api.get_summary()
-        except Exception as e:
-            print("refresh_all error",e); return
+        # a poll still waiting on the server is left alone rather than stacked
+        self.tasks.submit("summary", self.api.get_summary, DASHBOARD_FIELDS, on_done=self.apply_summary,
+                          on_error=lambda e: print("refresh_all error",e), replace=False)
+
+    def apply_summary(self, s):
+        # same object back means the server answered 304
+        if s is self.summary:
+            return
+        self.summary = s
+
         self.v_total.setText(str(s.get("total_equipment","-")))
         self.v_flow.setText(f"{s.get('avg_flowrate',0):.2f}")
         self.v_press.setText(f"{s.get('avg_pressure',0):.2f}")
@@ -279,22 +318,30 @@ class DashboardPane(QWidget):
             self.tbl_type.setItem(r,2,QTableWidgetItem(str(v.get("Pressure",v.get("pressure","-")))))
             self.tbl_type.setItem(r,3,QTableWidgetItem(str(v.get("Temperature",v.get("temperature","-")))))
 
-        # outliers
-        outs = s.get("outliers",[])
-        if not outs:
+        # outliers come from their own paginated endpoint, only when the summary changed
+        if not s.get("outlier_count"):
             self.lbl_out.setText("No outliers detected.")
         else:
-            t=""
-            for o in outs:
-                n = o.get("EquipmentName") or o.get("Name") or "Unknown"
-                t += f"{n}: Flow {o.get('Flowrate')} | Pressure {o.get('Pressure')} | Temp {o.get('Temperature')}\n"
-            self.lbl_out.setText(t)
+            self.tasks.submit("outliers", self.api.get_outliers, s["dataset_id"], 0, OUTLIERS_SHOWN,
+                              on_done=self.apply_outliers,
+                              on_error=lambda e: print("outliers load error",e))
+
+    def apply_outliers(self, page):
+        t=""
+        for o in page.get("outliers",[]):
+            n = o.get("Equipment Name") or o.get("EquipmentName") or o.get("Name") or "Unknown"
+            t += f"{n}: Flow {o.get('Flowrate')} | Pressure {o.get('Pressure')} | Temp {o.get('Temperature')}\n"
+        if page.get("total",0) > len(page.get("outliers",[])):
+            t += f"... showing {len(page['outliers'])} of {page['total']}"
+        self.lbl_out.setText(t)
 
 
 class HistoryPane(QWidget):
-    def __init__(self, api: APIClient):
+    def __init__(self, api: APIClient, tasks: TaskRunner):
         super().__init__()
         self.api = api
+        self.tasks = tasks
+        self.history = None
         self.init_ui()
 
     def init_ui(self):
@@ -320,7 +367,7 @@ class HistoryPane(QWidget):
         v.addWidget(self.preview_title)
          
 
-        self.table = QTableWidget()
+        self.table = QTableView()
         table_wrap = QHBoxLayout()
         table_wrap.addStretch(1)
         table_wrap.addWidget(self.table,3)
@@ -378,35 +425,40 @@ class HistoryPane(QWidget):
         return box
 
     def refresh_list(self):
+        self.tasks.submit("history", self.api.get_history, on_done=self.apply_history,
+                          on_error=lambda e: print("history load error",e), replace=False)
+
+    def apply_history(self, arr):
+        # the client hands back the same object on a 304, so nothing to rebuild
+        if arr is self.history:
+            return
+        self.history = arr
+
         while self.card_layout.count():
             c = self.card_layout.takeAt(0)
             w = c.widget()
             if w: w.deleteLater()
 
-        try:
-            arr = self.api.get_history()
-        except Exception as e:
-            print("history load error",e); return
-
         for it in arr:
             card = self.build_card(it)
             self.card_layout.addWidget(card)
 
     def load_preview(self, item):
-        try:
-            d = self.api.get_dataset_rows(item["id"])
-        except Exception as e:
-            show_error(self,"Load failed",e); return
-
-        cols = d.get("columns",[]); rows = d.get("rows",[])
-        self.preview_title.setText(f"Dataset Preview — {item.get('filename')}")
-
-        self.table.setColumnCount(len(cols))
-        self.table.setRowCount(len(rows))
-        self.table.setHorizontalHeaderLabels(cols)
-        for r,row in enumerate(rows):
-            for c,col in enumerate(cols):
-                self.table.setItem(r,c,QTableWidgetItem(str(row.get(col,""))))
+        # a newer click supersedes a preview that is still loading
+        self.preview_title.setText(f"Loading {item.get('filename')}...")
+        self.tasks.submit("preview", self.api.get_dataset_rows, item["id"], 0, PREVIEW_PAGE_ROWS,
+                          on_done=lambda d: self.apply_preview(item, d),
+                          on_error=lambda e: show_error(self,"Load failed",e))
+
+    def apply_preview(self, item, d):
+        total = d.get("total_rows", len(d.get("rows",[])))
+        self.preview_title.setText(f"Dataset Preview — {item.get('filename')} ({total} rows)")
+
+        # further pages are pulled in by the model as the table scrolls
+        old = self.table.model()
+        self.table.setModel(DatasetTableModel(self.api, self.tasks, item["id"], d, page_size=PREVIEW_PAGE_ROWS, parent=self.table))
+        if old is not None:
+            old.deleteLater()
         self.table.resizeColumnsToContents()
 
 
@@ -414,6 +466,7 @@ class MainWindow(QMainWindow):
     def __init__(self, api: APIClient):
         super().__init__()
         self.api = api
+        self.tasks = TaskRunner(self)
         self.setWindowTitle("Chemical Equipment Visualizer (Desktop)")
         self.resize(1200,820)
         self.init_ui()
@@ -450,8 +503,8 @@ class MainWindow(QMainWindow):
         top.addWidget(self.btn_pdf)
         right.addLayout(top)
 
-        self.pane_dash = DashboardPane(self.api)
-        self.pane_hist = HistoryPane(self.api)
+        self.pane_dash = DashboardPane(self.api, self.tasks)
+        self.pane_hist = HistoryPane(self.api, self.tasks)
         right.addWidget(self.pane_dash)
         right.addWidget(self.pane_hist)
         self.pane_hist.hide()
@@ -467,28 +520,39 @@ class MainWindow(QMainWindow):
             self.pane_dash.hide(); self.pane_hist.show(); self.btn_pdf.hide()
 
     def refresh_all(self):
-        try:
-            self.pane_dash.refresh_all()
-        except Exception as e:
-            print("dash refresh",e)
-        try:
-            self.pane_hist.refresh_list()
-        except Exception as e:
-            print("hist refresh",e)
+        self.pane_dash.refresh_all()
+        self.pane_hist.refresh_list()
 
     def sync(self): self.refresh_all()
 
     def download_pdf(self):
-        try:
-            h = self.api.get_history()
-            if not h:
-                QMessageBox.warning(self,"No data","No dataset available."); return
-            did = h[0]["id"]
-            tmp = tempfile.NamedTemporaryFile(delete=False,suffix=".pdf"); tmp.close()
-            self.api.download_pdf(did,tmp.name)
-            QMessageBox.information(self,"Saved",f"Saved report to {tmp.name}")
-        except Exception as e:
-            show_error(self,"Download failed",e)
+        self.btn_pdf.setEnabled(False)
+        self.tasks.submit("pdf", self._fetch_latest_pdf, on_done=self.pdf_done,
+                          on_error=self.pdf_failed, replace=False)
+
+    def _fetch_latest_pdf(self):
+        # runs on a worker thread
+        h = self.api.get_history()
+        if not h:
+            return None
+        did = h[0]["id"]
+        tmp = tempfile.NamedTemporaryFile(delete=False,suffix=".pdf"); tmp.close()
+        return self.api.download_pdf(did,tmp.name)
+
+    def pdf_done(self, path):
+        self.btn_pdf.setEnabled(True)
+        if not path:
+            QMessageBox.warning(self,"No data","No dataset available."); return
+        QMessageBox.information(self,"Saved",f"Saved report to {path}")
+
+    def pdf_failed(self, e):
+        self.btn_pdf.setEnabled(True)
+        show_error(self,"Download failed",e)
+
+    def closeEvent(self, event):
+        self.poll.stop()
+        self.tasks.shutdown()
+        super().closeEvent(event)
 
     def logout(self):
         self.api.set_token(None)
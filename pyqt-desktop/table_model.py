@@ -0,0 +1,98 @@
+from collections import OrderedDict
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class DatasetTableModel(QAbstractTableModel):
+    """
+    Read-only view of a dataset's rows, paged from the backend as the user scrolls.
+
+    Rows are exposed incrementally through canFetchMore/fetchMore. Each page
+    is kept as one NumPy array per column, and only the max_pages most
+    recently used pages stay in memory; scrolling back onto an evicted page
+    refetches it in the background. Memory is therefore bounded by
+    page_size * max_pages rows no matter how large the dataset is.
+    """
+
+    def __init__(self, api, tasks, dataset_id, first_page, page_size=500, max_pages=40, parent=None):
+        super().__init__(parent)
+        self.api = api
+        self.tasks = tasks
+        self.dataset_id = dataset_id
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.columns = first_page.get("columns", [])
+        self.total = first_page.get("total_rows", len(first_page.get("rows", [])))
+        self.pages = OrderedDict()
+        self.pending = set()
+
+        rows = first_page.get("rows", [])
+        self._store(0, rows)
+        self.loaded = len(rows)
+
+    def _store(self, page, rows):
+        self.pages[page] = [np.asarray([r.get(c) for r in rows]) for c in self.columns]
+        self.pages.move_to_end(page)
+        while len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+
+    def _request(self, page):
+        if page in self.pending:
+            return
+        self.pending.add(page)
+        self.tasks.submit(
+            f"rows-{self.dataset_id}-{page}",
+            self.api.get_dataset_rows, self.dataset_id, page * self.page_size, self.page_size,
+            on_done=lambda data: self._arrived(page, data),
+            on_error=lambda e: self.pending.discard(page),
+            replace=False,
+        )
+
+    def _arrived(self, page, data):
+        self.pending.discard(page)
+        rows = data.get("rows", [])
+        first = page * self.page_size
+
+        if first == self.loaded and rows:
+            # next page at the end: grow the table
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._store(page, rows)
+            self.loaded += len(rows)
+            self.endInsertRows()
+        elif first < self.loaded:
+            # refetch of an evicted page
+            self._store(page, rows)
+            last = min(first + len(rows), self.loaded) - 1
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.columns) - 1))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self._request(self.loaded // self.page_size)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        page, offset = divmod(index.row(), self.page_size)
+        columns = self.pages.get(page)
+        if columns is None:
+            self._request(page)
+            return ""
+        self.pages.move_to_end(page)
+        value = columns[index.column()][offset]
+        return "" if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section] if section < len(self.columns) else None
+        return str(section + 1)
@@ -0,0 +1,91 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class TaskSignals(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class Task(QRunnable):
+    """Runs fn(*args) on a pool thread and reports back through signals on the UI thread."""
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+        self.signals = TaskSignals()
+
+    def run(self):
+        # always emits, so the runner can release the task; a cancelled
+        # task's result is dropped on the UI side
+        if self.cancelled:
+            self.signals.failed.emit(None)
+            return
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(e)
+            return
+        self.signals.finished.emit(result)
+
+
+class TaskRunner(QObject):
+    """
+    Keeps network calls off the Qt main thread.
+
+    Tasks are keyed (e.g. "summary", "preview"). Submitting a key that is
+    still in flight either supersedes the old task (its result is dropped,
+    or it is pulled from the queue if it hasn't started) or, for polls,
+    is skipped so slow responses don't pile up.
+    """
+
+    def __init__(self, parent=None, max_threads=4):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.tasks = {}
+        self.live = set()
+
+    def is_busy(self, key):
+        return key in self.tasks
+
+    def cancel(self, key):
+        task = self.tasks.pop(key, None)
+        if task is not None:
+            task.cancelled = True
+            if self.pool.tryTake(task):
+                self.live.discard(task)
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None, replace=True):
+        if key in self.tasks:
+            if not replace:
+                return None
+            self.cancel(key)
+
+        task = Task(fn, *args)
+
+        def settle(callback, value):
+            self.live.discard(task)
+            if self.tasks.get(key) is task:
+                del self.tasks[key]
+            if task.cancelled or not callback:
+                return
+            # an exception escaping a slot would abort the Qt event loop
+            try:
+                callback(value)
+            except Exception as e:
+                print(f"{key} callback error", e)
+
+        task.signals.finished.connect(lambda result: settle(on_done, result))
+        task.signals.failed.connect(lambda e: settle(on_error, e))
+        self.tasks[key] = task
+        self.live.add(task)
+        self.pool.start(task)
+        return task
+
+    def shutdown(self):
+        for key in list(self.tasks):
+            self.cancel(key)
+        self.pool.waitForDone(2000)